@@ -32,7 +32,8 @@ files = os.listdir(py)
 all_nodes = {}
 
 for file in files:
-    if not file.endswith(".py"):
+    # 下划线开头的是内部辅助模块，不包含节点
+    if not file.endswith(".py") or file.startswith("_"):
         continue
     name = os.path.splitext(file)[0]
     imported_module = importlib.import_module(".py.{}".format(name), __name__)
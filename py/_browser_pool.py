@@ -0,0 +1,136 @@
+"""
+共享的Playwright浏览器池
+各转场节点跨调用复用同一个Playwright驱动和Chromium进程（按是否启用GPU各保留一个），进程退出时统一关闭
+"""
+
+import asyncio
+import atexit
+import contextlib
+
+
+_PLAYWRIGHT = None
+_PLAYWRIGHT_LOOP = None
+_BROWSERS = {}
+_BROWSER_LOCK = None
+_BROWSER_LOCK_LOOP = None
+
+# GPU硬件加速
+_GPU_ARGS = [
+    '--enable-gpu',                    # 启用GPU
+    '--use-gl=angle',                  # 使用ANGLE（支持GPU）
+    '--enable-webgl',
+    '--enable-accelerated-2d-canvas',
+    '--disable-dev-shm-usage',
+    '--hide-scrollbars',
+    '--mute-audio',
+    '--no-sandbox',                    # 避免权限问题
+    '--disable-setuid-sandbox',
+]
+
+# SwiftShader软件渲染
+_CPU_ARGS = [
+    '--use-angle=swiftshader',         # 强制使用CPU软件渲染
+    '--enable-webgl',
+    '--enable-accelerated-2d-canvas',
+    '--disable-dev-shm-usage',
+    '--hide-scrollbars',
+    '--mute-audio',
+]
+
+
+@contextlib.asynccontextmanager
+async def shared_browser(use_gpu):
+    """独占使用共享浏览器：同一时间只有一次调用在渲染"""
+    async with _get_lock():
+        yield await _get_browser(use_gpu)
+
+
+def _get_lock():
+    """获取当前事件循环的锁；asyncio.Lock绑定在首次使用它的循环上，换循环时重新创建"""
+    global _BROWSER_LOCK, _BROWSER_LOCK_LOOP
+    
+    loop = asyncio.get_running_loop()
+    if _BROWSER_LOCK is None or _BROWSER_LOCK_LOOP is not loop:
+        _BROWSER_LOCK = asyncio.Lock()
+        _BROWSER_LOCK_LOOP = loop
+    return _BROWSER_LOCK
+
+
+async def _get_browser(use_gpu):
+    """获取共享的Playwright浏览器，首次使用或断开后才启动（避免每次冷启动Chromium）"""
+    global _PLAYWRIGHT, _PLAYWRIGHT_LOOP
+    
+    loop = asyncio.get_running_loop()
+    if _PLAYWRIGHT is not None and _PLAYWRIGHT_LOOP is not loop:
+        # Playwright驱动和浏览器绑定在启动它们的事件循环上，换了循环（如每次调用都asyncio.run）就不能再用，
+        # 旧循环仍在运行时交给它关闭，否则直接丢弃（驱动会在管道断开后连同浏览器一起退出）
+        old_loop = _PLAYWRIGHT_LOOP
+        if old_loop is not None and old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close(_PLAYWRIGHT, list(_BROWSERS.values())), old_loop)
+        _PLAYWRIGHT = None
+        _PLAYWRIGHT_LOOP = None
+        _BROWSERS.clear()
+    
+    browser = _BROWSERS.get(use_gpu)
+    if browser is not None and browser.is_connected():
+        return browser
+    
+    from playwright.async_api import async_playwright
+    
+    if _PLAYWRIGHT is None:
+        _PLAYWRIGHT = await async_playwright().start()
+        _PLAYWRIGHT_LOOP = loop
+    
+    # 根据GPU设置选择渲染方式
+    if use_gpu:
+        print("Playwright browser starting with GPU acceleration")
+        browser = await _PLAYWRIGHT.chromium.launch(headless=True, args=_GPU_ARGS)
+    else:
+        print("Playwright browser starting with SwiftShader (CPU rendering)")
+        browser = await _PLAYWRIGHT.chromium.launch(headless=True, args=_CPU_ARGS)
+    
+    _BROWSERS[use_gpu] = browser
+    return browser
+
+
+async def close_browsers():
+    """关闭所有共享浏览器并停止Playwright驱动"""
+    global _PLAYWRIGHT, _PLAYWRIGHT_LOOP
+    
+    async with _get_lock():
+        playwright = _PLAYWRIGHT
+        browsers = list(_BROWSERS.values())
+        _PLAYWRIGHT = None
+        _PLAYWRIGHT_LOOP = None
+        _BROWSERS.clear()
+        await _close(playwright, browsers)
+
+
+async def _close(playwright, browsers):
+    """关闭给定的浏览器和Playwright驱动（须在启动它们的事件循环中执行）"""
+    for browser in browsers:
+        if browser.is_connected():
+            await browser.close()
+    
+    if playwright is not None:
+        await playwright.stop()
+
+
+def _shutdown():
+    """进程退出时关闭共享浏览器；Playwright对象绑定在启动它的事件循环上，只能在该循环中关闭"""
+    loop = _PLAYWRIGHT_LOOP
+    if _PLAYWRIGHT is None or loop is None or loop.is_closed():
+        # 事件循环已关闭时无法再发送关闭命令，驱动会在标准输入断开后连同浏览器一起退出
+        return
+    
+    try:
+        if loop.is_running():
+            # 事件循环仍在其他线程运行（如服务器线程）
+            asyncio.run_coroutine_threadsafe(close_browsers(), loop).result(timeout=10)
+        else:
+            loop.run_until_complete(close_browsers())
+    except Exception as e:
+        print(f"Failed to close shared Playwright browsers: {e}")
+
+
+atexit.register(_shutdown)
@@ -0,0 +1,21 @@
+"""
+颜色解析辅助函数
+"""
+
+import string
+
+
+def parse_hex_color(color_str, default=(0, 0, 0)):
+    """解析 #RGB 或 #RRGGBB 颜色字符串为RGB元组，无法解析时返回默认颜色"""
+    hex_color = color_str.strip()
+    if hex_color.startswith('#'):
+        hex_color = hex_color[1:]
+        # 三位简写展开为六位：#fff -> #ffffff
+        if len(hex_color) == 3:
+            hex_color = ''.join(c * 2 for c in hex_color)
+        if len(hex_color) == 6 and all(c in string.hexdigits for c in hex_color):
+            value = int(hex_color, 16)
+            return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+    
+    print(f"Invalid background color {color_str!r}, using default #{bytes(default).hex()}")
+    return default
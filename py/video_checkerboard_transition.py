@@ -72,36 +72,25 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
         start_time = time.time()
         print(f"Starting checkerboard transition: {transition_style}, {total_frames} frames")
         
-        # 提取视频帧
-        frames1 = self._extract_video_frames(video1)
-        frames2 = self._extract_video_frames(video2)
+        # 整段视频一次性量化为uint8数组（每个视频一次内核调用和一次拷贝），后面只做索引
+        frames1 = self._tensor_to_numpy(video1)
+        frames2 = self._tensor_to_numpy(video2)
         print(f"Video frames: {len(frames1)} -> {len(frames2)}, generating {total_frames} transition frames")
         
-        # 预计算优化：提前计算所有帧的base64数据
+        # 预计算优化：每个转场帧对应的源帧索引（单帧视频时始终为0）
         precompute_start = time.time()
         
-        frame1_base64_list = []
-        frame2_base64_list = []
+        frame1_indices = []
+        frame2_indices = []
         
         for i in range(total_frames):
             progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 获取对应的帧
-            if len(frames1) == 1:
-                frame1_data = self._tensor_to_numpy(frames1[0])
-            else:
-                frame1_idx = min(int(progress * (len(frames1) - 1)), len(frames1) - 1)
-                frame1_data = self._tensor_to_numpy(frames1[frame1_idx])
-            
-            if len(frames2) == 1:
-                frame2_data = self._tensor_to_numpy(frames2[0])
-            else:
-                frame2_idx = min(int(progress * (len(frames2) - 1)), len(frames2) - 1)
-                frame2_data = self._tensor_to_numpy(frames2[frame2_idx])
-            
-            # 预计算base64数据
-            frame1_base64_list.append(self._numpy_to_base64(frame1_data))
-            frame2_base64_list.append(self._numpy_to_base64(frame2_data))
+            frame1_indices.append(min(int(progress * (len(frames1) - 1)), len(frames1) - 1))
+            frame2_indices.append(min(int(progress * (len(frames2) - 1)), len(frames2) - 1))
+        
+        # 每个用到的源帧只编码一次，按源帧索引存放
+        frame1_base64 = {idx: self._numpy_to_base64(frames1[idx]) for idx in sorted(set(frame1_indices))}
+        frame2_base64 = {idx: self._numpy_to_base64(frames2[idx]) for idx in sorted(set(frame2_indices))}
         
         precompute_time = time.time() - precompute_start
         
@@ -154,6 +143,12 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
             page = await browser.new_page(viewport={'width': width, 'height': height})
             
             try:
+                # 页面通过pullFrame按源帧索引拉取JPEG纹理，避免把base64字符串拼进每帧的脚本
+                frame_base64_maps = (frame1_base64, frame2_base64)
+                await page.expose_binding(
+                    "pullFrame", lambda source, video, index: frame_base64_maps[video][int(index)]
+                )
+                
                 # 加载HTML页面
                 await page.set_content(html_content, wait_until='domcontentloaded', timeout=30000)
                 
@@ -169,8 +164,7 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
                     
                     # 批处理：一次处理多个帧
                     batch_frames = await self._process_batch(
-                        page, batch_indices, frame1_base64_list, frame2_base64_list, 
-                        total_frames, quality
+                        page, batch_indices, frame1_indices, frame2_indices, total_frames, quality
                     )
                     
                     # 立即添加到结果中，避免内存积累
@@ -203,32 +197,23 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
         
         return (video_tensor,)
     
-    async def _process_batch(self, page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames, quality):
+    async def _process_batch(self, page, batch_indices, frame1_indices, frame2_indices, total_frames, quality):
         """批处理渲染多个帧"""
         batch_frames = []
         
         for i in batch_indices:
             progress = i / (total_frames - 1) if total_frames > 1 else 0
             
-            # 使用预计算的base64数据
-            frame1_base64 = frame1_base64_list[i]
-            frame2_base64 = frame2_base64_list[i]
-            
-            # 更新棋盘格动画
-            await page.evaluate(f"""
-                if (window.checkerboardController) {{
-                    window.checkerboardController.updateFrame({progress}, '{frame1_base64}', '{frame2_base64}');
-                }}
-            """)
-            
-            # 等待动画更新
-            await page.wait_for_timeout(25)
-            
-            # 强制触发重绘
-            await page.evaluate("document.body.offsetHeight")
+            # 更新棋盘格动画（纹理由页面通过pullFrame按源帧索引拉取）
+            # 返回updateFrame的Promise，evaluate会等到纹理解码、方块更新完成后才返回
+            await page.evaluate(
+                "([progress, index1, index2]) => window.checkerboardController.updateFrame(progress, index1, index2)",
+                [progress, frame1_indices[i], frame2_indices[i]]
+            )
             
-            # 等待渲染完成
-            await page.wait_for_timeout(15)
+            # 等待两个动画帧，确保样式已绘制，而不强制同步布局
+            # 方块上没有CSS过渡，JS设置的变换即为最终状态，无需额外的固定等待
+            await page.evaluate("new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
             
             # 优化截图：使用JPEG格式
             screenshot_bytes = await page.screenshot(type='jpeg', quality=quality)
@@ -243,9 +228,176 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
         
         return batch_frames
     
+    def _get_style_scripts(self, transition_style):
+        """返回指定转场样式的 (延迟计算, 方块动画) JS代码片段，模板只内联被选中的一种"""
+        
+        style_scripts = {
+            "flip_squares": (
+                """
+                // 对角线延迟
+                return (row + col) * this.staggerDelay;
+""",
+                """
+                const angle = progress * 180;
+                
+                if (progress <= 0) {
+                    square.style.backgroundImage = texture1;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'rotateY(0deg)';
+                } else if (progress >= 1) {
+                    square.style.backgroundImage = texture2;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'rotateY(0deg)';
+                } else {
+                    if (progress < 0.5) {
+                        square.style.backgroundImage = texture1;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                        square.style.transform = `rotateY(${angle}deg)`;
+                    } else {
+                        square.style.backgroundImage = texture2;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                        square.style.transform = `rotateY(${180 - angle}deg)`;
+                    }
+                }
+""",
+            ),
+            "scale_squares": (
+                """
+                // 从中心向外
+                const centerRow = this.gridSize / 2;
+                const centerCol = this.gridSize / 2;
+                const distance = Math.sqrt(Math.pow(row - centerRow, 2) + Math.pow(col - centerCol, 2));
+                return distance * this.staggerDelay;
+""",
+                """
+                if (progress <= 0) {
+                    square.style.backgroundImage = texture1;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'scale(1)';
+                } else if (progress >= 1) {
+                    square.style.backgroundImage = texture2;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'scale(1)';
+                } else {
+                    if (progress < 0.5) {
+                        square.style.backgroundImage = texture1;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                        const scale = 1 - progress;
+                        square.style.transform = `scale(${scale})`;
+                    } else {
+                        square.style.backgroundImage = texture2;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                        const scale = progress;
+                        square.style.transform = `scale(${scale})`;
+                    }
+                }
+""",
+            ),
+            "rotate_squares": (
+                """
+                // 螺旋延迟（简化的螺旋计算）
+                const centerRow = Math.floor(this.gridSize / 2);
+                const centerCol = Math.floor(this.gridSize / 2);
+                const angle = Math.atan2(row - centerRow, col - centerCol);
+                const distance = Math.sqrt(Math.pow(row - centerRow, 2) + Math.pow(col - centerCol, 2));
+                return (angle + distance) * this.staggerDelay;
+""",
+                """
+                const angle = progress * 360;
+                
+                if (progress <= 0) {
+                    square.style.backgroundImage = texture1;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'rotate(0deg)';
+                } else if (progress >= 1) {
+                    square.style.backgroundImage = texture2;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'rotate(0deg)';
+                } else {
+                    if (progress < 0.5) {
+                        square.style.backgroundImage = texture1;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    } else {
+                        square.style.backgroundImage = texture2;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    }
+                    square.style.transform = `rotate(${angle}deg)`;
+                }
+""",
+            ),
+            "slide_squares": (
+                """
+                // 从左到右
+                return col * this.staggerDelay;
+""",
+                """
+                const slideDistance = 100; // 滑动距离（像素）
+                
+                if (progress <= 0) {
+                    square.style.backgroundImage = texture1;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'translateX(0)';
+                } else if (progress >= 1) {
+                    square.style.backgroundImage = texture2;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'translateX(0)';
+                } else {
+                    if (progress < 0.5) {
+                        square.style.backgroundImage = texture1;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                        const offset = -progress * slideDistance * 2;
+                        square.style.transform = `translateX(${offset}px)`;
+                    } else {
+                        square.style.backgroundImage = texture2;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                        const offset = (1 - progress) * slideDistance * 2;
+                        square.style.transform = `translateX(${offset}px)`;
+                    }
+                }
+""",
+            ),
+            "wave_squares": (
+                """
+                // 波浪延迟
+                return Math.sin(col * Math.PI / this.gridSize) * this.staggerDelay;
+""",
+                """
+                const waveHeight = 50; // 波浪高度
+                const waveFreq = 2; // 波浪频率
+                
+                if (progress <= 0) {
+                    square.style.backgroundImage = texture1;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'translateZ(0) rotateX(0deg)';
+                } else if (progress >= 1) {
+                    square.style.backgroundImage = texture2;
+                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    square.style.transform = 'translateZ(0) rotateX(0deg)';
+                } else {
+                    if (progress < 0.5) {
+                        square.style.backgroundImage = texture1;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    } else {
+                        square.style.backgroundImage = texture2;
+                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
+                    }
+                    
+                    const waveOffset = Math.sin(progress * Math.PI * waveFreq + col * 0.5) * waveHeight;
+                    const rotateX = Math.sin(progress * Math.PI + col * 0.3) * 15;
+                    square.style.transform = `translateZ(${waveOffset}px) rotateX(${rotateX}deg)`;
+                }
+""",
+            ),
+        }
+        
+        delay_script, animate_script = style_scripts.get(transition_style, style_scripts["flip_squares"])
+        return delay_script.strip("\n"), animate_script.strip("\n")
+    
     def _generate_html_template(self, transition_style, grid_size, animation_duration, stagger_delay, background_color, width, height):
         """生成HTML模板 - CSS3棋盘格效果（真实切割）"""
         
+        delay_script, animate_script = self._get_style_scripts(transition_style)
+        
         return f"""
 <!DOCTYPE html>
 <html>
@@ -279,8 +431,6 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
             background-repeat: no-repeat;
             transform-style: preserve-3d;
             transform-origin: center;
-            transition: all 0.3s cubic-bezier(0.25, 0.46, 0.45, 0.94);
-            border: 1px solid rgba(255,255,255,0.05);
             overflow: hidden;
         }}
         
@@ -321,6 +471,10 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
                 this.width = {width};
                 this.height = {height};
                 this.squares = [];
+                // 两路视频各自缓存当前源帧的纹理，源帧不变时不重新拉取
+                this.sourceIndices = [-1, -1];
+                this.textureUrls = [null, null];
+                this.textures = ['', ''];
                 this.init();
             }}
             
@@ -355,217 +509,68 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
                         const bgPosY = -(row * squareHeight);
                         square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
                         
-                        // 存储方块信息
-                        square.dataset.row = row;
-                        square.dataset.col = col;
-                        square.dataset.index = row * this.gridSize + col;
-                        square.dataset.bgPosX = bgPosX;
-                        square.dataset.bgPosY = bgPosY;
-                        
+                        // 存储方块信息（数值和延迟只计算一次，避免每帧读取dataset和parseInt）
+                        const index = row * this.gridSize + col;
                         this.container.appendChild(square);
-                        this.squares.push(square);
+                        this.squares.push({{
+                            el: square,
+                            row: row,
+                            col: col,
+                            bgPosX: bgPosX,
+                            bgPosY: bgPosY,
+                            delay: this.calculateDelay(row, col, index),
+                        }});
                     }}
                 }}
             }}
             
-            updateFrame(progress, texture1Base64, texture2Base64) {{
-                // 更新所有棋盘格方块
-                this.squares.forEach((square, index) => {{
-                    this.updateSquare(square, index, progress, texture1Base64, texture2Base64);
-                }});
+            async loadTexture(video, sourceIndex) {{
+                // 通过pullFrame拉取JPEG数据，转成blob URL并预先解码，所有方块共用同一份纹理
+                const data = await window.pullFrame(video, sourceIndex);
+                const blob = await (await fetch('data:image/jpeg;base64,' + data)).blob();
+                const url = URL.createObjectURL(blob);
+                const image = new Image();
+                image.src = url;
+                await image.decode();
+                return url;
             }}
             
-            updateSquare(square, index, progress, texture1Base64, texture2Base64) {{
-                const row = parseInt(square.dataset.row);
-                const col = parseInt(square.dataset.col);
-                const bgPosX = parseInt(square.dataset.bgPosX);
-                const bgPosY = parseInt(square.dataset.bgPosY);
-                
-                // 计算每个方块的动画延迟（基于不同的模式）
-                const delay = this.calculateDelay(row, col, index);
-                const adjustedProgress = Math.max(0, Math.min(1, (progress - delay) / this.animationDuration));
-                
-                // 使用缓动函数让动画更自然
-                const easeProgress = this.easeInOutCubic(adjustedProgress);
-                
-                // 根据转场样式应用不同的动画
-                switch(this.transitionStyle) {{
-                    case 'flip_squares':
-                        this.animateFlip(square, easeProgress, texture1Base64, texture2Base64, bgPosX, bgPosY);
-                        break;
-                    case 'scale_squares':
-                        this.animateScale(square, easeProgress, texture1Base64, texture2Base64, bgPosX, bgPosY);
-                        break;
-                    case 'rotate_squares':
-                        this.animateRotate(square, easeProgress, texture1Base64, texture2Base64, bgPosX, bgPosY);
-                        break;
-                    case 'slide_squares':
-                        this.animateSlide(square, easeProgress, texture1Base64, texture2Base64, bgPosX, bgPosY, row, col);
-                        break;
-                    case 'wave_squares':
-                        this.animateWave(square, easeProgress, texture1Base64, texture2Base64, bgPosX, bgPosY, row, col);
-                        break;
-                    default:
-                        this.animateFlip(square, easeProgress, texture1Base64, texture2Base64, bgPosX, bgPosY);
-                }}
-            }}
-            
-            calculateDelay(row, col, index) {{
-                switch(this.transitionStyle) {{
-                    case 'flip_squares':
-                        // 对角线延迟
-                        return (row + col) * this.staggerDelay;
-                    case 'scale_squares':
-                        // 从中心向外
-                        const centerRow = this.gridSize / 2;
-                        const centerCol = this.gridSize / 2;
-                        const distance = Math.sqrt(Math.pow(row - centerRow, 2) + Math.pow(col - centerCol, 2));
-                        return distance * this.staggerDelay;
-                    case 'rotate_squares':
-                        // 螺旋延迟
-                        return this.getSpiralDelay(row, col) * this.staggerDelay;
-                    case 'slide_squares':
-                        // 从左到右
-                        return col * this.staggerDelay;
-                    case 'wave_squares':
-                        // 波浪延迟
-                        return Math.sin(col * Math.PI / this.gridSize) * this.staggerDelay;
-                    default:
-                        return index * this.staggerDelay;
-                }}
+            async updateTexture(video, sourceIndex) {{
+                if (sourceIndex === this.sourceIndices[video]) return;
+                const url = await this.loadTexture(video, sourceIndex);
+                if (this.textureUrls[video]) URL.revokeObjectURL(this.textureUrls[video]);
+                this.textureUrls[video] = url;
+                this.textures[video] = `url(${{url}})`;
+                this.sourceIndices[video] = sourceIndex;
             }}
             
-            getSpiralDelay(row, col) {{
-                // 简化的螺旋计算
-                const centerRow = Math.floor(this.gridSize / 2);
-                const centerCol = Math.floor(this.gridSize / 2);
-                const angle = Math.atan2(row - centerRow, col - centerCol);
-                const distance = Math.sqrt(Math.pow(row - centerRow, 2) + Math.pow(col - centerCol, 2));
-                return angle + distance;
-            }}
-            
-            animateFlip(square, progress, texture1Base64, texture2Base64, bgPosX, bgPosY) {{
-                const angle = progress * 180;
+            async updateFrame(progress, frame1Index, frame2Index) {{
+                await Promise.all([this.updateTexture(0, frame1Index), this.updateTexture(1, frame2Index)]);
                 
-                if (progress <= 0) {{
-                    square.style.backgroundImage = `url(${{texture1Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'rotateY(0deg)';
-                }} else if (progress >= 1) {{
-                    square.style.backgroundImage = `url(${{texture2Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'rotateY(0deg)';
-                }} else {{
-                    if (progress < 0.5) {{
-                        square.style.backgroundImage = `url(${{texture1Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        square.style.transform = `rotateY(${{angle}}deg)`;
-                    }} else {{
-                        square.style.backgroundImage = `url(${{texture2Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        square.style.transform = `rotateY(${{180 - angle}}deg)`;
-                    }}
-                }}
-            }}
-            
-            animateScale(square, progress, texture1Base64, texture2Base64, bgPosX, bgPosY) {{
-                if (progress <= 0) {{
-                    square.style.backgroundImage = `url(${{texture1Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'scale(1)';
-                }} else if (progress >= 1) {{
-                    square.style.backgroundImage = `url(${{texture2Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'scale(1)';
-                }} else {{
-                    if (progress < 0.5) {{
-                        square.style.backgroundImage = `url(${{texture1Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        const scale = 1 - progress;
-                        square.style.transform = `scale(${{scale}})`;
-                    }} else {{
-                        square.style.backgroundImage = `url(${{texture2Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        const scale = progress;
-                        square.style.transform = `scale(${{scale}})`;
-                    }}
+                // 更新所有棋盘格方块
+                for (const cell of this.squares) {{
+                    this.updateSquare(cell, progress, this.textures[0], this.textures[1]);
                 }}
             }}
             
-            animateRotate(square, progress, texture1Base64, texture2Base64, bgPosX, bgPosY) {{
-                const angle = progress * 360;
+            updateSquare(cell, frameProgress, texture1, texture2) {{
+                const square = cell.el;
+                const col = cell.col;
+                const bgPosX = cell.bgPosX;
+                const bgPosY = cell.bgPosY;
                 
-                if (progress <= 0) {{
-                    square.style.backgroundImage = `url(${{texture1Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'rotate(0deg)';
-                }} else if (progress >= 1) {{
-                    square.style.backgroundImage = `url(${{texture2Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'rotate(0deg)';
-                }} else {{
-                    if (progress < 0.5) {{
-                        square.style.backgroundImage = `url(${{texture1Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    }} else {{
-                        square.style.backgroundImage = `url(${{texture2Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    }}
-                    square.style.transform = `rotate(${{angle}}deg)`;
-                }}
-            }}
-            
-            animateSlide(square, progress, texture1Base64, texture2Base64, bgPosX, bgPosY, row, col) {{
-                const slideDistance = 100; // 滑动距离（像素）
+                // 使用创建时预计算的动画延迟
+                const adjustedProgress = Math.max(0, Math.min(1, (frameProgress - cell.delay) / this.animationDuration));
                 
-                if (progress <= 0) {{
-                    square.style.backgroundImage = `url(${{texture1Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'translateX(0)';
-                }} else if (progress >= 1) {{
-                    square.style.backgroundImage = `url(${{texture2Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'translateX(0)';
-                }} else {{
-                    if (progress < 0.5) {{
-                        square.style.backgroundImage = `url(${{texture1Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        const offset = -progress * slideDistance * 2;
-                        square.style.transform = `translateX(${{offset}}px)`;
-                    }} else {{
-                        square.style.backgroundImage = `url(${{texture2Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        const offset = (1 - progress) * slideDistance * 2;
-                        square.style.transform = `translateX(${{offset}}px)`;
-                    }}
-                }}
+                // 使用缓动函数让动画更自然
+                const progress = this.easeInOutCubic(adjustedProgress);
+                
+                // 当前转场样式的动画（生成模板时已选定，热路径中无需分支）
+{animate_script}
             }}
             
-            animateWave(square, progress, texture1Base64, texture2Base64, bgPosX, bgPosY, row, col) {{
-                const waveHeight = 50; // 波浪高度
-                const waveFreq = 2; // 波浪频率
-                
-                if (progress <= 0) {{
-                    square.style.backgroundImage = `url(${{texture1Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'translateZ(0) rotateX(0deg)';
-                }} else if (progress >= 1) {{
-                    square.style.backgroundImage = `url(${{texture2Base64}})`;
-                    square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    square.style.transform = 'translateZ(0) rotateX(0deg)';
-                }} else {{
-                    if (progress < 0.5) {{
-                        square.style.backgroundImage = `url(${{texture1Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    }} else {{
-                        square.style.backgroundImage = `url(${{texture2Base64}})`;
-                        square.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                    }}
-                    
-                    const waveOffset = Math.sin(progress * Math.PI * waveFreq + col * 0.5) * waveHeight;
-                    const rotateX = Math.sin(progress * Math.PI + col * 0.3) * 15;
-                    square.style.transform = `translateZ(${{waveOffset}}px) rotateX(${{rotateX}}deg)`;
-                }}
+            calculateDelay(row, col, index) {{
+{delay_script}
             }}
             
             // 缓动函数
@@ -582,35 +587,15 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
 </html>
 """
     
-    def _extract_video_frames(self, video_tensor):
-        """从视频tensor中提取帧"""
-        frames = []
-        
-        if video_tensor.dim() == 4:
-            batch_size = video_tensor.shape[0]
-            for i in range(batch_size):
-                frame = video_tensor[i]
-                frames.append(frame)
-        else:
-            frames.append(video_tensor)
-        
-        return frames
-    
-    def _tensor_to_numpy(self, frame_tensor):
-        """将tensor转换为numpy数组"""
-        if isinstance(frame_tensor, torch.Tensor):
-            frame_np = frame_tensor.cpu().numpy()
-        else:
-            frame_np = frame_tensor
-        
-        # 转换数据类型
-        if frame_np.dtype == np.float32 or frame_np.dtype == np.float64:
-            frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
+    def _tensor_to_numpy(self, video_tensor):
+        """整段视频一次性转换为uint8 numpy数组 [N,H,W,C]（在原设备上量化后只拷贝一次）"""
+        if video_tensor.dim() == 3:
+            video_tensor = video_tensor.unsqueeze(0)
         
-        return frame_np
+        return video_tensor.mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
     
-    def _numpy_to_base64(self, frame_np):
-        """将numpy数组转换为base64字符串"""
+    def _numpy_to_base64(self, frame_np, quality=95):
+        """将numpy数组转换为JPEG的base64字符串（不带data URL前缀，供pullFrame传输）"""
         import io
         import base64
         from PIL import Image
@@ -624,10 +609,9 @@ class VideoCheckerboardTransitionNode(ComfyNodeABC):
         
         # 转换为base64
         buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        image.save(buffered, format="JPEG", quality=quality)
         
-        return f"data:image/png;base64,{img_str}"
+        return base64.b64encode(buffered.getvalue()).decode()
     
     def _frames_to_tensor(self, frames):
         """将帧列表转换为视频tensor"""
@@ -3,7 +3,11 @@
 两个视频片段之间的简单透明叠化转场效果
 """
 
+import os
+import functools
+import concurrent.futures
 import torch
+import torch.nn.functional as F
 import numpy as np
 import cv2
 from comfy.comfy_types.node_typing import ComfyNodeABC, InputTypeDict, IO
@@ -55,9 +59,13 @@ class VideoCrossfadeNode(ComfyNodeABC):
     ):
         """生成视频转场效果"""
         
-        # 提取视频帧
-        frames1 = self._extract_video_frames(video1)
-        frames2 = self._extract_video_frames(video2)
+        # 只有直接叠化会把Alpha通道合成到背景色上（输出仍为3通道）；
+        # 其余模式按RGB混合，输入带Alpha时先去掉，保证结果能写入下面的3通道输出缓冲区
+        keep_alpha = transition_mode == "crossfade" and video1.shape[-1] == 4 and video2.shape[-1] == 4
+        
+        # 提取视频帧：整段视频一次性缩放到目标尺寸并转换为uint8，循环内只做索引
+        frames1 = self._prepare_video_frames(video1, width, height, keep_alpha)
+        frames2 = self._prepare_video_frames(video2, width, height, keep_alpha)
         
         print(f"Video crossfade transition: {len(frames1)} + {len(frames2)} frames -> {total_frames} frames")
         print(f"Mode: {transition_mode}")
@@ -65,84 +73,124 @@ class VideoCrossfadeNode(ComfyNodeABC):
         # 解析背景颜色
         bg_color_bgr = self._parse_background_color(background_color)
         
-        # 使用OpenCV直接合成（简单高效）
-        output_frames = []
-        
-        for i in range(total_frames):
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 获取对应的帧 - 根据进度获取
-            frame1_idx = min(int(progress * (len(frames1) - 1)), len(frames1) - 1)
-            frame2_idx = min(int(progress * (len(frames2) - 1)), len(frames2) - 1)
-            
-            frame1 = frames1[frame1_idx]
-            frame2 = frames2[frame2_idx]
-            
-            # 根据转场模式进行不同的混合
-            if transition_mode == "crossfade":
-                # 直接叠化
-                blended_frame = self._blend_frames_with_background(
-                    frame1, frame2, progress, bg_color_bgr, width, height
-                )
-            elif transition_mode == "fade_to_black":
-                # 闪黑：video1 → 黑色 → video2
-                blended_frame = self._fade_through_color(
-                    frame1, frame2, progress, (0, 0, 0), width, height
-                )
-            elif transition_mode == "fade_to_white":
-                # 闪白：video1 → 白色 → video2
-                blended_frame = self._fade_through_color(
-                    frame1, frame2, progress, (255, 255, 255), width, height
-                )
-            elif transition_mode == "fade_to_custom":
-                # 闪自定义色：video1 → 自定义颜色 → video2
-                blended_frame = self._fade_through_color(
-                    frame1, frame2, progress, bg_color_bgr, width, height
-                )
-            elif transition_mode == "additive_dissolve":
-                # 叠加：使用加法混合
-                blended_frame = self._additive_blend(
-                    frame1, frame2, progress, width, height
-                )
-            elif transition_mode == "chromatic_dissolve":
-                # 色散叠化：RGB通道错位
-                blended_frame = self._chromatic_blend(
-                    frame1, frame2, progress, width, height
-                )
-            else:
-                # 默认使用直接叠化
-                blended_frame = self._blend_frames_with_background(
-                    frame1, frame2, progress, bg_color_bgr, width, height
-                )
-            
-            output_frames.append(blended_frame)
+        # 纯色画布与帧无关，每次调用只创建一次：闪黑/闪白使用固定颜色，其余模式使用背景色
+        fade_colors = {"fade_to_black": (0, 0, 0), "fade_to_white": (255, 255, 255)}
+        color_canvas = np.full(
+            (height, width, 3), fade_colors.get(transition_mode, bg_color_bgr), dtype=np.uint8
+        )
+        
+        # 使用OpenCV直接合成（简单高效），结果直接写入预分配的输出缓冲区
+        output_frames = np.empty((total_frames, height, width, 3), dtype=np.uint8)
+        
+        # 预先计算所有帧的进度和对应的源帧索引（total_frames为1时进度为0）
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        frame1_indices = np.minimum((progresses * (len(frames1) - 1)).astype(np.int64), len(frames1) - 1)
+        frame2_indices = np.minimum((progresses * (len(frames2) - 1)).astype(np.int64), len(frames2) - 1)
+        
+        if transition_mode == "crossfade" and frames1.shape[-1] == 3 and frames2.shape[-1] == 3:
+            # 直接叠化是纯线性混合：按组批量计算，替代逐帧的Python循环
+            self._crossfade_batched(
+                frames1, frames2, frame1_indices, frame2_indices, progresses, output_frames
+            )
+            print(f"Processing frames {total_frames}/{total_frames} (100.0%)")
+        else:
+            # 循环外只根据转场模式选择一次混合函数
+            blend_function = self._select_blend_function(transition_mode, color_canvas)
             
-            # 显示进度 - 每20帧或完成时显示
-            if (i + 1) % 20 == 0 or i == total_frames - 1:
-                progress_percent = (i + 1) / total_frames * 100
-                print(f"Processing frames {i+1}/{total_frames} ({progress_percent:.1f}%)")
-        
-        # 转换为tensor
-        video_tensor = self._frames_to_tensor(output_frames)
+            # 每帧相互独立且各自写入output_frames中的一个槽位；OpenCV在C代码中释放GIL，用线程池并行
+            with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                futures = [
+                    # 获取对应的帧 - 根据进度获取
+                    executor.submit(
+                        blend_function,
+                        frames1[frame1_indices[i]], frames2[frame2_indices[i]],
+                        float(progresses[i]), out=output_frames[i]
+                    )
+                    for i in range(total_frames)
+                ]
+                
+                for i, future in enumerate(futures):
+                    future.result()
+                    
+                    # 显示进度 - 每20帧或完成时显示
+                    if (i + 1) % 20 == 0 or i == total_frames - 1:
+                        progress_percent = (i + 1) / total_frames * 100
+                        print(f"Processing frames {i+1}/{total_frames} ({progress_percent:.1f}%)")
+        
+        # 转换为tensor：整个缓冲区一次转换并归一化
+        video_tensor = torch.from_numpy(output_frames).float().mul_(1.0 / 255.0)
         
         print(f"Crossfade transition completed: {video_tensor.shape}")
         return (video_tensor,)
     
-    def _extract_video_frames(self, video_tensor):
-        """从视频tensor中提取帧"""
-        frames = []
+    def _select_blend_function(self, transition_mode, color_canvas):
+        """按转场模式选定混合函数（每次调用只分派一次），返回 fn(frame1, frame2, progress, out=...)"""
+        blend_functions = {
+            # 直接叠化
+            "crossfade": functools.partial(self._blend_frames_with_background, background_canvas=color_canvas),
+            # 闪黑：video1 → 黑色 → video2
+            "fade_to_black": functools.partial(self._fade_through_color, color_canvas=color_canvas),
+            # 闪白：video1 → 白色 → video2
+            "fade_to_white": functools.partial(self._fade_through_color, color_canvas=color_canvas),
+            # 闪自定义色：video1 → 自定义颜色 → video2
+            "fade_to_custom": functools.partial(self._fade_through_color, color_canvas=color_canvas),
+            # 叠加：使用加法混合
+            "additive_dissolve": self._additive_blend,
+            # 色散叠化：RGB通道错位
+            "chromatic_dissolve": self._chromatic_blend,
+        }
         
-        # 视频tensor格式: [B, H, W, C]
-        if video_tensor.dim() == 4:
-            batch_size = video_tensor.shape[0]
-            for i in range(batch_size):
-                frame = video_tensor[i]  # [H, W, C]
-                frames.append(frame)
-        else:
-            # 单帧情况
-            frames.append(video_tensor)
+        # 默认使用直接叠化
+        return blend_functions.get(transition_mode, blend_functions["crossfade"])
+    
+    def _crossfade_batched(self, frames1, frames2, frame1_indices, frame2_indices, progresses, out, chunk_size=16):
+        """直接叠化的批量实现：每组帧只做一次torch定点运算（多线程内核），结果写入out"""
+        frames1_t = torch.from_numpy(frames1)
+        frames2_t = torch.from_numpy(frames2)
+        out_t = torch.from_numpy(out)
+        
+        # 分组处理，限制中间结果的内存占用
+        for start in range(0, len(progresses), chunk_size):
+            end = min(start + chunk_size, len(progresses))
+            
+            # 定点数权重（Q7）：255 * 128 + 64 不超过int16范围，全程使用16位整数运算
+            weights = torch.from_numpy(np.rint(progresses[start:end] * 128)).to(torch.int16).view(-1, 1, 1, 1)
+            chunk1 = frames1_t[torch.from_numpy(frame1_indices[start:end])].to(torch.int16)
+            chunk2 = frames2_t[torch.from_numpy(frame2_indices[start:end])].to(torch.int16)
+            
+            # (frame1 * (128 - w) + frame2 * w + 64) >> 7，即带舍入的 frame1 * (1 - progress) + frame2 * progress
+            blended = chunk1.mul_(128 - weights).add_(chunk2.mul_(weights)).add_(64)
+            blended >>= 7
+            out_t[start:end] = blended.to(torch.uint8)
         
-        return frames
+        return out
+    
+    def _prepare_video_frames(self, video_tensor, width, height, keep_alpha=False):
+        """将视频tensor批量缩放到目标尺寸并量化为uint8，返回 [B, H, W, C] 的numpy数组（keep_alpha为False时只保留RGB）"""
+        # 视频tensor格式: [B, H, W, C]，单帧补齐batch维度
+        if video_tensor.dim() == 3:
+            video_tensor = video_tensor.unsqueeze(0)
+        
+        # 去掉Alpha通道，后续缩放和量化也少处理一个通道
+        if not keep_alpha:
+            video_tensor = video_tensor[..., :3]
+        
+        # 在tensor所在设备上一次完成整段视频的缩放，尺寸已一致时跳过
+        frames = video_tensor.float()
+        src_height, src_width = frames.shape[1:3]
+        if (src_height, src_width) != (height, width):
+            # area只适合缩小；放大（或一边放大一边缩小）时使用bilinear
+            mode = 'area' if height < src_height and width < src_width else 'bilinear'
+            frames = F.interpolate(frames.permute(0, 3, 1, 2), size=(height, width), mode=mode)
+            frames = frames.permute(0, 2, 3, 1)
+        
+        # 先量化为uint8再拷回CPU
+        if video_tensor.is_floating_point():
+            frames = frames.mul(255)
+        frames = frames.clamp_(0, 255).to(torch.uint8)
+        
+        # 切掉Alpha后内存不再连续，OpenCV需要连续数组
+        return np.ascontiguousarray(frames.cpu().numpy())
     
     def _parse_background_color(self, color_str):
         """解析背景颜色字符串为BGR元组"""
@@ -159,27 +207,8 @@ class VideoCrossfadeNode(ComfyNodeABC):
             # 默认黑色
             return (0, 0, 0)
     
-    def _fade_through_color(self, frame1, frame2, progress, color_bgr, width, height):
-        """闪色转场：frame1 → 纯色 → frame2"""
-        # 转换为numpy数组
-        if isinstance(frame1, torch.Tensor):
-            frame1 = frame1.cpu().numpy()
-        if isinstance(frame2, torch.Tensor):
-            frame2 = frame2.cpu().numpy()
-        
-        # 确保数据类型正确
-        if frame1.dtype == np.float32 or frame1.dtype == np.float64:
-            frame1 = (frame1 * 255).clip(0, 255).astype(np.uint8)
-        if frame2.dtype == np.float32 or frame2.dtype == np.float64:
-            frame2 = (frame2 * 255).clip(0, 255).astype(np.uint8)
-        
-        # 调整到目标尺寸
-        frame1_resized = cv2.resize(frame1, (width, height), interpolation=cv2.INTER_AREA)
-        frame2_resized = cv2.resize(frame2, (width, height), interpolation=cv2.INTER_AREA)
-        
-        # 创建纯色画布
-        color_canvas = np.full((height, width, 3), color_bgr, dtype=np.uint8)
-        
+    def _fade_through_color(self, frame1, frame2, progress, color_canvas, out):
+        """闪色转场：frame1 → 纯色 → frame2（输入为已缩放到目标尺寸的uint8帧，结果写入out）"""
         # 分两个阶段：
         # 阶段1（0 -> 0.5）：frame1 淡出到纯色
         # 阶段2（0.5 -> 1.0）：纯色淡入到 frame2
@@ -188,78 +217,39 @@ class VideoCrossfadeNode(ComfyNodeABC):
             fade_progress = progress * 2  # 映射到 0-1
             alpha1 = 1.0 - fade_progress
             alpha2 = fade_progress
-            blended = cv2.addWeighted(frame1_resized, alpha1, color_canvas, alpha2, 0)
+            cv2.addWeighted(frame1, alpha1, color_canvas, alpha2, 0, dst=out)
         else:
             # 阶段2：纯色 → frame2
             fade_progress = (progress - 0.5) * 2  # 映射到 0-1
             alpha1 = 1.0 - fade_progress
             alpha2 = fade_progress
-            blended = cv2.addWeighted(color_canvas, alpha1, frame2_resized, alpha2, 0)
+            cv2.addWeighted(color_canvas, alpha1, frame2, alpha2, 0, dst=out)
         
-        return blended
+        return out
     
-    def _blend_frames_with_background(self, frame1, frame2, progress, bg_color_bgr, width, height):
-        """使用OpenCV合成两帧，包含背景色处理"""
-        # 转换为numpy数组
-        if isinstance(frame1, torch.Tensor):
-            frame1 = frame1.cpu().numpy()
-        if isinstance(frame2, torch.Tensor):
-            frame2 = frame2.cpu().numpy()
-        
-        # 确保数据类型正确
-        if frame1.dtype == np.float32 or frame1.dtype == np.float64:
-            frame1 = (frame1 * 255).clip(0, 255).astype(np.uint8)
-        if frame2.dtype == np.float32 or frame2.dtype == np.float64:
-            frame2 = (frame2 * 255).clip(0, 255).astype(np.uint8)
-        
-        # 调整到目标尺寸
-        frame1_resized = cv2.resize(frame1, (width, height), interpolation=cv2.INTER_AREA)
-        frame2_resized = cv2.resize(frame2, (width, height), interpolation=cv2.INTER_AREA)
-        
+    def _blend_frames_with_background(self, frame1, frame2, progress, background_canvas, out):
+        """使用OpenCV合成两帧，包含背景色处理（输入为已缩放到目标尺寸的uint8帧，结果写入out）"""
         # 透明叠化: frame1逐渐淡出，frame2逐渐淡入
         alpha1 = 1.0 - progress  # frame1的透明度
         alpha2 = progress        # frame2的透明度
         
-        # 使用OpenCV的addWeighted进行透明叠化
-        blended = cv2.addWeighted(frame1_resized, alpha1, frame2_resized, alpha2, 0)
+        # RGB：直接把混合结果写入输出
+        if frame1.shape[2] != 4:
+            return cv2.addWeighted(frame1, alpha1, frame2, alpha2, 0, dst=out)
         
-        # 创建背景色画布
-        background_canvas = np.full((height, width, 3), bg_color_bgr, dtype=np.uint8)
+        # 使用OpenCV的addWeighted进行透明叠化
+        blended = cv2.addWeighted(frame1, alpha1, frame2, alpha2, 0)
         
-        # 如果输入帧有Alpha通道，进行Alpha合成
-        if len(blended.shape) == 3 and blended.shape[2] == 4:  # RGBA
-            alpha_channel = blended[:, :, 3] / 255.0
-            rgb_channels = blended[:, :, :3]
-            
-            # Alpha合成到背景
-            for c in range(3):
-                background_canvas[:, :, c] = (
-                    background_canvas[:, :, c] * (1 - alpha_channel) + 
-                    rgb_channels[:, :, c] * alpha_channel
-                ).astype(np.uint8)
-        else:  # RGB，直接使用混合结果
-            background_canvas = blended
+        # 输入帧有Alpha通道（RGBA），进行Alpha合成
+        alpha_channel = blended[:, :, 3].astype(np.float32) / 255.0
+        rgb_channels = np.ascontiguousarray(blended[:, :, :3])
         
-        return background_canvas
+        # Alpha合成到背景：blendLinear一次完成三个通道的加权合成
+        # （背景画布是共享的，结果直接写入out）
+        return cv2.blendLinear(rgb_channels, background_canvas, alpha_channel, 1.0 - alpha_channel, dst=out)
     
-    def _additive_blend(self, frame1, frame2, progress, width, height):
-        """叠加混合：两个视频直接相加，产生更亮的叠加效果"""
-        # 转换为numpy数组
-        if isinstance(frame1, torch.Tensor):
-            frame1 = frame1.cpu().numpy()
-        if isinstance(frame2, torch.Tensor):
-            frame2 = frame2.cpu().numpy()
-        
-        # 确保数据类型正确
-        if frame1.dtype == np.float32 or frame1.dtype == np.float64:
-            frame1 = (frame1 * 255).clip(0, 255).astype(np.uint8)
-        if frame2.dtype == np.float32 or frame2.dtype == np.float64:
-            frame2 = (frame2 * 255).clip(0, 255).astype(np.uint8)
-        
-        # 调整到目标尺寸
-        frame1_resized = cv2.resize(frame1, (width, height), interpolation=cv2.INTER_AREA)
-        frame2_resized = cv2.resize(frame2, (width, height), interpolation=cv2.INTER_AREA)
-        
+    def _additive_blend(self, frame1, frame2, progress, out):
+        """叠加混合：两个视频直接相加，产生更亮的叠加效果（结果写入out）"""
         # 🎯 真正的叠加：使用Screen混合模式或增强的加法混合
         # Screen模式公式: 1 - (1-A) * (1-B)
         # 效果：两个视频相加但不会过度曝光，产生发光叠加效果
@@ -275,139 +265,46 @@ class VideoCrossfadeNode(ComfyNodeABC):
             alpha1 = (1.0 - progress) * 2  # 1 -> 0
             alpha2 = 1.0
         
-        # 先转换为float并归一化到0-1
-        frame1_norm = frame1_resized.astype(np.float32) / 255.0
-        frame2_norm = frame2_resized.astype(np.float32) / 255.0
-        
         # 🔥 使用Screen混合模式：1 - (1-A) * (1-B)
         # 这样两个亮的区域叠加会更亮，但不会完全过曝
-        screen_blend = 1.0 - (1.0 - frame1_norm * alpha1) * (1.0 - frame2_norm * alpha2)
-        
-        # 转换回0-255
-        blended = (screen_blend * 255.0).clip(0, 255).astype(np.uint8)
-        
-        return blended
+        # uint8形式：255 - (255-A) * (255-B) / 255，用取反代替减法，全程不会溢出
+        # 每帧的权重是标量，"按权重缩放+取反"预先做成256项查找表，一次cv2.LUT完成
+        inverse_lut1 = self._inverse_scale_lut(alpha1)
+        inverse_lut2 = self._inverse_scale_lut(alpha2)
+        inverse_product = cv2.multiply(
+            cv2.LUT(frame1, inverse_lut1), cv2.LUT(frame2, inverse_lut2), scale=1.0 / 255.0
+        )
+        return cv2.bitwise_not(inverse_product, dst=out)
     
-    def _chromatic_blend(self, frame1, frame2, progress, width, height):
-        """色散叠化：RGB通道错位混合，产生色散/色差效果"""
-        # 转换为numpy数组
-        if isinstance(frame1, torch.Tensor):
-            frame1 = frame1.cpu().numpy()
-        if isinstance(frame2, torch.Tensor):
-            frame2 = frame2.cpu().numpy()
-        
-        # 确保数据类型正确
-        if frame1.dtype == np.float32 or frame1.dtype == np.float64:
-            frame1 = (frame1 * 255).clip(0, 255).astype(np.uint8)
-        if frame2.dtype == np.float32 or frame2.dtype == np.float64:
-            frame2 = (frame2 * 255).clip(0, 255).astype(np.uint8)
-        
-        # 调整到目标尺寸
-        frame1_resized = cv2.resize(frame1, (width, height), interpolation=cv2.INTER_AREA)
-        frame2_resized = cv2.resize(frame2, (width, height), interpolation=cv2.INTER_AREA)
-        
+    def _inverse_scale_lut(self, alpha):
+        """生成查找表：像素值v映射为 255 - saturate(round(v * alpha))"""
+        levels = np.arange(256, dtype=np.float32)
+        scaled = np.clip(np.rint(levels * alpha), 0, 255)
+        return (255 - scaled).astype(np.uint8)
+    
+    def _chromatic_blend(self, frame1, frame2, progress, out):
+        """色散叠化：RGB通道错位混合，产生色散/色差效果（结果写入out）"""
         # 计算通道偏移量（在转场中间最大）
         # 使用sin曲线使偏移平滑
         max_offset = 10  # 最大偏移像素
         offset_intensity = np.sin(progress * np.pi)  # 0 -> 1 -> 0
         offset = int(max_offset * offset_intensity)
         
-        # 创建输出图像
-        blended = np.zeros_like(frame1_resized)
-        
         # 计算混合权重
         alpha1 = 1.0 - progress
         alpha2 = progress
         
-        # 分别处理RGB三个通道，每个通道施加不同的偏移
-        # R通道：向右偏移
+        # 对frame1的通道做错位（R通道向右、B通道向左，G通道不偏移），
+        # 边缘未被覆盖的区域保留原像素；frame2不偏移
+        # 拆成连续的单通道平面后再平移，避免在交错的通道上做跨步写入
+        planes = list(cv2.split(frame1))
         if offset > 0:
-            # frame1的R通道向右偏移
-            blended[:, offset:, 2] = (
-                frame1_resized[:, :-offset, 2].astype(np.float32) * alpha1 +
-                frame2_resized[:, offset:, 2].astype(np.float32) * alpha2
-            ).astype(np.uint8)
-            blended[:, :offset, 2] = (
-                frame1_resized[:, :offset, 2].astype(np.float32) * alpha1 +
-                frame2_resized[:, :offset, 2].astype(np.float32) * alpha2
-            ).astype(np.uint8)
-        else:
-            blended[:, :, 2] = (
-                frame1_resized[:, :, 2].astype(np.float32) * alpha1 +
-                frame2_resized[:, :, 2].astype(np.float32) * alpha2
-            ).astype(np.uint8)
-        
-        # G通道：不偏移（中心）
-        blended[:, :, 1] = (
-            frame1_resized[:, :, 1].astype(np.float32) * alpha1 +
-            frame2_resized[:, :, 1].astype(np.float32) * alpha2
-        ).astype(np.uint8)
-        
-        # B通道：向左偏移
-        if offset > 0:
-            # frame1的B通道向左偏移
-            blended[:, :-offset, 0] = (
-                frame1_resized[:, offset:, 0].astype(np.float32) * alpha1 +
-                frame2_resized[:, :-offset, 0].astype(np.float32) * alpha2
-            ).astype(np.uint8)
-            blended[:, -offset:, 0] = (
-                frame1_resized[:, -offset:, 0].astype(np.float32) * alpha1 +
-                frame2_resized[:, -offset:, 0].astype(np.float32) * alpha2
-            ).astype(np.uint8)
-        else:
-            blended[:, :, 0] = (
-                frame1_resized[:, :, 0].astype(np.float32) * alpha1 +
-                frame2_resized[:, :, 0].astype(np.float32) * alpha2
-            ).astype(np.uint8)
-        
-        return blended
-    
-    def _blend_frames(self, frame1, frame2, progress):
-        """使用OpenCV合成两帧"""
-        # 转换为numpy数组
-        if isinstance(frame1, torch.Tensor):
-            frame1 = frame1.cpu().numpy()
-        if isinstance(frame2, torch.Tensor):
-            frame2 = frame2.cpu().numpy()
-        
-        # 确保数据类型正确
-        if frame1.dtype == np.float32 or frame1.dtype == np.float64:
-            frame1 = (frame1 * 255).clip(0, 255).astype(np.uint8)
-        if frame2.dtype == np.float32 or frame2.dtype == np.float64:
-            frame2 = (frame2 * 255).clip(0, 255).astype(np.uint8)
-        
-        # 确保尺寸一致
-        if frame1.shape != frame2.shape:
-            frame2 = cv2.resize(frame2, (frame1.shape[1], frame1.shape[0]))
-        
-        # 透明叠化: frame1逐渐淡出，frame2逐渐淡入
-        alpha1 = 1.0 - progress  # frame1的透明度
-        alpha2 = progress        # frame2的透明度
-        
-        # 使用OpenCV的addWeighted进行透明叠化
-        blended = cv2.addWeighted(frame1, alpha1, frame2, alpha2, 0)
-        
-        return blended
-    
-    def _frames_to_tensor(self, frames):
-        """将帧列表转换为视频tensor"""
-        if not frames:
-            return torch.zeros((1, 1080, 1920, 3), dtype=torch.float32)
-        
-        # 转换为tensor
-        frame_tensors = []
-        for frame in frames:
-            if isinstance(frame, np.ndarray):
-                # 转换为float32并归一化
-                frame_tensor = torch.from_numpy(frame).float() / 255.0
-                frame_tensors.append(frame_tensor)
-            else:
-                frame_tensors.append(frame)
-        
-        # 堆叠成视频tensor [B, H, W, C]
-        video_tensor = torch.stack(frame_tensors, dim=0)
+            planes[2][:, offset:] = planes[2][:, :-offset]
+            planes[0][:, :-offset] = planes[0][:, offset:]
+        shifted1 = cv2.merge(planes)
         
-        return video_tensor
+        # 一次addWeighted完成三个通道的乘加和uint8饱和转换
+        return cv2.addWeighted(shifted1, alpha1, frame2, alpha2, 0, dst=out)
 
 
 # 注册节点
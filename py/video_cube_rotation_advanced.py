@@ -4,6 +4,7 @@
 """
 
 import torch
+import torch.nn.functional as F
 import cv2
 import numpy as np
 from PIL import Image
@@ -73,6 +74,9 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
             [4, 5, 1, 0],  # 下面 (bottom)
         ]
         
+        # 面顶点索引数组，便于向量化计算所有面 [6, 4]
+        self.cube_face_indices = np.array(self.cube_faces)
+        
         # 面名称映射
         self.face_names = ['front', 'back', 'right', 'left', 'top', 'bottom']
     
@@ -98,23 +102,32 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
         
         print(f"Starting cube rotation: {rotation_style}, {int(duration * fps)} frames")
         
-        # 处理6个面的视频数据
-        video_frames_data = self._process_cube_videos(
-            video_front, video_back, video_left, video_right, video_top, video_bottom
-        )
+        videos = [video_front, video_back, video_left, video_right, video_top, video_bottom]
         
         # 计算总帧数
         total_frames = int(duration * fps)
         
         # 统计视频面数
-        face_count = sum(1 for frames in video_frames_data if len(frames) > 0)
+        face_count = sum(1 for video in videos if video is not None)
         print(f"Video cube faces: {face_count}/6 faces provided, generating {total_frames} frames")
         
-        # 纯Python渲染（不使用Playwright）
-        video_tensor = self._render_with_opencv(
-            video_frames_data, rotation_style, rotation_speed,
-            total_frames, width, height, cube_size, perspective, background_color
-        )
+        if torch.cuda.is_available():
+            # GPU渲染：纹理留在显存中，用grid_sample完成每个面的透视变换
+            print("Rendering cube on GPU with torch grid_sample")
+            video_tensor = self._render_with_torch(
+                videos, rotation_style, rotation_speed,
+                total_frames, width, height, cube_size, perspective, background_color,
+                torch.device("cuda")
+            )
+        else:
+            # 处理6个面的视频数据
+            video_frames_data = self._process_cube_videos(*videos)
+            
+            # 纯Python渲染（不使用Playwright）
+            video_tensor = self._render_with_opencv(
+                video_frames_data, rotation_style, rotation_speed,
+                total_frames, width, height, cube_size, perspective, background_color
+            )
         
         return (video_tensor,)
     
@@ -142,6 +155,26 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
         
         return video_frames_data
     
+    def _prepare_face_textures(self, videos, device):
+        """将6个面的视频转换为设备上的float纹理 [B, 3, H, W]"""
+        face_textures = []
+        
+        for i, video_tensor in enumerate(videos):
+            if video_tensor is not None:
+                if video_tensor.dim() != 4:
+                    raise ValueError(f"{self.face_names[i]} video tensor must be 4D format [B, H, W, C], current: {video_tensor.shape}")
+                
+                texture = video_tensor[..., :3].to(device).permute(0, 3, 1, 2)
+                if texture.is_floating_point():
+                    texture = texture.float().clamp(0, 1)
+                else:
+                    texture = texture.float() / 255.0
+                face_textures.append(texture)
+            else:
+                face_textures.append(torch.zeros((1, 3, 512, 512), dtype=torch.float32, device=device))
+        
+        return face_textures
+    
     def _tensor_to_numpy(self, tensor):
         """将tensor转换为numpy数组"""
         if tensor.dim() == 4:
@@ -175,17 +208,20 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
         
         frames = []
         
+        # 顶点缩放与帧无关，旋转和投影一次性为所有帧批量计算
+        progresses = [i / max(total_frames - 1, 1) for i in range(total_frames)]
+        projected_all, depths_all = self._project_all_frames(
+            rotation_style, progresses, rotation_speed, cube_size, perspective, width, height
+        )
+        
         for i in range(total_frames):
-            progress = i / max(total_frames - 1, 1)
+            progress = progresses[i]
             
             # 创建背景
             frame = np.full((height, width, 3), bg_color, dtype=np.uint8)
             
-            # 计算旋转矩阵
-            rotation_matrix = self._calculate_rotation_matrix(rotation_style, progress, rotation_speed)
-            
             # 渲染立方体
-            self._render_cube(frame, video_frames_data, rotation_matrix, progress, cube_size, perspective, width, height)
+            self._render_cube(frame, video_frames_data, projected_all[i], depths_all[i], progress)
             
             # 转换为tensor
             frame_tensor = torch.from_numpy(frame.astype(np.float32) / 255.0)
@@ -202,6 +238,114 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
         
         return video_tensor
     
+    def _render_with_torch(
+        self, 
+        videos, 
+        rotation_style, 
+        rotation_speed,
+        total_frames, 
+        width, 
+        height, 
+        cube_size, 
+        perspective, 
+        background_color,
+        device
+    ):
+        """使用torch在GPU上渲染"""
+        
+        # 解析背景颜色
+        bg_color = self._parse_background_color(background_color)
+        background = torch.tensor(bg_color, dtype=torch.float32, device=device).div_(255.0)
+        background = background.view(3, 1, 1).expand(3, height, width).contiguous()
+        
+        face_textures = self._prepare_face_textures(videos, device)
+        
+        # 输出像素中心的齐次坐标 [H*W, 3]，所有帧和所有面共用
+        ys, xs = torch.meshgrid(
+            torch.arange(height, dtype=torch.float32, device=device),
+            torch.arange(width, dtype=torch.float32, device=device),
+            indexing='ij'
+        )
+        dst_coords = torch.stack([xs, ys, torch.ones_like(xs)], dim=-1).view(-1, 3)
+        
+        progresses = [i / max(total_frames - 1, 1) for i in range(total_frames)]
+        projected_all, depths_all = self._project_all_frames(
+            rotation_style, progresses, rotation_speed, cube_size, perspective, width, height
+        )
+        
+        video_tensor = torch.empty((total_frames, height, width, 3), dtype=torch.float32)
+        
+        for i in range(total_frames):
+            frame = background.clone()
+            
+            # 与OpenCV路径相同：背面剔除后按深度从远到近绘制
+            face_vertices = projected_all[i][self.cube_face_indices]
+            visible = self._is_face_visible(face_vertices)
+            face_depths = depths_all[i][self.cube_face_indices].mean(axis=1)
+            for face_idx in np.argsort(-face_depths):
+                if visible[face_idx]:
+                    self._render_face_torch(frame, face_vertices[face_idx], face_textures[face_idx], progresses[i], dst_coords)
+            
+            video_tensor[i] = frame.permute(1, 2, 0).cpu()
+            
+            # 显示进度 - 每20帧或完成时显示
+            if (i + 1) % 20 == 0 or i == total_frames - 1:
+                progress_pct = (i + 1) / total_frames * 100
+                print(f"Rendering frames {i + 1}/{total_frames} ({progress_pct:.1f}%)")
+        
+        print(f"Cube rotation completed: {video_tensor.shape}")
+        
+        return video_tensor
+    
+    def _render_face_torch(self, frame, face_vertices, face_texture, progress, dst_coords):
+        """在GPU上渲染立方体的一个面：逆透视映射生成采样网格，grid_sample后写入面所在区域"""
+        
+        # 计算当前帧索引
+        total_frames = face_texture.shape[0]
+        frame_index = int(progress * (total_frames - 1))
+        frame_index = max(0, min(frame_index, total_frames - 1))
+        
+        # 获取当前帧 [1, 3, h, w]
+        current_frame = face_texture[frame_index:frame_index + 1]
+        src_height, src_width = current_frame.shape[-2:]
+        
+        src_points = np.array([
+            [0, 0],
+            [src_width, 0],
+            [src_width, src_height],
+            [0, src_height]
+        ], dtype=np.float32)
+        
+        # 直接求 屏幕 -> 纹理 的逆变换矩阵
+        try:
+            inverse_matrix = cv2.getPerspectiveTransform(face_vertices.astype(np.float32), src_points)
+        except cv2.error:
+            # 如果变换失败，跳过这个面
+            return
+        
+        inverse_matrix = torch.from_numpy(inverse_matrix).to(device=frame.device, dtype=torch.float32)
+        
+        # 每个输出像素在纹理中的坐标
+        src_coords = dst_coords @ inverse_matrix.T
+        w = src_coords[:, 2]
+        u = src_coords[:, 0] / w
+        v = src_coords[:, 1] / w
+        
+        # 与BORDER_TRANSPARENT一致：只写入映射到纹理内部的像素
+        inside = (w > 0) & (u >= 0) & (u <= src_width - 1) & (v >= 0) & (v <= src_height - 1)
+        inside = inside.view(1, *frame.shape[1:])
+        
+        # 像素中心坐标归一化到 [-1, 1]（align_corners=False）
+        height, width = frame.shape[1:]
+        grid = torch.stack([
+            (u + 0.5) / src_width * 2 - 1,
+            (v + 0.5) / src_height * 2 - 1,
+        ], dim=-1).view(1, height, width, 2)
+        
+        sampled = F.grid_sample(current_frame, grid, mode='bilinear', padding_mode='border', align_corners=False)[0]
+        
+        frame.copy_(torch.where(inside, sampled, frame))
+    
     def _parse_background_color(self, color_str):
         """解析背景颜色字符串"""
         if color_str.startswith('#'):
@@ -270,51 +414,61 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
             [0, 0, 1]
         ], dtype=np.float32)
     
-    def _render_cube(self, frame, video_frames_data, rotation_matrix, progress, cube_size, perspective, width, height):
-        """渲染立方体"""
+    def _project_all_frames(self, rotation_style, progresses, rotation_speed, cube_size, perspective, width, height):
+        """批量计算所有帧的投影顶点 [F, 8, 2] 和旋转后的顶点深度 [F, 8]"""
         
-        # 缩放立方体
+        # 缩放立方体（所有帧共用）
         scale = cube_size * min(width, height) / 4
         vertices = self.cube_vertices * scale
         
-        # 应用旋转
-        rotated_vertices = np.dot(vertices, rotation_matrix.T)
+        # 所有帧的旋转矩阵 [F, 3, 3]
+        rotation_matrices = np.stack([
+            self._calculate_rotation_matrix(rotation_style, progress, rotation_speed)
+            for progress in progresses
+        ])
+        
+        # 应用旋转 [F, 8, 3]
+        rotated_vertices = np.einsum('fij,vj->fvi', rotation_matrices, vertices)
         
         # 透视投影
         projected_vertices = self._perspective_projection(rotated_vertices, perspective, width, height)
         
-        # 渲染每个面
-        for face_idx, face_vertex_indices in enumerate(self.cube_faces):
+        return projected_vertices, rotated_vertices[..., 2]
+    
+    def _render_cube(self, frame, video_frames_data, projected_vertices, vertex_depths, progress):
+        """渲染立方体"""
+        
+        # 所有面的4个投影顶点 [6, 4, 2]
+        face_vertices = projected_vertices[self.cube_face_indices]
+        
+        # 检查面是否可见（简单的背面剔除，6个面一次计算）
+        visible = self._is_face_visible(face_vertices)
+        
+        # 画家算法：按面的平均深度从远到近绘制，被剔除的面不做透视变换
+        face_depths = vertex_depths[self.cube_face_indices].mean(axis=1)
+        for face_idx in np.argsort(-face_depths):
+            if not visible[face_idx]:
+                continue
             if face_idx < len(video_frames_data) and video_frames_data[face_idx]:
-                self._render_face(frame, face_vertex_indices, projected_vertices, 
-                                video_frames_data[face_idx], progress, face_idx)
+                self._render_face(frame, face_vertices[face_idx], video_frames_data[face_idx], progress)
     
     def _perspective_projection(self, vertices, perspective, width, height):
         """透视投影"""
-        # 将3D点投影到2D屏幕
-        projected = np.zeros((len(vertices), 2), dtype=np.float32)
-        
-        for i, vertex in enumerate(vertices):
-            if vertex[2] + perspective > 0:  # 避免除零
-                # 透视投影
-                x = (vertex[0] * perspective) / (vertex[2] + perspective)
-                y = (vertex[1] * perspective) / (vertex[2] + perspective)
-                
-                # 转换到屏幕坐标
-                projected[i][0] = x + width / 2
-                projected[i][1] = y + height / 2
+        # 将3D点投影到2D屏幕（所有顶点一次向量化计算，支持 [..., 3] 批量输入）
+        depth = vertices[..., 2:3] + perspective
+        visible = depth > 0  # 避免除零
         
-        return projected
-    
-    def _render_face(self, frame, face_vertex_indices, projected_vertices, face_frames, progress, face_idx):
-        """渲染立方体的一个面"""
+        # 透视投影，并转换到屏幕坐标
+        scale = np.divide(perspective, depth, out=np.zeros_like(depth), where=visible)
+        projected = vertices[..., :2] * scale + np.array([width / 2, height / 2], dtype=np.float32)
         
-        # 获取面的4个顶点
-        face_vertices = projected_vertices[face_vertex_indices]
+        # 摄像机后方的顶点保持为原点
+        projected[~visible[..., 0]] = 0
         
-        # 检查面是否可见（简单的背面剔除）
-        if not self._is_face_visible(face_vertices):
-            return
+        return projected.astype(np.float32)
+    
+    def _render_face(self, frame, face_vertices, face_frames, progress):
+        """渲染立方体的一个面（face_vertices为该面的4个投影顶点）"""
         
         # 计算当前帧索引
         total_frames = len(face_frames)
@@ -338,28 +492,25 @@ class VideoCubeRotationAdvancedNode(ComfyNodeABC):
         try:
             transform_matrix = cv2.getPerspectiveTransform(src_points, dst_points)
             
-            # 应用透视变换
-            warped = cv2.warpPerspective(current_frame, transform_matrix, (frame.shape[1], frame.shape[0]))
-            
-            # 创建掩码
-            mask = np.zeros((frame.shape[0], frame.shape[1]), dtype=np.uint8)
-            cv2.fillPoly(mask, [dst_points.astype(np.int32)], 255)
-            
-            # 合成到帧上
-            frame[mask > 0] = warped[mask > 0]
+            # 应用透视变换，直接写入帧：BORDER_TRANSPARENT只覆盖映射到源图内部的像素，
+            # 即面所在的四边形区域，无需再构造掩码和做选择性拷贝
+            cv2.warpPerspective(
+                current_frame, transform_matrix, (frame.shape[1], frame.shape[0]),
+                dst=frame, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT
+            )
             
         except cv2.error:
             # 如果变换失败，跳过这个面
             pass
     
     def _is_face_visible(self, face_vertices):
-        """简单的背面剔除"""
+        """简单的背面剔除（支持 [..., 4, 2] 批量输入）"""
         # 计算面的法向量（简化版本）
-        v1 = face_vertices[1] - face_vertices[0]
-        v2 = face_vertices[2] - face_vertices[0]
+        v1 = face_vertices[..., 1, :] - face_vertices[..., 0, :]
+        v2 = face_vertices[..., 2, :] - face_vertices[..., 0, :]
         
         # 叉积计算法向量
-        normal_z = v1[0] * v2[1] - v1[1] * v2[0]
+        normal_z = v1[..., 0] * v2[..., 1] - v1[..., 1] * v2[..., 0]
         
         # 如果法向量指向屏幕外，则面不可见
         return normal_z > 0
@@ -1,9 +1,13 @@
 """
-视频立方体转场节点 - Playwright版本（批处理优化）
+视频立方体转场节点 - OpenCV / torch GPU / Playwright + WebGL版本（批处理优化）
 两个视频片段之间的3D立方体旋转转场效果，支持批处理和内存优化
 """
 
+import os
+import base64
+import concurrent.futures
 import torch
+import torch.nn.functional as F
 import json
 import cv2
 import numpy as np
@@ -11,6 +15,283 @@ import math
 import time
 from comfy.comfy_types.node_typing import ComfyNodeABC, InputTypeDict, IO
 
+from ._browser_pool import shared_browser
+from ._colors import parse_hex_color
+
+
+# 静态渲染页面：每个进程只解析一次，渲染参数通过 cubeController.init 传入
+_HTML_SHELL = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+        
+        body {
+            overflow: hidden;
+        }
+        
+        #cubeCanvas {
+            display: none;
+        }
+        
+        #stripCanvas {
+            display: block;
+            will-change: transform;
+            transform: translateZ(0);
+        }
+    </style>
+</head>
+<body>
+    <canvas id="cubeCanvas"></canvas>
+    <canvas id="stripCanvas"></canvas>
+    
+    <script>
+        const VERTEX_SHADER = `#version 300 es
+            in vec4 aPosition;
+            in vec2 aTexCoord;
+            out vec2 vTexCoord;
+            void main() {
+                gl_Position = aPosition;
+                vTexCoord = aTexCoord;
+            }`;
+        
+        const FRAGMENT_SHADER = `#version 300 es
+            precision mediump float;
+            in vec2 vTexCoord;
+            uniform sampler2D uTexture;
+            out vec4 outColor;
+            void main() {
+                outColor = texture(uTexture, vTexCoord);
+            }`;
+        
+        // 列主序4x4矩阵（与CSS matrix3d一致）
+        function mat4Multiply(a, b) {
+            const out = new Array(16);
+            for (let col = 0; col < 4; col++) {
+                for (let row = 0; row < 4; row++) {
+                    let sum = 0;
+                    for (let k = 0; k < 4; k++) {
+                        sum += a[k * 4 + row] * b[col * 4 + k];
+                    }
+                    out[col * 4 + row] = sum;
+                }
+            }
+            return out;
+        }
+        
+        function mat4Rotate(axis, degrees) {
+            const rad = degrees * Math.PI / 180;
+            const c = Math.cos(rad), s = Math.sin(rad);
+            if (axis === 'y') {
+                return [c, 0, -s, 0,  0, 1, 0, 0,  s, 0, c, 0,  0, 0, 0, 1];
+            }
+            return [1, 0, 0, 0,  0, c, s, 0,  0, -s, c, 0,  0, 0, 0, 1];
+        }
+        
+        function mat4Scale(sx, sy) {
+            return [sx, 0, 0, 0,  0, sy, 0, 0,  0, 0, 1, 0,  0, 0, 0, 1];
+        }
+        
+        function mat4TranslateZ(z) {
+            return [1, 0, 0, 0,  0, 1, 0, 0,  0, 0, 1, 0,  0, 0, z, 1];
+        }
+        
+        class CubeController {
+            constructor() {
+                this.canvas = document.getElementById('cubeCanvas');
+                this.strip = document.getElementById('stripCanvas').getContext('2d');
+                this.gl = this.canvas.getContext('webgl2', { preserveDrawingBuffer: true });
+                this.images = [[], []];
+                this.textureIndices = [-1, -1];
+                this.uvRects = [[0, 0, 1, 1], [0, 0, 1, 1]];
+                this.vertexData = new Float32Array(2 * 4 * 6);
+                
+                this._initGL();
+                this.ready = true;
+            }
+            
+            init(params) {
+                // 每次渲染的参数由Python传入，页面本身是静态的
+                this.direction = params.direction;
+                this.axis = this.direction === 'horizontal' ? 'y' : 'x';
+                this.cubeWidth = params.cubeWidth;
+                this.cubeHeight = params.cubeHeight;
+                // 水平立方体深度使用宽度的一半，垂直立方体使用高度的一半（重要！）
+                this.cubeDepth = this.direction === 'horizontal' ? this.cubeWidth / 2 : this.cubeHeight / 2;
+                this.perspective = params.perspective;
+                this.rotationAngle = params.rotationAngle;
+                this.currentAngle = 0;
+                
+                // 两个面的模型矩阵：正面 translateZ，第二个面先旋转90度再 translateZ
+                this.faceMatrices = [
+                    mat4TranslateZ(this.cubeDepth),
+                    mat4Multiply(mat4Rotate(this.axis, 90), mat4TranslateZ(this.cubeDepth))
+                ];
+                
+                // WebGL画布为一帧大小，长图为一个批次的高度
+                this.canvas.width = params.width;
+                this.canvas.height = params.height;
+                this.strip.canvas.width = params.width;
+                this.strip.canvas.height = params.height * params.batchSize;
+                document.body.style.width = `${params.width}px`;
+                document.body.style.height = `${params.height * params.batchSize}px`;
+                document.body.style.background = params.backgroundColor;
+                this.gl.viewport(0, 0, params.width, params.height);
+                this.textureIndices = [-1, -1];
+            }
+            
+            _initGL() {
+                const gl = this.gl;
+                const program = gl.createProgram();
+                [[gl.VERTEX_SHADER, VERTEX_SHADER], [gl.FRAGMENT_SHADER, FRAGMENT_SHADER]].forEach(([type, source]) => {
+                    const shader = gl.createShader(type);
+                    gl.shaderSource(shader, source);
+                    gl.compileShader(shader);
+                    gl.attachShader(program, shader);
+                });
+                gl.linkProgram(program);
+                gl.useProgram(program);
+                
+                this.buffer = gl.createBuffer();
+                gl.bindBuffer(gl.ARRAY_BUFFER, this.buffer);
+                gl.bufferData(gl.ARRAY_BUFFER, this.vertexData.byteLength, gl.DYNAMIC_DRAW);
+                
+                const positionLoc = gl.getAttribLocation(program, 'aPosition');
+                const texCoordLoc = gl.getAttribLocation(program, 'aTexCoord');
+                gl.enableVertexAttribArray(positionLoc);
+                gl.vertexAttribPointer(positionLoc, 4, gl.FLOAT, false, 24, 0);
+                gl.enableVertexAttribArray(texCoordLoc);
+                gl.vertexAttribPointer(texCoordLoc, 2, gl.FLOAT, false, 24, 16);
+                
+                // 背面剔除代替 backface-visibility: hidden
+                gl.enable(gl.CULL_FACE);
+                gl.clearColor(0, 0, 0, 0);
+                
+                this.textures = [0, 1].map(() => {
+                    const texture = gl.createTexture();
+                    gl.bindTexture(gl.TEXTURE_2D, texture);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MIN_FILTER, gl.LINEAR);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MAG_FILTER, gl.LINEAR);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_S, gl.CLAMP_TO_EDGE);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_T, gl.CLAMP_TO_EDGE);
+                    return texture;
+                });
+            }
+            
+            async setSources(count1, count2) {
+                // 通过getFrameBytes逐个拉取源帧，createImageBitmap在后台线程解码，每帧只解码一次
+                this.images = await Promise.all([count1, count2].map((count, face) => Promise.all(
+                    Array.from({ length: count }, async (_, index) => {
+                        const url = await window.getFrameBytes(index, face);
+                        const blob = await (await fetch(url)).blob();
+                        return createImageBitmap(blob);
+                    })
+                )));
+                this.textureIndices = [-1, -1];
+            }
+            
+            _uploadTexture(face, index) {
+                // 同一张图片只上传一次
+                if (this.textureIndices[face] === index) return;
+                
+                const image = this.images[face][index];
+                const gl = this.gl;
+                gl.bindTexture(gl.TEXTURE_2D, this.textures[face]);
+                gl.texImage2D(gl.TEXTURE_2D, 0, gl.RGBA, gl.RGBA, gl.UNSIGNED_BYTE, image);
+                this.textureIndices[face] = index;
+                
+                // 等效 background-size: cover + background-position: center
+                const coverScale = Math.max(this.cubeWidth / image.width, this.cubeHeight / image.height);
+                const du = this.cubeWidth / (image.width * coverScale) / 2;
+                const dv = this.cubeHeight / (image.height * coverScale) / 2;
+                this.uvRects[face] = [0.5 - du, 0.5 - dv, 0.5 + du, 0.5 + dv];
+            }
+            
+            renderBatch(progresses, frame1Indices, frame2Indices) {
+                const frameWidth = this.canvas.width;
+                const frameHeight = this.canvas.height;
+                for (let k = 0; k < progresses.length; k++) {
+                    this._uploadTexture(0, frame1Indices[k]);
+                    this._uploadTexture(1, frame2Indices[k]);
+                    this.updateRotation(progresses[k]);
+                    
+                    // WebGL画布是透明背景，拷贝到长图对应位置，背景色由body提供
+                    this.strip.clearRect(0, k * frameHeight, frameWidth, frameHeight);
+                    this.strip.drawImage(this.canvas, 0, k * frameHeight);
+                }
+                
+                // 双重rAF：确保长图已经绘制，替代固定等待
+                return new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+            }
+            
+            updateRotation(progress) {
+                // progress: 0 -> 1
+                const angle = progress * this.rotationAngle;
+                this.currentAngle = angle;
+                
+                // 🎯 优化缩放曲线：开始和结束填满画布，中间缩小显示立方体3D效果
+                // 使用平滑的sin曲线：1.0 -> 0.65 -> 1.0
+                let scale;
+                if (progress < 0.05 || progress > 0.95) {
+                    // 阶段1和阶段4：保持完整显示
+                    scale = 1.0;
+                } else {
+                    // 阶段2-3（0.05 -> 0.95）：使用sin曲线平滑缩放
+                    const t = (progress - 0.05) / 0.9;  // 归一化到0-1
+                    const sinValue = Math.sin(t * Math.PI);  // 0 -> 1 -> 0
+                    scale = 1.0 - (sinValue * 0.35);  // 1.0 -> 0.65 -> 1.0
+                }
+                
+                // 容器变换：rotate(-angle) scale(scale)
+                const containerMatrix = mat4Multiply(mat4Rotate(this.axis, -angle), mat4Scale(scale, scale));
+                
+                // 面的四个角（面中心为原点，y轴向下），宽度多1px避免接缝
+                const halfW = (this.cubeWidth + 1) / 2;
+                const halfH = this.cubeHeight / 2;
+                const corners = [[-halfW, -halfH], [-halfW, halfH], [halfW, -halfH], [halfW, halfH]];
+                const viewHalfW = this.canvas.width / 2;
+                const viewHalfH = this.canvas.height / 2;
+                
+                let offset = 0;
+                for (let face = 0; face < 2; face++) {
+                    const m = mat4Multiply(containerMatrix, this.faceMatrices[face]);
+                    const [u0, v0, u1, v1] = this.uvRects[face];
+                    for (const [x, y] of corners) {
+                        const px = m[0] * x + m[4] * y + m[12];
+                        const py = m[1] * x + m[5] * y + m[13];
+                        const pz = m[2] * x + m[6] * y + m[14];
+                        // 透视：w = (perspective - z) / perspective，由GPU做透视除法
+                        this.vertexData[offset++] = px / viewHalfW;
+                        this.vertexData[offset++] = -py / viewHalfH;
+                        this.vertexData[offset++] = 0;
+                        this.vertexData[offset++] = (this.perspective - pz) / this.perspective;
+                        this.vertexData[offset++] = x < 0 ? u0 : u1;
+                        this.vertexData[offset++] = y < 0 ? v0 : v1;
+                    }
+                }
+                
+                const gl = this.gl;
+                gl.bufferSubData(gl.ARRAY_BUFFER, 0, this.vertexData);
+                gl.clear(gl.COLOR_BUFFER_BIT);
+                for (let face = 0; face < 2; face++) {
+                    gl.bindTexture(gl.TEXTURE_2D, this.textures[face]);
+                    gl.drawArrays(gl.TRIANGLE_STRIP, face * 4, 4);
+                }
+            }
+        }
+        
+        window.cubeController = new CubeController();
+    </script>
+</body>
+</html>
+"""
+
 
 class VideoCubeTransitionNode(ComfyNodeABC):
     """视频立方体转场 - 两个视频之间的3D立方体旋转转场（批处理优化版）"""
@@ -68,8 +349,8 @@ class VideoCubeTransitionNode(ComfyNodeABC):
         print(f"Starting cube transition: {direction}, {total_frames} frames")
         
         # 提取视频帧
-        frames1 = self._extract_video_frames(video1)
-        frames2 = self._extract_video_frames(video2)
+        frames1 = self._tensor_to_numpy(video1)
+        frames2 = self._tensor_to_numpy(video2)
         print(f"Video frames: {len(frames1)} -> {len(frames2)}, generating {total_frames} transition frames")
         
         # 🎯 立方体面尺寸直接使用画布尺寸（矩形面）
@@ -79,122 +360,33 @@ class VideoCubeTransitionNode(ComfyNodeABC):
         # 解析背景颜色
         bg_color_bgr = self._parse_background_color(background_color)
         
-        # 预计算优化：提前计算所有帧的base64数据
-        precompute_start = time.time()
+        # 预分配输出缓冲区，各渲染路径直接写入
+        output_frames = np.empty((total_frames, height, width, 3), dtype=np.uint8)
         
-        frame1_base64_list = []
-        frame2_base64_list = []
-        
-        for i in range(total_frames):
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 获取对应的帧
-            if len(frames1) == 1:
-                frame1_data = self._tensor_to_numpy(frames1[0])
-            else:
-                frame1_idx = min(int(progress * (len(frames1) - 1)), len(frames1) - 1)
-                frame1_data = self._tensor_to_numpy(frames1[frame1_idx])
-            
-            if len(frames2) == 1:
-                frame2_data = self._tensor_to_numpy(frames2[0])
-            else:
-                frame2_idx = min(int(progress * (len(frames2) - 1)), len(frames2) - 1)
-                frame2_data = self._tensor_to_numpy(frames2[frame2_idx])
-            
-            # 预计算base64数据
-            frame1_base64_list.append(self._numpy_to_base64(frame1_data))
-            frame2_base64_list.append(self._numpy_to_base64(frame2_data))
-        
-        precompute_time = time.time() - precompute_start
-        
-        # 使用Playwright直接渲染3D效果
-        from playwright.async_api import async_playwright
-        
-        playwright = await async_playwright().start()
-        
-        try:
-            # 根据GPU设置选择渲染方式
-            if use_gpu:
-                print("Playwright browser starting with GPU acceleration")
-                # GPU硬件加速
-                browser = await playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--enable-gpu',                    # 启用GPU
-                        '--use-gl=angle',                  # 使用ANGLE（支持GPU）
-                        '--enable-webgl',
-                        '--enable-accelerated-2d-canvas',
-                        '--disable-dev-shm-usage',
-                        '--hide-scrollbars',
-                        '--mute-audio',
-                        '--no-sandbox',                    # 避免权限问题
-                        '--disable-setuid-sandbox',
-                    ]
-                )
-            else:
-                print("Playwright browser starting with SwiftShader (CPU rendering)")
-                # SwiftShader软件渲染
-                browser = await playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--use-angle=swiftshader',         # 强制使用CPU软件渲染
-                        '--enable-webgl',
-                        '--enable-accelerated-2d-canvas',
-                        '--disable-dev-shm-usage',
-                        '--hide-scrollbars',
-                        '--mute-audio',
-                    ]
-                )
-            
-            # 生成HTML模板（传递cube_width、cube_height和direction）
-            html_content = self._generate_html_template(
-                direction, rotation_angle, cube_width, cube_height, perspective, background_color, width, height
+        if use_gpu and torch.cuda.is_available():
+            # GPU：torch grid_sample 成批采样，输入视频已在显存时无需往返拷贝
+            self._render_with_torch(
+                output_frames, video1, video2, direction, total_frames, rotation_angle, cube_width, cube_height,
+                perspective, bg_color_bgr, width, height, torch.device("cuda")
+            )
+        elif use_gpu and self._opencv_cuda_available():
+            # GPU：OpenCV CUDA透视变换，不需要浏览器
+            self._render_with_opencv_cuda(
+                output_frames, frames1, frames2, direction, total_frames, rotation_angle, cube_width, cube_height,
+                perspective, bg_color_bgr, width, height
+            )
+        elif use_gpu:
+            # GPU：Chromium硬件加速WebGL渲染
+            await self._render_with_playwright(
+                output_frames, frames1, frames2, direction, total_frames, rotation_angle, cube_width, cube_height,
+                perspective, batch_size, background_color, width, height
+            )
+        else:
+            # CPU：直接用OpenCV透视变换渲染，不再启动SwiftShader浏览器
+            self._render_with_opencv(
+                output_frames, frames1, frames2, direction, total_frames, rotation_angle, cube_width, cube_height,
+                perspective, bg_color_bgr, width, height
             )
-            
-            # 创建页面
-            page = await browser.new_page(viewport={'width': width, 'height': height})
-            
-            try:
-                # 加载HTML页面
-                await page.set_content(html_content, wait_until='domcontentloaded', timeout=30000)
-                
-                # 等待页面初始化
-                await page.wait_for_function("window.cubeController && window.cubeController.ready", timeout=5000)
-                
-                # 使用生成器进行内存优化
-                output_frames = []
-                render_start = time.time()
-                
-                for batch_start in range(0, total_frames, batch_size):
-                    batch_end = min(batch_start + batch_size, total_frames)
-                    batch_indices = list(range(batch_start, batch_end))
-                    
-                    # 批处理：一次处理多个帧
-                    batch_frames = await self._process_batch(
-                        page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames, rotation_angle
-                    )
-                    
-                    # 立即添加到结果中，避免内存积累
-                    output_frames.extend(batch_frames)
-                    
-                    # 显示进度 - 每2个批次或完成时显示
-                    if batch_end % (batch_size * 2) == 0 or batch_end == total_frames:
-                        progress = (batch_end / total_frames) * 100
-                        elapsed = time.time() - render_start
-                        if batch_end < total_frames:
-                            eta = (elapsed / batch_end) * (total_frames - batch_end)
-                            print(f"Processing frames {batch_end}/{total_frames} ({progress:.1f}%) - ETA: {eta:.1f}s")
-                        else:
-                            print(f"Rendering completed: {batch_end}/{total_frames} frames in {elapsed:.2f}s")
-                
-                render_time = time.time() - render_start
-            
-            finally:
-                await page.close()
-            
-            await browser.close()
-        finally:
-            await playwright.stop()
         
         # 转换为tensor
         video_tensor = self._frames_to_tensor(output_frames)
@@ -204,470 +396,431 @@ class VideoCubeTransitionNode(ComfyNodeABC):
         
         return (video_tensor,)
     
-    async def _process_batch(self, page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames, rotation_angle):
-        """批处理渲染多个帧"""
-        batch_frames = []
+    def _render_with_opencv(self, output_frames, frames1, frames2, direction, total_frames, rotation_angle,
+                            cube_width, cube_height, perspective, bg_color_bgr, width, height):
+        """CPU渲染：每个可见面一次 cv2.warpPerspective"""
+        render_start = time.time()
         
-        for i in batch_indices:
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 使用预计算的base64数据
-            frame1_base64 = frame1_base64_list[i]
-            frame2_base64 = frame2_base64_list[i]
-            
-            # 更新立方体面的背景图片和旋转
-            await page.evaluate(f"""
-                const frontFace = document.getElementById('frontFace');
-                const secondFace = document.getElementById('secondFace');
-                
-                if (frontFace) {{
-                    frontFace.style.backgroundImage = 'url({frame1_base64})';
-                }}
-                
-                if (secondFace) {{
-                    secondFace.style.backgroundImage = 'url({frame2_base64})';
-                }}
-                
-                // 更新旋转
-                if (window.cubeController) {{
-                    window.cubeController.updateRotation({progress});
-                }}
-            """)
-            
-            # 优化等待时间
-            await page.wait_for_timeout(20)  # 从200ms减少到20ms
-            
-            # 强制触发重绘
-            await page.evaluate("document.body.offsetHeight")
-            
-            # 等待CSS动画完成
-            await page.wait_for_timeout(10)  # 从50ms减少到10ms
-            
-            # 优化截图：使用JPEG格式
-            screenshot_bytes = await page.screenshot(type='jpeg', quality=85)
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        screen_points, point_depths = self._project_cube_faces(
+            direction, rotation_angle, progresses, cube_width, cube_height, perspective, width, height
+        )
+        bg_color_rgb = bg_color_bgr[::-1]
+        
+        frame1_indices = self._source_frame_indices(progresses, len(frames1))
+        frame2_indices = self._source_frame_indices(progresses, len(frames2))
+        
+        # 用到的源帧先按cover规则裁剪缩放到面尺寸（每个只做一次），整张纹理即是面，
+        # 否则BORDER_TRANSPARENT会把裁剪区域之外的源像素也画到面外
+        fitted1 = {idx: self._fit_to_face(frames1[idx], cube_width, cube_height) for idx in set(frame1_indices)}
+        fitted2 = {idx: self._fit_to_face(frames2[idx], cube_width, cube_height) for idx in set(frame2_indices)}
+        
+        for i in range(total_frames):
+            face_frames = (fitted1[frame1_indices[i]], fitted2[frame2_indices[i]])
             
-            # 转换为numpy数组
-            from PIL import Image
-            import io
-            image = Image.open(io.BytesIO(screenshot_bytes)).convert('RGB')
-            final_frame = np.array(image).astype(np.uint8)
+            canvas = output_frames[i]
+            canvas[:] = bg_color_rgb
             
-            batch_frames.append(final_frame)
+            # 按平均Z值排序（先绘制远的面）
+            for face in np.argsort(point_depths[i].mean(axis=1)):
+                if not self._is_face_visible(screen_points[i, face], point_depths[i, face], perspective):
+                    continue
+                self._warp_face(canvas, face_frames[face], screen_points[i, face], cube_width, cube_height)
         
-        return batch_frames
+        print(f"Rendering completed: {total_frames}/{total_frames} frames in {time.time() - render_start:.2f}s")
     
-    def _generate_html_template(self, direction, rotation_angle, cube_width, cube_height, perspective, background_color, width, height):
-        """生成HTML模板 - 矩形立方体面（支持水平和垂直方向）"""
-        
-        # 根据方向设置立方体面的变换
+    def _project_cube_faces(self, direction, rotation_angle, progresses, cube_width, cube_height, perspective, width, height):
+        """批量计算所有帧两个面四个角的屏幕坐标 [F,2,4,2] 和Z值 [F,2,4]（与CSS变换一致）"""
+        # 面的四个角（面中心为原点，y轴向下）：左上、左下、右上、右下，宽度多1px避免接缝
+        cube_depth = cube_width / 2 if direction == "horizontal" else cube_height / 2
+        half_w = (cube_width + 1) / 2
+        half_h = cube_height / 2
+        front = np.array([
+            [-half_w, -half_h, cube_depth],
+            [-half_w, half_h, cube_depth],
+            [half_w, -half_h, cube_depth],
+            [half_w, half_h, cube_depth],
+        ])
+        # 第二个面：translateZ 后绕轴旋转90度
+        second = front @ self._rotation_matrices(direction, np.array([90.0]))[0].T
+        faces = np.stack([front, second])
+        
+        # 容器变换：rotate(-angle) scale(scale)，scale只作用于x、y
+        scales = self._scale_curve(progresses)
+        scale_xyz = np.stack([scales, scales, np.ones_like(scales)], axis=-1)
+        rotations = self._rotation_matrices(direction, -progresses * rotation_angle)
+        points = np.einsum('fij,fnkj->fnki', rotations, faces[None] * scale_xyz[:, None, None, :])
+        
+        # 透视投影（perspective-origin 50% 50%）
+        w = (perspective - points[..., 2]) / perspective
+        screen = points[..., :2] / np.maximum(w, 1e-6)[..., None] + np.array([width / 2, height / 2])
+        return screen, points[..., 2]
+    
+    def _rotation_matrices(self, direction, angles):
+        """CSS rotateY/rotateX 的旋转矩阵 [N,3,3]（y轴向下，z轴指向观察者）"""
+        rad = np.radians(angles)
+        c, s = np.cos(rad), np.sin(rad)
+        zeros, ones = np.zeros_like(rad), np.ones_like(rad)
         if direction == "horizontal":
-            # 水平立方体（左右转）：正面 + 右侧面
-            # 深度使用宽度的一半
-            cube_depth = cube_width / 2
-            front_transform = f"translateZ({cube_depth}px)"
-            second_face_transform = f"rotateY(90deg) translateZ({cube_depth}px)"
-            second_face_class = "right"
+            rows = [[c, zeros, s], [zeros, ones, zeros], [-s, zeros, c]]
         else:
-            # 垂直立方体（上下转）：正面 + 底面
-            # 深度使用高度的一半（重要！）
-            cube_depth = cube_height / 2
-            front_transform = f"translateZ({cube_depth}px)"
-            second_face_transform = f"rotateX(90deg) translateZ({cube_depth}px)"
-            second_face_class = "bottom"
-        
-        return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        
-        body {{
-            width: {width}px;
-            height: {height}px;
-            background: {background_color};
-            overflow: hidden;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            perspective: {perspective}px;
-            perspective-origin: 50% 50%;
-        }}
-        
-        .cube-container {{
-            width: {cube_width}px;
-            height: {cube_height}px;
-            position: relative;
-            transform-style: preserve-3d;
-            transform: rotateY(0deg);
-        }}
-        
-        .cube-face {{
-            position: absolute;
-            width: {cube_width + 1}px;
-            height: {cube_height}px;
-            backface-visibility: hidden;
-            background-size: cover;
-            background-position: center;
-            background-repeat: no-repeat;
-            border: none;
-            left: -0.5px;
-        }}
-        
-        .front {{
-            transform: {front_transform};
-        }}
-        
-        .{second_face_class} {{
-            transform: {second_face_transform};
-        }}
-    </style>
-</head>
-<body>
-    <div class="cube-container" id="cubeContainer">
-        <div class="cube-face front" id="frontFace"></div>
-        <div class="cube-face {second_face_class}" id="secondFace"></div>
-    </div>
+            rows = [[ones, zeros, zeros], [zeros, c, -s], [zeros, s, c]]
+        return np.stack([np.stack(row, axis=-1) for row in rows], axis=-2)
     
-    <script>
-        class CubeController {{
-            constructor() {{
-                this.container = document.getElementById('cubeContainer');
-                this.frontFace = document.getElementById('frontFace');
-                this.secondFace = document.getElementById('secondFace');
-                this.cubeWidth = {cube_width};
-                this.cubeHeight = {cube_height};
-                this.cubeDepth = {cube_depth};
-                this.rotationAngle = {rotation_angle};
-                this.direction = '{direction}';
-                this.currentAngle = 0;
-                this.ready = true;
-                
-                // console.log('🎬 CubeController initialized, direction=' + this.direction + ', size=' + this.cubeWidth + 'x' + this.cubeHeight);
-            }}
+    def _scale_curve(self, progresses):
+        """缩放曲线：开始和结束填满画布，中间用sin曲线缩小 1.0 -> 0.65 -> 1.0"""
+        t = (progresses - 0.05) / 0.9
+        scales = 1.0 - np.sin(t * np.pi) * 0.35
+        return np.where((progresses < 0.05) | (progresses > 0.95), 1.0, scales)
+    
+    def _is_face_visible(self, face_points, face_depths, perspective):
+        """背面剔除：屏幕空间有向面积（y轴向下时正面为负），且面不能在视点之后"""
+        if np.any(face_depths >= perspective):
+            return False
+        edge1 = face_points[1] - face_points[0]
+        edge2 = face_points[2] - face_points[0]
+        return edge1[0] * edge2[1] - edge1[1] * edge2[0] < 0
+    
+    def _cover_quad(self, src_w, src_h, cube_width, cube_height):
+        """源帧上被面显示的区域（等效 background-size: cover + background-position: center）"""
+        cover_scale = max(cube_width / src_w, cube_height / src_h)
+        crop_w = cube_width / cover_scale
+        crop_h = cube_height / cover_scale
+        x0 = (src_w - crop_w) / 2
+        y0 = (src_h - crop_h) / 2
+        return np.float32([
+            [x0, y0],
+            [x0, y0 + crop_h],
+            [x0 + crop_w, y0],
+            [x0 + crop_w, y0 + crop_h],
+        ])
+    
+    def _fit_to_face(self, frame, cube_width, cube_height):
+        """按 cover 规则裁剪并缩放到面尺寸，减少传给浏览器/GPU的数据量"""
+        src_h, src_w = frame.shape[:2]
+        if (src_w, src_h) == (cube_width, cube_height):
+            return frame
+        
+        quad = self._cover_quad(src_w, src_h, cube_width, cube_height)
+        (x0, y0), (x1, y1) = quad[0], quad[3]
+        cropped = frame[int(round(y0)):int(round(y1)), int(round(x0)):int(round(x1))]
+        
+        # 缩小用INTER_AREA，放大用INTER_LINEAR
+        shrinking = cropped.shape[1] > cube_width and cropped.shape[0] > cube_height
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+        return cv2.resize(cropped, (cube_width, cube_height), interpolation=interpolation)
+    
+    def _warp_face(self, canvas, face_frame, face_points, cube_width, cube_height):
+        """把视频帧透视变换到面的四个角上"""
+        src_h, src_w = face_frame.shape[:2]
+        src_quad = self._cover_quad(src_w, src_h, cube_width, cube_height)
+        
+        matrix = cv2.getPerspectiveTransform(src_quad, face_points.astype(np.float32))
+        cv2.warpPerspective(
+            face_frame, matrix, (canvas.shape[1], canvas.shape[0]), dst=canvas,
+            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT
+        )
+    
+    def _render_with_torch(self, output_frames, video1, video2, direction, total_frames, rotation_angle,
+                           cube_width, cube_height, perspective, bg_color_bgr, width, height, device, chunk_size=8):
+        """GPU渲染：每批帧每个面一次 grid_sample（逆透视映射生成采样网格）"""
+        render_start = time.time()
+        
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        screen_points, point_depths = self._project_cube_faces(
+            direction, rotation_angle, progresses, cube_width, cube_height, perspective, width, height
+        )
+        background = torch.tensor(bg_color_bgr[::-1], dtype=torch.float32, device=device).div_(255.0).view(1, 3, 1, 1)
+        
+        # 输出像素中心的齐次坐标 [H*W, 3]，所有帧和所有面共用
+        ys, xs = torch.meshgrid(
+            torch.arange(height, dtype=torch.float32, device=device),
+            torch.arange(width, dtype=torch.float32, device=device),
+            indexing='ij'
+        )
+        dst_coords = torch.stack([xs, ys, torch.ones_like(xs)], dim=-1).view(-1, 3)
+        
+        videos = [video if video.dim() == 4 else video.unsqueeze(0) for video in (video1, video2)]
+        face_indices = [self._source_frame_indices(progresses, video.shape[0]) for video in videos]
+        
+        for start in range(0, total_frames, chunk_size):
+            end = min(start + chunk_size, total_frames)
+            count = end - start
+            canvas = background.expand(count, 3, height, width).clone()
             
-            updateRotation(progress) {{
-                // progress: 0 -> 1
-                const angle = progress * this.rotationAngle;
-                this.currentAngle = angle;
+            # 凸立方体背面剔除后两个可见面不会重叠，绘制顺序无关
+            for face, video in enumerate(videos):
+                src_h, src_w = video.shape[1:3]
+                src_quad = self._cover_quad(src_w, src_h, cube_width, cube_height)
                 
-                // 🎯 优化缩放曲线：开始和结束填满画布，中间缩小显示立方体3D效果
-                // 使用平滑的sin曲线：1.0 -> 0.65 -> 1.0
-                let scale;
-                if (progress < 0.05) {{
-                    // 阶段1（0 -> 0.05）：保持完整显示
-                    scale = 1.0;
-                }} else if (progress > 0.95) {{
-                    // 阶段4（0.95 -> 1.0）：恢复完整显示
-                    scale = 1.0;
-                }} else {{
-                    // 阶段2-3（0.05 -> 0.95）：使用sin曲线平滑缩放
-                    // 将progress映射到0-π范围，sin(x)从0到1再到0
-                    const t = (progress - 0.05) / 0.9;  // 归一化到0-1
-                    const sinValue = Math.sin(t * Math.PI);  // 0 -> 1 -> 0
-                    scale = 1.0 - (sinValue * 0.35);  // 1.0 -> 0.65 -> 1.0
-                }}
+                # 每帧 屏幕 -> 纹理 的逆变换矩阵，不可见的面保持全零并被遮罩掉
+                inverse_matrices = np.zeros((count, 3, 3))
+                visible = np.zeros(count, dtype=bool)
+                for k, i in enumerate(range(start, end)):
+                    if not self._is_face_visible(screen_points[i, face], point_depths[i, face], perspective):
+                        continue
+                    matrix = cv2.getPerspectiveTransform(screen_points[i, face].astype(np.float32), src_quad)
+                    # 统一齐次分量符号：面内的 w 为正
+                    corner = np.append(screen_points[i, face, 0], 1.0)
+                    inverse_matrices[k] = matrix * np.sign(matrix[2] @ corner)
+                    visible[k] = True
                 
-                // 根据方向选择旋转轴
-                let rotateTransform;
-                if (this.direction === 'horizontal') {{
-                    // 水平立方体：绕Y轴旋转（左右转）
-                    rotateTransform = `rotateY(${{-angle}}deg)`;
-                }} else {{
-                    // 垂直立方体：绕X轴旋转（上下转）
-                    rotateTransform = `rotateX(${{-angle}}deg)`;
-                }}
+                if not visible.any():
+                    continue
                 
-                // 同时应用旋转和缩放
-                const transform = `${{rotateTransform}} scale(${{scale}})`;
-                this.container.style.transform = transform;
+                inverse_matrices = torch.from_numpy(inverse_matrices).to(device=device, dtype=torch.float32)
+                src_coords = dst_coords @ inverse_matrices.transpose(1, 2)
+                w = src_coords[..., 2]
+                u = src_coords[..., 0] / w
+                v = src_coords[..., 1] / w
                 
-                // 强制重绘
-                void this.container.offsetHeight;
+                # 与BORDER_TRANSPARENT一致：只写入映射到面（cover区域）内部的像素
+                (x0, y0), (x1, y1) = src_quad[0], src_quad[3]
+                inside = (w > 0) & (u >= x0) & (u <= x1) & (v >= y0) & (v <= y1)
+                inside &= torch.from_numpy(visible).to(device).view(count, 1)
                 
-                // console.log(`[JS] Update: direction=${{this.direction}}, angle=${{angle.toFixed(1)}}°, scale=${{scale.toFixed(2)}}, transform=${{transform}}`);
-            }}
-            
-            getFaceTransforms() {{
-                const frontRect = this.frontFace.getBoundingClientRect();
-                const secondRect = this.secondFace.getBoundingClientRect();
+                # 像素中心坐标归一化到 [-1, 1]（align_corners=False）
+                grid = torch.stack([
+                    (u + 0.5) / src_w * 2 - 1,
+                    (v + 0.5) / src_h * 2 - 1,
+                ], dim=-1).view(count, height, width, 2)
                 
-                // 获取计算后的变换矩阵
-                const frontStyle = window.getComputedStyle(this.frontFace);
-                const secondStyle = window.getComputedStyle(this.secondFace);
-                
-                return {{
-                    front: {{
-                        rect: {{
-                            x: frontRect.x,
-                            y: frontRect.y,
-                            width: frontRect.width,
-                            height: frontRect.height
-                        }},
-                        transform: frontStyle.transform,
-                        visible: this._isFaceVisible(this.frontFace),
-                        zIndex: this._calculateZIndex(frontStyle.transform)
-                    }},
-                    second: {{
-                        rect: {{
-                            x: secondRect.x,
-                            y: secondRect.y,
-                            width: secondRect.width,
-                            height: secondRect.height
-                        }},
-                        transform: secondStyle.transform,
-                        visible: this._isFaceVisible(this.secondFace),
-                        zIndex: this._calculateZIndex(secondStyle.transform)
-                    }},
-                    currentAngle: this.currentAngle
-                }};
-            }}
+                textures = video[face_indices[face][start:end], ..., :3].to(device=device, dtype=torch.float32)
+                sampled = F.grid_sample(
+                    textures.permute(0, 3, 1, 2), grid, mode='bilinear', padding_mode='border', align_corners=False
+                )
+                canvas = torch.where(inside.view(count, 1, height, width), sampled, canvas)
             
-            _isFaceVisible(element) {{
-                const style = window.getComputedStyle(element);
-                const transform = style.transform;
-                
-                if (transform === 'none') return true;
-                
-                const matrix = this._parseMatrix(transform);
-                if (!matrix) return true;
-                
-                // 3D矩阵的背面剔除
-                if (matrix.length === 16) {{
-                    // matrix3d: 检查Z轴方向
-                    const m11 = matrix[0], m12 = matrix[1], m13 = matrix[2];
-                    const m21 = matrix[4], m22 = matrix[5], m23 = matrix[6];
-                    const m31 = matrix[8], m32 = matrix[9], m33 = matrix[10];
-                    
-                    // 计算法向量的Z分量
-                    const normalZ = m31;
-                    return normalZ >= -0.1; // 面向观察者
-                }}
-                
-                return true;
-            }}
+            output_frames[start:end] = canvas.mul(255).round_().clamp_(0, 255).to(torch.uint8).permute(0, 2, 3, 1).cpu().numpy()
+        
+        print(f"Rendering completed: {total_frames}/{total_frames} frames in {time.time() - render_start:.2f}s")
+    
+    def _opencv_cuda_available(self):
+        """OpenCV是否带CUDA模块且有可用设备"""
+        try:
+            return hasattr(cv2.cuda, 'warpPerspective') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        except (AttributeError, cv2.error):
+            return False
+    
+    def _render_with_opencv_cuda(self, output_frames, frames1, frames2, direction, total_frames, rotation_angle,
+                                 cube_width, cube_height, perspective, bg_color_bgr, width, height, num_streams=3):
+        """GPU渲染：cv2.cuda.warpPerspective，多个CUDA流轮流处理相邻帧"""
+        render_start = time.time()
+        
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        screen_points, point_depths = self._project_cube_faces(
+            direction, rotation_angle, progresses, cube_width, cube_height, perspective, width, height
+        )
+        bg_color_rgb = bg_color_bgr[::-1]
+        
+        # 源帧只上传一次；每个视频一张全白遮罩，随面一起变换用于合成
+        face_indices = []
+        gpu_textures = []
+        gpu_masks = []
+        for frames in (frames1, frames2):
+            indices = self._source_frame_indices(progresses, len(frames))
+            textures = {}
+            for idx in sorted(set(indices)):
+                textures[idx] = cv2.cuda_GpuMat()
+                textures[idx].upload(self._fit_to_face(frames[idx], cube_width, cube_height))
+            src_h, src_w = textures[indices[0]].size()[::-1]
+            mask = cv2.cuda_GpuMat()
+            mask.upload(np.full((src_h, src_w), 255, dtype=np.uint8))
+            face_indices.append(indices)
+            gpu_textures.append(textures)
+            gpu_masks.append(mask)
+        
+        # 每个流有自己的画布，相邻帧在不同流上重叠执行
+        streams = [cv2.cuda.Stream() for _ in range(num_streams)]
+        canvases = [cv2.cuda_GpuMat(height, width, cv2.CV_8UC3) for _ in range(num_streams)]
+        warped_frames = [cv2.cuda_GpuMat(height, width, cv2.CV_8UC3) for _ in range(num_streams)]
+        warped_masks = [cv2.cuda_GpuMat(height, width, cv2.CV_8UC1) for _ in range(num_streams)]
+        
+        for i in range(total_frames):
+            slot = i % num_streams
+            stream = streams[slot]
+            canvas = canvases[slot]
+            canvas.setTo(bg_color_rgb, stream)
             
-            _calculateZIndex(transformStr) {{
-                if (transformStr === 'none') return 0;
-                
-                const matrix = this._parseMatrix(transformStr);
-                if (!matrix) return 0;
-                
-                // 返回Z轴的translateZ值
-                if (matrix.length === 16) {{
-                    return matrix[14]; // matrix3d的Z平移
-                }}
-                
-                return 0;
-            }}
+            # 按平均Z值排序（先绘制远的面）
+            for face in np.argsort(point_depths[i].mean(axis=1)):
+                if not self._is_face_visible(screen_points[i, face], point_depths[i, face], perspective):
+                    continue
+                texture = gpu_textures[face][face_indices[face][i]]
+                src_w, src_h = texture.size()
+                matrix = cv2.getPerspectiveTransform(
+                    self._cover_quad(src_w, src_h, cube_width, cube_height),
+                    screen_points[i, face].astype(np.float32)
+                )
+                cv2.cuda.warpPerspective(
+                    texture, matrix, (width, height), dst=warped_frames[slot],
+                    flags=cv2.INTER_LINEAR, stream=stream
+                )
+                cv2.cuda.warpPerspective(
+                    gpu_masks[face], matrix, (width, height), dst=warped_masks[slot],
+                    flags=cv2.INTER_NEAREST, stream=stream
+                )
+                warped_frames[slot].copyTo(warped_masks[slot], stream, canvas)
             
-            _parseMatrix(matrixString) {{
-                if (matrixString === 'none') return null;
-                const values = matrixString.match(/matrix.*?\\((.+)\\)/);
-                if (!values) return null;
-                return values[1].split(/,\\s*/).map(parseFloat);
-            }}
-        }}
+            canvas.download(stream, output_frames[i])
         
-        window.cubeController = new CubeController();
-        // console.log('✅ CubeController initialized');
-    </script>
-</body>
-</html>
-"""
+        for stream in streams:
+            stream.waitForCompletion()
+        
+        print(f"Rendering completed: {total_frames}/{total_frames} frames in {time.time() - render_start:.2f}s")
     
-    def _compose_frame_with_opencv(self, frame1_data, frame2_data, cube_transforms, bg_color_bgr, width, height, cube_size):
-        """使用OpenCV合成最终帧 - 使用透视变换"""
-        
-        # 创建背景画布
-        canvas = np.full((height, width, 3), bg_color_bgr, dtype=np.uint8)
-        
-        # 调整视频帧大小到立方体尺寸
-        frame1_resized = cv2.resize(frame1_data, (cube_size, cube_size), interpolation=cv2.INTER_AREA)
-        frame2_resized = cv2.resize(frame2_data, (cube_size, cube_size), interpolation=cv2.INTER_AREA)
-        
-        # 绘制立方体的两个面
-        faces_to_draw = []
-        
-        # 正面（video1）
-        front_transform = cube_transforms.get('front', {})
-        if front_transform.get('visible', True):
-            faces_to_draw.append({
-                'frame': frame1_resized,
-                'transform': front_transform,
-                'name': 'front'
-            })
-        
-        # 右侧面（video2）
-        right_transform = cube_transforms.get('right', {})
-        if right_transform.get('visible', True):
-            faces_to_draw.append({
-                'frame': frame2_resized,
-                'transform': right_transform,
-                'name': 'right'
-            })
-        
-        # 按Z值排序（先绘制远的面）
-        faces_to_draw.sort(key=lambda x: x['transform'].get('zIndex', 0))
-        
-        # 绘制所有面
-        for face_data in faces_to_draw:
-            frame = face_data['frame']
-            transform = face_data['transform']
-            rect = transform.get('rect', {})
+    async def _render_with_playwright(self, output_frames, frames1, frames2, direction, total_frames, rotation_angle,
+                                      cube_width, cube_height, perspective, batch_size, background_color, width, height):
+        """GPU渲染：Playwright + WebGL，逐帧截图"""
+        # 预计算优化：提前计算所有帧的base64数据，每个源帧只编码一次
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        frame1_indices = self._source_frame_indices(progresses, len(frames1))
+        frame2_indices = self._source_frame_indices(progresses, len(frames2))
+        
+        # 多线程编码base64（cv2.imencode会释放GIL）
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            frame1_sources, frame1_positions = self._encode_unique_frames(
+                frames1, frame1_indices, executor, cube_width, cube_height
+            )
+            frame2_sources, frame2_positions = self._encode_unique_frames(
+                frames2, frame2_indices, executor, cube_width, cube_height
+            )
+        
+        # 复用共享浏览器，同一时间只渲染一个页面
+        async with shared_browser(True) as browser:
+            
+            # 一个批次的帧竖向拼成一张长图一次截取（限制长图高度不超过纹理上限）
+            batch_size = max(1, min(batch_size, 16384 // height))
             
-            x = rect.get('x', 0)
-            y = rect.get('y', 0)
-            w = rect.get('width', cube_size)
-            h = rect.get('height', cube_size)
+            # 每次调用只新建页面
+            page = await browser.new_page(viewport={'width': width, 'height': height * batch_size})
             
-            # 简单的边界检查
-            if w <= 0 or h <= 0:
-                continue
+            # CDP会话：直接截取合成器画面
+            cdp_session = await page.context.new_cdp_session(page)
             
-            # 直接使用rect的尺寸进行缩放（Playwright已经计算好透视）
             try:
-                # 缩放到目标尺寸
-                frame_scaled = cv2.resize(frame, (int(w), int(h)), interpolation=cv2.INTER_LINEAR)
+                # 页面通过getFrameBytes按需拉取JPEG纹理，不再把所有源帧拼进一次evaluate
+                frame_sources = (frame1_sources, frame2_sources)
+                await page.expose_binding(
+                    "getFrameBytes", lambda source, index, face: frame_sources[face][int(index)]
+                )
                 
-                # 计算绘制位置
-                draw_x = int(x)
-                draw_y = int(y)
-                draw_w = int(w)
-                draw_h = int(h)
+                # 加载HTML页面
+                await page.set_content(_HTML_SHELL, wait_until='domcontentloaded', timeout=30000)
                 
-                # 裁剪到画布范围内
-                src_x1 = 0
-                src_y1 = 0
-                src_x2 = draw_w
-                src_y2 = draw_h
+                # 等待页面初始化
+                await page.wait_for_function("window.cubeController && window.cubeController.ready", timeout=5000)
                 
-                dst_x1 = draw_x
-                dst_y1 = draw_y
-                dst_x2 = draw_x + draw_w
-                dst_y2 = draw_y + draw_h
+                # 传入本次渲染参数
+                await page.evaluate("params => window.cubeController.init(params)", {
+                    'direction': direction,
+                    'rotationAngle': rotation_angle,
+                    'cubeWidth': cube_width,
+                    'cubeHeight': cube_height,
+                    'perspective': perspective,
+                    'backgroundColor': background_color,
+                    'width': width,
+                    'height': height,
+                    'batchSize': batch_size,
+                })
                 
-                # 处理负坐标
-                if dst_x1 < 0:
-                    src_x1 = -dst_x1
-                    dst_x1 = 0
-                if dst_y1 < 0:
-                    src_y1 = -dst_y1
-                    dst_y1 = 0
+                # 一次性加载并解码所有源帧，渲染时按索引切换纹理
+                await page.evaluate(
+                    f"window.cubeController.setSources({len(frame1_sources)}, {len(frame2_sources)})"
+                )
                 
-                # 处理超出边界
-                if dst_x2 > width:
-                    src_x2 -= (dst_x2 - width)
-                    dst_x2 = width
-                if dst_y2 > height:
-                    src_y2 -= (dst_y2 - height)
-                    dst_y2 = height
+                render_start = time.time()
                 
-                # 确保有有效的绘制区域
-                if dst_x2 > dst_x1 and dst_y2 > dst_y1 and src_x2 > src_x1 and src_y2 > src_y1:
-                    canvas[dst_y1:dst_y2, dst_x1:dst_x2] = frame_scaled[src_y1:src_y2, src_x1:src_x2]
-            except Exception as e:
-                print(f"Warning: Error drawing face {face_data['name']}: {e}")
-                pass
-        
-        return canvas
+                for batch_start in range(0, total_frames, batch_size):
+                    batch_end = min(batch_start + batch_size, total_frames)
+                    batch_indices = list(range(batch_start, batch_end))
+                    
+                    # 批处理：一次处理多个帧，直接写入输出缓冲区
+                    await self._process_batch(
+                        page, cdp_session, output_frames, batch_indices, frame1_positions, frame2_positions,
+                        total_frames, rotation_angle
+                    )
+                    
+                    # 显示进度 - 每2个批次或完成时显示
+                    if batch_end % (batch_size * 2) == 0 or batch_end == total_frames:
+                        progress = (batch_end / total_frames) * 100
+                        elapsed = time.time() - render_start
+                        if batch_end < total_frames:
+                            eta = (elapsed / batch_end) * (total_frames - batch_end)
+                            print(f"Processing frames {batch_end}/{total_frames} ({progress:.1f}%) - ETA: {eta:.1f}s")
+                        else:
+                            print(f"Rendering completed: {batch_end}/{total_frames} frames in {elapsed:.2f}s")
+            
+            finally:
+                await page.close()
     
-    def _calculate_z_index(self, face_transform):
-        """计算面的Z索引（用于深度排序）"""
-        transform_str = face_transform.get('transform', 'none')
-        
-        if transform_str == 'none':
-            return 0
-        
-        # 简单提取translateZ值
-        if 'translateZ' in transform_str:
-            try:
-                z_value = float(transform_str.split('translateZ(')[1].split('px)')[0])
-                return z_value
-            except:
-                return 0
-        
-        return 0
+    def _source_frame_indices(self, progresses, num_frames):
+        """每个转场帧对应的源视频帧索引"""
+        return np.minimum((progresses * (num_frames - 1)).astype(np.int64), num_frames - 1).tolist()
     
-    def _extract_video_frames(self, video_tensor):
-        """从视频tensor中提取帧"""
-        frames = []
-        
-        if video_tensor.dim() == 4:
-            batch_size = video_tensor.shape[0]
-            for i in range(batch_size):
-                frame = video_tensor[i]
-                frames.append(frame)
-        else:
-            frames.append(video_tensor)
-        
-        return frames
+    def _encode_unique_frames(self, frames, frame_indices, executor, cube_width, cube_height):
+        """只编码用到的源帧（先裁剪缩放到面尺寸），返回(base64列表, 每个转场帧在列表中的位置)"""
+        unique_indices = sorted(set(frame_indices))
+        sources = list(executor.map(
+            lambda frame: self._numpy_to_base64(self._fit_to_face(frame, cube_width, cube_height)),
+            [frames[idx] for idx in unique_indices]
+        ))
+        positions = {idx: pos for pos, idx in enumerate(unique_indices)}
+        return sources, [positions[idx] for idx in frame_indices]
     
-    def _tensor_to_numpy(self, frame_tensor):
-        """将tensor转换为numpy数组"""
-        if isinstance(frame_tensor, torch.Tensor):
-            frame_np = frame_tensor.cpu().numpy()
-        else:
-            frame_np = frame_tensor
-        
-        # 转换数据类型
-        if frame_np.dtype == np.float32 or frame_np.dtype == np.float64:
-            frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
+    async def _process_batch(self, page, cdp_session, output_frames, batch_indices, frame1_positions, frame2_positions,
+                             total_frames, rotation_angle):
+        """批处理渲染多个帧：一次evaluate画完整个批次，一次截图取回长图"""
+        progresses = [i / (total_frames - 1) if total_frames > 1 else 0 for i in batch_indices]
+        
+        # 按索引切换已加载的纹理，WebGL逐帧渲染并拼到长图上（等待画面提交后返回）
+        await page.evaluate(
+            "([progresses, frame1Indices, frame2Indices]) => "
+            "window.cubeController.renderBatch(progresses, frame1Indices, frame2Indices)",
+            [progresses, [frame1_positions[i] for i in batch_indices], [frame2_positions[i] for i in batch_indices]]
+        )
+        
+        # 通过CDP截图：无损PNG（optimizeForSpeed使用快速压缩级别），跳过Playwright的截图封装
+        screenshot = await cdp_session.send('Page.captureScreenshot', {
+            'format': 'png',
+            'fromSurface': True,
+            'captureBeyondViewport': False,
+            'optimizeForSpeed': True,
+        })
+        
+        # OpenCV解码后按帧高度切分，直接转换颜色写入输出缓冲区
+        screenshot_bytes = np.frombuffer(base64.b64decode(screenshot['data']), np.uint8)
+        strip = cv2.imdecode(screenshot_bytes, cv2.IMREAD_COLOR)
+        frame_height = output_frames.shape[1]
+        for offset, i in enumerate(batch_indices):
+            cv2.cvtColor(strip[offset * frame_height:(offset + 1) * frame_height], cv2.COLOR_BGR2RGB, dst=output_frames[i])
+    
+    def _tensor_to_numpy(self, video_tensor):
+        """整段视频一次性转换为uint8 numpy数组 [N,H,W,C]（在原设备上量化后只拷贝一次）"""
+        if video_tensor.dim() == 3:
+            video_tensor = video_tensor.unsqueeze(0)
         
-        return frame_np
+        return video_tensor.mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
     
     def _numpy_to_base64(self, frame_np):
-        """将numpy数组转换为base64字符串"""
-        import io
-        import base64
-        from PIL import Image
-        
+        """将numpy数组转换为base64字符串（OpenCV JPEG编码）"""
         # 确保是uint8类型
         if frame_np.dtype != np.uint8:
             frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
         
-        # 转换为PIL图片
-        image = Image.fromarray(frame_np, mode='RGB')
+        # 纹理最终会被截图成JPEG，用JPEG传输即可，省去PNG的zlib压缩
+        ok, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame_np, cv2.COLOR_RGB2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+        img_str = base64.b64encode(buffer.tobytes()).decode()
         
-        # 转换为base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        return f"data:image/png;base64,{img_str}"
+        return f"data:image/jpeg;base64,{img_str}"
     
     def _parse_background_color(self, color_str):
-        """解析背景颜色字符串为BGR元组"""
-        if color_str.startswith('#'):
-            hex_color = color_str[1:]
-            r = int(hex_color[0:2], 16)
-            g = int(hex_color[2:4], 16)
-            b = int(hex_color[4:6], 16)
-            return (b, g, r)
-        else:
-            return (0, 0, 0)
+        """解析背景颜色字符串（#RGB或#RRGGBB）为BGR元组，无法解析时使用默认黑色"""
+        return parse_hex_color(color_str)[::-1]
     
     def _frames_to_tensor(self, frames):
-        """将帧列表转换为视频tensor"""
-        if not frames:
-            return torch.zeros((1, 640, 640, 3), dtype=torch.float32)
-        
-        frame_tensors = []
-        for frame in frames:
-            if isinstance(frame, np.ndarray):
-                frame_tensor = torch.from_numpy(frame).float() / 255.0
-                frame_tensors.append(frame_tensor)
-            else:
-                frame_tensors.append(frame)
-        
-        video_tensor = torch.stack(frame_tensors, dim=0)
-        
-        return video_tensor
+        """将预分配的uint8帧缓冲区一次性转换为视频tensor"""
+        return torch.from_numpy(frames).float().mul_(1.0 / 255.0)
 
 
 # 注册节点
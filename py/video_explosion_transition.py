@@ -1,8 +1,10 @@
 """
-视频爆炸转场节点 - CSS3版本（真实切割效果）
+视频爆炸转场节点 - Canvas版本（真实切割效果）
 第一个视频片段分割成碎块向四周飞散，露出第二个视频片段
 """
 
+import base64
+import asyncio
 import torch
 import json
 import cv2
@@ -11,6 +13,12 @@ import math
 import time
 from comfy.comfy_types.node_typing import ComfyNodeABC, InputTypeDict, IO
 
+from ._browser_pool import shared_browser
+
+
+# 源帧纹理的虚拟地址：请求由page.route拦截，直接返回JPEG字节
+_FRAME_HOST = "http://explosion-frames.local"
+
 
 class VideoExplosionTransitionNode(ComfyNodeABC):
     """视频爆炸转场 - 碎片飞散效果（批处理优化版）"""
@@ -46,6 +54,7 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
                 "width": (IO.INT, {"default": 640, "min": 640, "max": 3840}),
                 "height": (IO.INT, {"default": 640, "min": 360, "max": 2160}),
                 "quality": (IO.INT, {"default": 90, "min": 60, "max": 100}),
+                "input_quality": (IO.INT, {"default": 80, "min": 60, "max": 100}),  # 源帧纹理的JPEG质量
             }
         }
     
@@ -70,84 +79,44 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
         background_color="#000000",
         width=640,
         height=640,
-        quality=90
+        quality=90,
+        input_quality=80
     ):
         """生成视频爆炸转场效果 - 碎片飞散版本"""
         
         start_time = time.time()
         print(f"Starting explosion transition: {explosion_style}, {total_frames} frames")
         
-        # 提取视频帧
-        frames1 = self._extract_video_frames(video1)
-        frames2 = self._extract_video_frames(video2)
+        # 整段视频一次性转换为uint8数组
+        frames1 = self._tensor_to_numpy(video1)
+        frames2 = self._tensor_to_numpy(video2)
         print(f"Video frames: {len(frames1)} -> {len(frames2)}, generating {total_frames} transition frames")
         
-        # 预计算优化：提前计算所有帧的base64数据
+        # 预计算优化：提前编码所有帧的JPEG数据
         precompute_start = time.time()
         
-        frame1_base64_list = []
-        frame2_base64_list = []
+        # 所有转场帧的进度和对应的源帧索引（向量化计算）
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        frame1_indices = self._source_frame_indices(progresses, len(frames1))
+        frame2_indices = self._source_frame_indices(progresses, len(frames2))
         
-        for i in range(total_frames):
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 获取对应的帧
-            if len(frames1) == 1:
-                frame1_data = self._tensor_to_numpy(frames1[0])
-            else:
-                frame1_idx = min(int(progress * (len(frames1) - 1)), len(frames1) - 1)
-                frame1_data = self._tensor_to_numpy(frames1[frame1_idx])
-            
-            if len(frames2) == 1:
-                frame2_data = self._tensor_to_numpy(frames2[0])
-            else:
-                frame2_idx = min(int(progress * (len(frames2) - 1)), len(frames2) - 1)
-                frame2_data = self._tensor_to_numpy(frames2[frame2_idx])
-            
-            # 预计算base64数据
-            frame1_base64_list.append(self._numpy_to_base64(frame1_data))
-            frame2_base64_list.append(self._numpy_to_base64(frame2_data))
+        # 多个转场帧常对应同一源帧（如静态图片），每个源帧只编码一次
+        frame_sources = {
+            'frame1': {idx: self._numpy_to_jpeg(frames1[idx], input_quality) for idx in set(frame1_indices)},
+            'frame2': {idx: self._numpy_to_jpeg(frames2[idx], input_quality) for idx in set(frame2_indices)},
+        }
         
-        precompute_time = time.time() - precompute_start
+        # 页面只拿到纹理地址，同一地址由浏览器缓存，只加载解码一次
+        frame1_urls = [f"{_FRAME_HOST}/frame1/{idx}.jpg" for idx in frame1_indices]
+        frame2_urls = [f"{_FRAME_HOST}/frame2/{idx}.jpg" for idx in frame2_indices]
         
-        # 使用Playwright直接渲染3D效果
-        from playwright.async_api import async_playwright
+        precompute_time = time.time() - precompute_start
         
-        playwright = await async_playwright().start()
+        # 预分配输出缓冲区：截图直接解码写入，不再保留逐帧列表
+        output_frames = np.empty((total_frames, height, width, 3), dtype=np.uint8)
         
-        try:
-            # 根据GPU设置选择渲染方式
-            if use_gpu:
-                print("Playwright browser starting with GPU acceleration")
-                # GPU硬件加速
-                browser = await playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--enable-gpu',
-                        '--use-gl=angle',
-                        '--enable-webgl',
-                        '--enable-accelerated-2d-canvas',
-                        '--disable-dev-shm-usage',
-                        '--hide-scrollbars',
-                        '--mute-audio',
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                    ]
-                )
-            else:
-                print("Playwright browser starting with SwiftShader (CPU rendering)")
-                # SwiftShader软件渲染
-                browser = await playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--use-angle=swiftshader',
-                        '--enable-webgl',
-                        '--enable-accelerated-2d-canvas',
-                        '--disable-dev-shm-usage',
-                        '--hide-scrollbars',
-                        '--mute-audio',
-                    ]
-                )
+        # 复用共享浏览器，同一时间只渲染一个页面
+        async with shared_browser(use_gpu) as browser:
             
             # 生成HTML模板
             html_content = self._generate_html_template(
@@ -155,31 +124,45 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
                 gravity_strength, fade_out, background_color, width, height
             )
             
-            # 创建页面
+            # 每次调用只新建页面
             page = await browser.new_page(viewport={'width': width, 'height': height})
             
+            # CDP会话：直接截取合成器画面
+            cdp_session = await page.context.new_cdp_session(page)
+            
             try:
+                # 拦截纹理请求，直接返回预编码的JPEG字节（不再把base64拼进JS源码）
+                async def serve_frame(route):
+                    source, name = route.request.url.rsplit('/', 2)[-2:]
+                    await route.fulfill(
+                        body=frame_sources[source][int(name.split('.')[0])],
+                        content_type='image/jpeg',
+                        headers={'Cache-Control': 'max-age=3600'},
+                    )
+                
+                await page.route(f"{_FRAME_HOST}/**", serve_frame)
+                
                 # 加载HTML页面
                 await page.set_content(html_content, wait_until='domcontentloaded', timeout=30000)
                 
                 # 等待爆炸控制器初始化
                 await page.wait_for_function("window.explosionController && window.explosionController.ready", timeout=10000)
                 
-                output_frames = []
+                # 整段动画的进度和纹理地址一次传入，并预先加载解码所有纹理
+                await page.evaluate(
+                    "([progresses, texture1Urls, texture2Urls]) => "
+                    "window.explosionController.setFrames(progresses, texture1Urls, texture2Urls)",
+                    [progresses.tolist(), frame1_urls, frame2_urls]
+                )
+                
                 render_start = time.time()
                 
                 for batch_start in range(0, total_frames, batch_size):
                     batch_end = min(batch_start + batch_size, total_frames)
                     batch_indices = list(range(batch_start, batch_end))
                     
-                    # 批处理：一次处理多个帧
-                    batch_frames = await self._process_batch(
-                        page, batch_indices, frame1_base64_list, frame2_base64_list, 
-                        total_frames, quality
-                    )
-                    
-                    # 立即添加到结果中，避免内存积累
-                    output_frames.extend(batch_frames)
+                    # 批处理：一次处理多个帧，直接写入输出缓冲区
+                    await self._process_batch(page, cdp_session, output_frames, batch_indices, quality)
                     
                     # 显示进度 - 每2个批次或完成时显示
                     if batch_end % (batch_size * 2) == 0 or batch_end == total_frames:
@@ -193,10 +176,6 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
             
             finally:
                 await page.close()
-            
-            await browser.close()
-        finally:
-            await playwright.stop()
         
         # 转换为tensor
         video_tensor = self._frames_to_tensor(output_frames)
@@ -206,48 +185,46 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
         
         return (video_tensor,)
     
-    async def _process_batch(self, page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames, quality):
-        """批处理渲染多个帧"""
-        batch_frames = []
+    async def _process_batch(self, page, cdp_session, output_frames, batch_indices, quality):
+        """批处理渲染多个帧：截图解码放到线程池，与下一帧的渲染重叠"""
+        loop = asyncio.get_running_loop()
+        decodes = []
         
         for i in batch_indices:
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 使用预计算的base64数据
-            frame1_base64 = frame1_base64_list[i]
-            frame2_base64 = frame2_base64_list[i]
-            
-            # 更新爆炸动画
-            await page.evaluate(f"""
-                if (window.explosionController) {{
-                    window.explosionController.updateFrame({progress}, '{frame1_base64}', '{frame2_base64}');
-                }}
-            """)
-            
-            # 等待动画更新
-            await page.wait_for_timeout(25)
+            # 按帧序号渲染爆炸动画（画面提交后才返回）
+            await page.evaluate(f"window.explosionController.renderFrame({i})")
             
-            # 强制触发重绘
-            await page.evaluate("document.body.offsetHeight")
+            # 通过CDP截图（JPEG格式），跳过Playwright的截图封装
+            screenshot = await cdp_session.send('Page.captureScreenshot', {
+                'format': 'jpeg',
+                'quality': quality,
+                'fromSurface': True,
+                'captureBeyondViewport': False,
+            })
             
-            # 等待渲染完成
-            await page.wait_for_timeout(15)
-            
-            # 优化截图：使用JPEG格式
-            screenshot_bytes = await page.screenshot(type='jpeg', quality=quality)
-            
-            # 转换为numpy数组
-            from PIL import Image
-            import io
-            image = Image.open(io.BytesIO(screenshot_bytes)).convert('RGB')
-            final_frame = np.array(image).astype(np.uint8)
-            
-            batch_frames.append(final_frame)
+            # 解码不阻塞事件循环（cv2会释放GIL），按帧序号写入各自的输出位置
+            decodes.append(loop.run_in_executor(None, self._decode_screenshot, screenshot['data'], output_frames[i]))
         
-        return batch_frames
+        await asyncio.gather(*decodes)
+    
+    def _decode_screenshot(self, data, dst):
+        """解码CDP截图（base64 JPEG），BGR转RGB时直接写入输出缓冲区"""
+        cv2.cvtColor(
+            cv2.imdecode(np.frombuffer(base64.b64decode(data), dtype=np.uint8), cv2.IMREAD_COLOR),
+            cv2.COLOR_BGR2RGB, dst=dst
+        )
     
     def _generate_html_template(self, explosion_style, fragment_size, explosion_force, rotation_speed, gravity_strength, fade_out, background_color, width, height):
-        """生成HTML模板 - CSS3爆炸效果（真实切割）"""
+        """生成HTML模板 - Canvas爆炸效果（真实切割）"""
+        
+        # 重力位移系数（仅gravity_fall样式）和淡出系数
+        gravity_offset = 0.5 * gravity_strength * 500 if explosion_style == 'gravity_fall' else 0
+        fade_amount = 0.8 if fade_out else 0
+        
+        # 碎片运动参数在Python中向量化计算，以float32字节（base64）嵌入页面
+        motion_data = base64.b64encode(self._calculate_fragment_motion(
+            explosion_style, fragment_size, explosion_force, rotation_speed, width, height
+        ).tobytes()).decode()
         
         return f"""
 <!DOCTYPE html>
@@ -266,45 +243,16 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
             height: {height}px;
             background: {background_color};
             overflow: hidden;
-            position: relative;
         }}
         
-        .explosion-container {{
-            width: 100%;
-            height: 100%;
-            position: relative;
-            perspective: 1000px;
-        }}
-        
-        .background-layer {{
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-size: cover;
-            background-position: center;
-            background-repeat: no-repeat;
-            z-index: 1;
-        }}
-        
-        .fragment {{
-            position: absolute;
-            background-size: {width}px {height}px;
-            background-repeat: no-repeat;
-            transform-style: preserve-3d;
-            transform-origin: center;
-            z-index: 2;
-            border: 1px solid rgba(255,255,255,0.1);
-            overflow: hidden;
+        canvas {{
+            display: block;
         }}
     </style>
 </head>
 <body>
-    <div class="explosion-container" id="explosionContainer">
-        <div class="background-layer" id="backgroundLayer"></div>
-        <!-- 碎片将由JavaScript动态生成 -->
-    </div>
+    <!-- 背景和所有碎片都画在同一个canvas上 -->
+    <canvas id="explosionCanvas" width="{width}" height="{height}"></canvas>
     
     <script>
         class ExplosionController {{
@@ -312,209 +260,158 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
                 this.ready = false;
                 this.explosionStyle = '{explosion_style}';
                 this.fragmentSize = {fragment_size};
-                this.explosionForce = {explosion_force};
-                this.rotationSpeed = {rotation_speed};
-                this.gravityStrength = {gravity_strength};
-                this.fadeOut = {str(fade_out).lower()};
+                this.gravityOffset = {gravity_offset};
+                this.fadeAmount = {fade_amount};
+                this.backgroundColor = '{background_color}';
                 this.width = {width};
                 this.height = {height};
-                this.fragments = [];
-                this.fragmentData = [];
+                this.textures = new Map();
+                this.foreground = new Image();
+                this.background = new Image();
+                this.foregroundUrl = null;
+                this.backgroundUrl = null;
                 this.init();
             }}
             
             init() {{
-                this.container = document.getElementById('explosionContainer');
-                this.backgroundLayer = document.getElementById('backgroundLayer');
+                this.canvas = document.getElementById('explosionCanvas');
+                this.ctx = this.canvas.getContext('2d');
                 this.createFragments();
                 this.ready = true;
-                // console.log('💥 ExplosionController initialized, style=' + this.explosionStyle + ', fragments=' + this.fragments.length);
+                // console.log('💥 ExplosionController initialized, style=' + this.explosionStyle + ', fragments=' + this.fragmentCount);
             }}
             
             createFragments() {{
-                // 清空容器中的碎片
-                const existingFragments = this.container.querySelectorAll('.fragment');
-                existingFragments.forEach(fragment => fragment.remove());
-                
-                this.fragments = [];
-                this.fragmentData = [];
-                
                 const cols = Math.floor(this.width / this.fragmentSize);
                 const rows = Math.floor(this.height / this.fragmentSize);
-                const actualFragmentWidth = this.width / cols;
-                const actualFragmentHeight = this.height / rows;
+                this.fragmentWidth = this.width / cols;
+                this.fragmentHeight = this.height / rows;
+                this.fragmentCount = cols * rows;
                 
-                for (let row = 0; row < rows; row++) {{
-                    for (let col = 0; col < cols; col++) {{
-                        const fragment = document.createElement('div');
-                        fragment.className = 'fragment';
-                        
-                        // 设置碎片位置和大小
-                        const x = col * actualFragmentWidth;
-                        const y = row * actualFragmentHeight;
-                        
-                        fragment.style.left = x + 'px';
-                        fragment.style.top = y + 'px';
-                        fragment.style.width = actualFragmentWidth + 'px';
-                        fragment.style.height = actualFragmentHeight + 'px';
-                        
-                        // 设置背景位置以显示对应的图片区域
-                        const bgPosX = -x;
-                        const bgPosY = -y;
-                        fragment.style.backgroundPosition = bgPosX + 'px ' + bgPosY + 'px';
-                        
-                        this.container.appendChild(fragment);
-                        this.fragments.push(fragment);
-                        
-                        // 计算碎片的运动参数
-                        const fragmentData = this.calculateFragmentMotion(x, y, col, row, cols, rows);
-                        this.fragmentData.push(fragmentData);
-                    }}
-                }}
+                // 运动参数由Python预先计算：每个碎片8个float32（初始x、y，速度x、y，旋转x、y、z，延迟）
+                this.motion = this.decodeMotion('{motion_data}');
             }}
             
-            calculateFragmentMotion(x, y, col, row, cols, rows) {{
-                const centerX = this.width / 2;
-                const centerY = this.height / 2;
-                const fragmentCenterX = x + this.fragmentSize / 2;
-                const fragmentCenterY = y + this.fragmentSize / 2;
-                
-                let velocityX = 0;
-                let velocityY = 0;
-                let rotationX = 0;
-                let rotationY = 0;
-                let rotationZ = 0;
-                
-                switch(this.explosionStyle) {{
-                    case 'random_scatter':
-                        velocityX = (Math.random() - 0.5) * 800 * this.explosionForce;
-                        velocityY = (Math.random() - 0.5) * 800 * this.explosionForce;
-                        rotationX = (Math.random() - 0.5) * 720 * this.rotationSpeed;
-                        rotationY = (Math.random() - 0.5) * 720 * this.rotationSpeed;
-                        rotationZ = (Math.random() - 0.5) * 720 * this.rotationSpeed;
-                        break;
-                        
-                    case 'radial_burst':
-                        const angle = Math.atan2(fragmentCenterY - centerY, fragmentCenterX - centerX);
-                        const distance = Math.sqrt(Math.pow(fragmentCenterX - centerX, 2) + Math.pow(fragmentCenterY - centerY, 2));
-                        const force = (distance / Math.max(this.width, this.height)) * 600 * this.explosionForce;
-                        velocityX = Math.cos(angle) * force;
-                        velocityY = Math.sin(angle) * force;
-                        rotationZ = angle * 180 / Math.PI * this.rotationSpeed;
-                        break;
-                        
-                    case 'spiral_explosion':
-                        const spiralAngle = Math.atan2(fragmentCenterY - centerY, fragmentCenterX - centerX);
-                        const spiralDistance = Math.sqrt(Math.pow(fragmentCenterX - centerX, 2) + Math.pow(fragmentCenterY - centerY, 2));
-                        const spiralForce = 400 * this.explosionForce;
-                        const spiralOffset = (col + row) * 0.5;
-                        velocityX = Math.cos(spiralAngle + spiralOffset) * spiralForce;
-                        velocityY = Math.sin(spiralAngle + spiralOffset) * spiralForce;
-                        rotationZ = (spiralAngle + spiralOffset) * 180 / Math.PI * this.rotationSpeed;
-                        break;
-                        
-                    case 'gravity_fall':
-                        velocityX = (Math.random() - 0.5) * 200 * this.explosionForce;
-                        velocityY = -100 * this.explosionForce; // 初始向上
-                        rotationX = (Math.random() - 0.5) * 360 * this.rotationSpeed;
-                        break;
-                        
-                    case 'wind_blow':
-                        velocityX = (200 + Math.random() * 300) * this.explosionForce; // 向右吹
-                        velocityY = (Math.random() - 0.5) * 100 * this.explosionForce;
-                        rotationZ = (Math.random() - 0.5) * 180 * this.rotationSpeed;
-                        break;
-                        
-                    case 'center_burst':
-                        const burstAngle = Math.atan2(fragmentCenterY - centerY, fragmentCenterX - centerX);
-                        const burstForce = 500 * this.explosionForce;
-                        velocityX = Math.cos(burstAngle) * burstForce;
-                        velocityY = Math.sin(burstAngle) * burstForce;
-                        rotationX = (Math.random() - 0.5) * 360 * this.rotationSpeed;
-                        rotationY = (Math.random() - 0.5) * 360 * this.rotationSpeed;
-                        break;
+            decodeMotion(base64Data) {{
+                const bytes = Uint8Array.from(atob(base64Data), c => c.charCodeAt(0));
+                return new Float32Array(bytes.buffer);
+            }}
+            
+            loadTexture(url) {{
+                // 每个纹理地址只加载解码一次，之后直接命中内存缓存
+                if (!this.textures.has(url)) {{
+                    const image = new Image();
+                    image.src = url;
+                    this.textures.set(url, image.decode());
                 }}
+                return this.textures.get(url);
+            }}
+            
+            setFrames(progresses, texture1Urls, texture2Urls) {{
+                this.progresses = progresses;
+                this.texture1Urls = texture1Urls;
+                this.texture2Urls = texture2Urls;
                 
-                return {{
-                    initialX: x,
-                    initialY: y,
-                    velocityX: velocityX,
-                    velocityY: velocityY,
-                    rotationX: rotationX,
-                    rotationY: rotationY,
-                    rotationZ: rotationZ,
-                    delay: Math.random() * 0.3 // 随机延迟0-0.3秒
-                }};
+                // 并行加载解码所有用到的纹理，渲染循环中不再等待网络和解码
+                const urls = new Set([...texture1Urls, ...texture2Urls]);
+                return Promise.all(Array.from(urls, url => this.loadTexture(url)));
+            }}
+            
+            renderFrame(index) {{
+                return this.updateFrame(this.progresses[index], this.texture1Urls[index], this.texture2Urls[index])
+                    .then(waitForFrame);
             }}
             
-            updateFrame(progress, texture1Base64, texture2Base64) {{
-                // 更新背景层（第二个视频）
-                this.backgroundLayer.style.backgroundImage = `url(${{texture2Base64}})`;
+            async updateFrame(progress, texture1Url, texture2Url) {{
+                // 纹理地址没变就不重新赋值src（静态图片时整段动画只解码一次）
+                const decodes = [];
+                if (texture1Url !== this.foregroundUrl) {{
+                    this.foregroundUrl = texture1Url;
+                    this.foreground.src = texture1Url;
+                    decodes.push(this.foreground.decode());
+                }}
+                if (texture2Url !== this.backgroundUrl) {{
+                    this.backgroundUrl = texture2Url;
+                    this.background.src = texture2Url;
+                    decodes.push(this.background.decode());
+                }}
+                await Promise.all(decodes);
                 
-                // 更新所有碎片
-                this.fragments.forEach((fragment, index) => {{
-                    this.updateFragment(fragment, index, progress, texture1Base64);
-                }});
+                this.draw(progress);
             }}
             
-            updateFragment(fragment, index, progress, texture1Base64) {{
-                const data = this.fragmentData[index];
+            draw(progress) {{
+                const ctx = this.ctx;
+                ctx.setTransform(1, 0, 0, 1, 0, 0);
+                ctx.globalAlpha = 1;
+                ctx.fillStyle = this.backgroundColor;
+                ctx.fillRect(0, 0, this.width, this.height);
                 
-                // 考虑延迟的进度
-                const adjustedProgress = Math.max(0, Math.min(1, (progress - data.delay) / (1 - data.delay)));
+                // 背景（第二个视频），按cover方式居中裁剪
+                const background = this.background;
+                const coverScale = Math.max(this.width / background.naturalWidth, this.height / background.naturalHeight);
+                const coverWidth = this.width / coverScale;
+                const coverHeight = this.height / coverScale;
+                ctx.drawImage(
+                    background,
+                    (background.naturalWidth - coverWidth) / 2, (background.naturalHeight - coverHeight) / 2,
+                    coverWidth, coverHeight,
+                    0, 0, this.width, this.height
+                );
+                
+                // 延迟小于1，进度到1时所有碎片同时完成
+                if (progress >= 1) {{
+                    return;
+                }}
                 
-                // 使用缓动函数
-                const easeProgress = this.easeOutCubic(adjustedProgress);
+                // 碎片（第一个视频）：纹理拉伸到整个画面，每个碎片取对应区域
+                const foreground = this.foreground;
+                const scaleX = foreground.naturalWidth / this.width;
+                const scaleY = foreground.naturalHeight / this.height;
+                const w = this.fragmentWidth;
+                const h = this.fragmentHeight;
+                const motion = this.motion;
+                const toRadians = Math.PI / 180;
                 
-                if (adjustedProgress <= 0) {{
-                    // 还没开始爆炸，显示原始位置
-                    fragment.style.backgroundImage = `url(${{texture1Base64}})`;
-                    fragment.style.transform = 'translate(0, 0) rotateX(0deg) rotateY(0deg) rotateZ(0deg)';
-                    fragment.style.opacity = '1';
-                    fragment.style.display = 'block';
-                }} else if (adjustedProgress >= 1) {{
-                    // 爆炸完成，隐藏碎片
-                    fragment.style.display = 'none';
-                }} else {{
-                    // 爆炸过程中
-                    fragment.style.backgroundImage = `url(${{texture1Base64}})`;
-                    fragment.style.display = 'block';
+                for (let index = 0; index < this.fragmentCount; index++) {{
+                    const offset = index * 8;
+                    const x = motion[offset];
+                    const y = motion[offset + 1];
+                    const delay = motion[offset + 7];
                     
-                    // 计算位置
-                    let currentX = data.initialX + data.velocityX * easeProgress;
-                    let currentY = data.initialY + data.velocityY * easeProgress;
+                    // 考虑延迟的进度，再做easeOutCubic缓动
+                    const t = Math.max(0, Math.min(1, (progress - delay) / (1 - delay)));
+                    const u = 1 - t;
+                    const e = 1 - u * u * u;
                     
-                    // 重力效果（仅对gravity_fall样式）
-                    if (this.explosionStyle === 'gravity_fall') {{
-                        currentY += 0.5 * this.gravityStrength * 500 * easeProgress * easeProgress;
-                    }}
+                    // 位移（gravity_fall额外叠加重力）
+                    const translateX = motion[offset + 2] * e;
+                    const translateY = motion[offset + 3] * e + this.gravityOffset * e * e;
                     
-                    // 计算旋转
-                    const rotX = data.rotationX * easeProgress;
-                    const rotY = data.rotationY * easeProgress;
-                    const rotZ = data.rotationZ * easeProgress;
+                    // rotateX·rotateY·rotateZ 投影到画面平面的2x2矩阵（绕碎片中心）
+                    const rx = motion[offset + 4] * e * toRadians;
+                    const ry = motion[offset + 5] * e * toRadians;
+                    const rz = motion[offset + 6] * e * toRadians;
+                    const cx = Math.cos(rx), sx = Math.sin(rx);
+                    const cy = Math.cos(ry), sy = Math.sin(ry);
+                    const cz = Math.cos(rz), sz = Math.sin(rz);
                     
-                    // 应用变换
-                    const translateX = currentX - data.initialX;
-                    const translateY = currentY - data.initialY;
-                    fragment.style.transform = `translate(${{translateX}}px, ${{translateY}}px) rotateX(${{rotX}}deg) rotateY(${{rotY}}deg) rotateZ(${{rotZ}}deg)`;
+                    ctx.setTransform(
+                        cy * cz, sx * sy * cz + cx * sz,
+                        -cy * sz, cx * cz - sx * sy * sz,
+                        x + w / 2 + translateX, y + h / 2 + translateY
+                    );
                     
-                    // 淡出效果
-                    if (this.fadeOut) {{
-                        const opacity = 1 - easeProgress * 0.8; // 保留一些透明度直到最后
-                        fragment.style.opacity = Math.max(0, opacity).toString();
-                    }} else {{
-                        fragment.style.opacity = '1';
-                    }}
+                    // 淡出效果（保留一些透明度直到最后）
+                    ctx.globalAlpha = 1 - e * this.fadeAmount;
+                    ctx.drawImage(foreground, x * scaleX, y * scaleY, w * scaleX, h * scaleY, -w / 2, -h / 2, w, h);
                 }}
             }}
-            
-            // 缓动函数
-            easeOutCubic(t) {{
-                return 1 - Math.pow(1 - t, 3);
-            }}
         }}
         
+        // 两次requestAnimationFrame：确保绘制后的画面已经提交
+        window.waitForFrame = () => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+        
         // 初始化控制器
         window.explosionController = new ExplosionController();
         // console.log('✅ ExplosionController initialized');
@@ -523,69 +420,83 @@ class VideoExplosionTransitionNode(ComfyNodeABC):
 </html>
 """
     
-    def _extract_video_frames(self, video_tensor):
-        """从视频tensor中提取帧"""
-        frames = []
+    def _calculate_fragment_motion(self, explosion_style, fragment_size, explosion_force, rotation_speed, width, height):
+        """向量化计算所有碎片的运动参数，返回 [N,8] float32（初始x、y，速度x、y，旋转x、y、z，延迟）"""
+        cols = width // fragment_size
+        rows = height // fragment_size
         
-        if video_tensor.dim() == 4:
-            batch_size = video_tensor.shape[0]
-            for i in range(batch_size):
-                frame = video_tensor[i]
-                frames.append(frame)
-        else:
-            frames.append(video_tensor)
+        # 按行优先排列的碎片网格
+        row, col = np.divmod(np.arange(rows * cols), cols)
+        x = col * (width / cols)
+        y = row * (height / rows)
         
-        return frames
-    
-    def _tensor_to_numpy(self, frame_tensor):
-        """将tensor转换为numpy数组"""
-        if isinstance(frame_tensor, torch.Tensor):
-            frame_np = frame_tensor.cpu().numpy()
-        else:
-            frame_np = frame_tensor
+        # 碎片中心相对画面中心的偏移
+        dx = x + fragment_size / 2 - width / 2
+        dy = y + fragment_size / 2 - height / 2
+        angle = np.arctan2(dy, dx)
         
-        # 转换数据类型
-        if frame_np.dtype == np.float32 or frame_np.dtype == np.float64:
-            frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
+        count = rows * cols
+        random = lambda: np.random.random(count)
+        zeros = np.zeros(count)
+        velocity_x = velocity_y = rotation_x = rotation_y = rotation_z = zeros
         
-        return frame_np
-    
-    def _numpy_to_base64(self, frame_np):
-        """将numpy数组转换为base64字符串"""
-        import io
-        import base64
-        from PIL import Image
+        if explosion_style == 'random_scatter':
+            velocity_x = (random() - 0.5) * 800 * explosion_force
+            velocity_y = (random() - 0.5) * 800 * explosion_force
+            rotation_x = (random() - 0.5) * 720 * rotation_speed
+            rotation_y = (random() - 0.5) * 720 * rotation_speed
+            rotation_z = (random() - 0.5) * 720 * rotation_speed
+        elif explosion_style == 'radial_burst':
+            force = np.hypot(dx, dy) / max(width, height) * 600 * explosion_force
+            velocity_x = np.cos(angle) * force
+            velocity_y = np.sin(angle) * force
+            rotation_z = np.degrees(angle) * rotation_speed
+        elif explosion_style == 'spiral_explosion':
+            spiral_angle = angle + (col + row) * 0.5
+            velocity_x = np.cos(spiral_angle) * 400 * explosion_force
+            velocity_y = np.sin(spiral_angle) * 400 * explosion_force
+            rotation_z = np.degrees(spiral_angle) * rotation_speed
+        elif explosion_style == 'gravity_fall':
+            velocity_x = (random() - 0.5) * 200 * explosion_force
+            velocity_y = np.full(count, -100 * explosion_force)  # 初始向上
+            rotation_x = (random() - 0.5) * 360 * rotation_speed
+        elif explosion_style == 'wind_blow':
+            velocity_x = (200 + random() * 300) * explosion_force  # 向右吹
+            velocity_y = (random() - 0.5) * 100 * explosion_force
+            rotation_z = (random() - 0.5) * 180 * rotation_speed
+        elif explosion_style == 'center_burst':
+            velocity_x = np.cos(angle) * 500 * explosion_force
+            velocity_y = np.sin(angle) * 500 * explosion_force
+            rotation_x = (random() - 0.5) * 360 * rotation_speed
+            rotation_y = (random() - 0.5) * 360 * rotation_speed
         
-        # 确保是uint8类型
-        if frame_np.dtype != np.uint8:
-            frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
+        delay = random() * 0.3  # 随机延迟0-0.3
         
-        # 转换为PIL图片
-        image = Image.fromarray(frame_np, mode='RGB')
+        return np.stack(
+            [x, y, velocity_x, velocity_y, rotation_x, rotation_y, rotation_z, delay], axis=1
+        ).astype('<f4')
+    
+    def _source_frame_indices(self, progresses, num_frames):
+        """每个转场帧对应的源视频帧索引"""
+        return np.minimum((progresses * (num_frames - 1)).astype(np.int64), num_frames - 1).tolist()
+    
+    def _tensor_to_numpy(self, video_tensor):
+        """整段视频一次性转换为uint8 numpy数组 [N,H,W,C]（在原设备上量化后只拷贝一次）"""
+        if video_tensor.dim() == 3:
+            video_tensor = video_tensor.unsqueeze(0)
         
-        # 转换为base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        return video_tensor.mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
+    
+    def _numpy_to_jpeg(self, frame_np, quality=80):
+        """将uint8 numpy数组编码为JPEG字节（OpenCV JPEG编码）"""
+        # JPEG编码远快于PNG的zlib压缩，数据量也更小；直接调用libjpeg，省去PIL的图片对象和BytesIO
+        ok, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame_np, cv2.COLOR_RGB2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), quality])
         
-        return f"data:image/png;base64,{img_str}"
+        return buffer.tobytes()
     
     def _frames_to_tensor(self, frames):
-        """将帧列表转换为视频tensor"""
-        if not frames:
-            return torch.zeros((1, 640, 640, 3), dtype=torch.float32)
-        
-        frame_tensors = []
-        for frame in frames:
-            if isinstance(frame, np.ndarray):
-                frame_tensor = torch.from_numpy(frame).float() / 255.0
-                frame_tensors.append(frame_tensor)
-            else:
-                frame_tensors.append(frame)
-        
-        video_tensor = torch.stack(frame_tensors, dim=0)
-        
-        return video_tensor
+        """将预分配的uint8帧缓冲区一次性转换为视频tensor"""
+        return torch.from_numpy(frames).float().mul_(1.0 / 255.0)
 
 
 # 注册节点
@@ -3,12 +3,229 @@
 两个视频片段之间的3D翻转转场效果，支持批处理和内存优化
 """
 
+import os
+import base64
+import asyncio
+import concurrent.futures
+import threading
 import torch
+import torch.nn.functional as F
 import json
+import cv2
 import numpy as np
 import time
 from comfy.comfy_types.node_typing import ComfyNodeABC, InputTypeDict, IO
 
+from ._browser_pool import shared_browser
+from ._colors import parse_hex_color
+
+
+# 源帧纹理的虚拟地址：请求由page.route拦截，直接返回JPEG字节
+_FRAME_HOST = "http://flip-frames.local"
+
+# 同时渲染的页面数上限：各页面的批次并发交给浏览器的多个渲染进程
+_MAX_RENDER_PAGES = 4
+
+# 静态渲染页面：每个进程只解析一次，渲染参数通过 flipController.init 传入
+_HTML_SHELL = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+        
+        body {
+            overflow: hidden;
+        }
+        
+        #flipCanvas {
+            display: block;
+        }
+    </style>
+</head>
+<body>
+    <canvas id="flipCanvas"></canvas>
+    
+    <script>
+        const VERTEX_SHADER = `#version 300 es
+            in vec4 aPosition;
+            in vec2 aTexCoord;
+            out vec2 vTexCoord;
+            void main() {
+                gl_Position = aPosition;
+                vTexCoord = aTexCoord;
+            }`;
+        
+        const FRAGMENT_SHADER = `#version 300 es
+            precision mediump float;
+            in vec2 vTexCoord;
+            uniform sampler2D uTexture;
+            out vec4 outColor;
+            void main() {
+                outColor = texture(uTexture, vTexCoord);
+            }`;
+        
+        class FlipController {
+            constructor() {
+                this.canvas = document.getElementById('flipCanvas');
+                this.gl = this.canvas.getContext('webgl2', { preserveDrawingBuffer: true });
+                this.textureUrls = [null, null];
+                this.uvRects = [[0, 0, 1, 1], [0, 0, 1, 1]];
+                this.vertexData = new Float32Array(2 * 4 * 6);
+                
+                this._initGL();
+            }
+            
+            init(params) {
+                // 每次渲染的参数由Python传入，页面本身是静态的
+                this.perspective = params.perspective;
+                this.frameWidth = params.width;
+                this.frameHeight = params.height;
+                
+                // 画布为一个批次的长图
+                this.canvas.width = params.width;
+                this.canvas.height = params.height * params.batchSize;
+                document.body.style.width = `${params.width}px`;
+                document.body.style.height = `${params.height * params.batchSize}px`;
+                document.body.style.background = params.backgroundColor;
+                this.textureUrls = [null, null];
+                
+                // 画面直接从画布读回，背景色作为清屏颜色画进画布（不透明）
+                const probe = document.createElement('canvas').getContext('2d');
+                probe.fillStyle = params.backgroundColor;
+                probe.fillRect(0, 0, 1, 1);
+                const [r, g, b] = probe.getImageData(0, 0, 1, 1).data;
+                this.gl.clearColor(r / 255, g / 255, b / 255, 1);
+            }
+            
+            _initGL() {
+                const gl = this.gl;
+                const program = gl.createProgram();
+                [[gl.VERTEX_SHADER, VERTEX_SHADER], [gl.FRAGMENT_SHADER, FRAGMENT_SHADER]].forEach(([type, source]) => {
+                    const shader = gl.createShader(type);
+                    gl.shaderSource(shader, source);
+                    gl.compileShader(shader);
+                    gl.attachShader(program, shader);
+                });
+                gl.linkProgram(program);
+                gl.useProgram(program);
+                
+                this.buffer = gl.createBuffer();
+                gl.bindBuffer(gl.ARRAY_BUFFER, this.buffer);
+                gl.bufferData(gl.ARRAY_BUFFER, this.vertexData.byteLength, gl.DYNAMIC_DRAW);
+                
+                const positionLoc = gl.getAttribLocation(program, 'aPosition');
+                const texCoordLoc = gl.getAttribLocation(program, 'aTexCoord');
+                gl.enableVertexAttribArray(positionLoc);
+                gl.vertexAttribPointer(positionLoc, 4, gl.FLOAT, false, 24, 0);
+                gl.enableVertexAttribArray(texCoordLoc);
+                gl.vertexAttribPointer(texCoordLoc, 2, gl.FLOAT, false, 24, 16);
+                
+                // 背面剔除代替 backface-visibility: hidden
+                gl.enable(gl.CULL_FACE);
+                gl.clearColor(0, 0, 0, 0);
+                
+                this.textures = [0, 1].map(() => {
+                    const texture = gl.createTexture();
+                    gl.bindTexture(gl.TEXTURE_2D, texture);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MIN_FILTER, gl.LINEAR);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MAG_FILTER, gl.LINEAR);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_S, gl.CLAMP_TO_EDGE);
+                    gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_T, gl.CLAMP_TO_EDGE);
+                    return texture;
+                });
+            }
+            
+            _uploadTexture(face, url, image) {
+                // 同一张图片只上传一次
+                if (this.textureUrls[face] === url) return;
+                
+                const gl = this.gl;
+                gl.bindTexture(gl.TEXTURE_2D, this.textures[face]);
+                gl.texImage2D(gl.TEXTURE_2D, 0, gl.RGBA, gl.RGBA, gl.UNSIGNED_BYTE, image);
+                this.textureUrls[face] = url;
+                
+                // 等效 background-size: cover + background-position: center
+                const coverScale = Math.max(this.frameWidth / image.width, this.frameHeight / image.height);
+                const du = this.frameWidth / (image.width * coverScale) / 2;
+                const dv = this.frameHeight / (image.height * coverScale) / 2;
+                this.uvRects[face] = [0.5 - du, 0.5 - dv, 0.5 + du, 0.5 + dv];
+            }
+            
+            async renderBatch(frames) {
+                // 批次内用到的图片并行解码，相同URL只解码一次
+                const images = new Map();
+                await Promise.all(frames.flatMap(([frontImage, backImage]) => [frontImage, backImage]).map(url => {
+                    if (images.has(url)) return images.get(url);
+                    const image = new Image();
+                    image.crossOrigin = 'anonymous';
+                    image.src = url;
+                    const decoded = image.decode().then(() => images.set(url, image));
+                    images.set(url, decoded);
+                    return decoded;
+                }));
+                
+                const gl = this.gl;
+                gl.viewport(0, 0, this.canvas.width, this.canvas.height);
+                gl.clear(gl.COLOR_BUFFER_BIT);
+                frames.forEach(([frontImage, backImage, frontAxes, backAxes], index) => {
+                    this._uploadTexture(0, frontImage, images.get(frontImage));
+                    this._uploadTexture(1, backImage, images.get(backImage));
+                    
+                    // WebGL原点在左下角：第index帧画在长图自上而下第index个区域
+                    gl.viewport(0, this.canvas.height - (index + 1) * this.frameHeight, this.frameWidth, this.frameHeight);
+                    this.updateRotation(frontAxes, backAxes);
+                });
+                
+                // 直接读回绘制缓冲区（无损PNG），不必等待合成器提交画面，也省去单独的截图调用
+                return this.canvas.toDataURL('image/png');
+            }
+            
+            updateRotation(frontAxes, backAxes) {
+                // 正面和背面旋转矩阵的前两列 [r00, r10, r20, r01, r11, r21]，由Python按转场类型预先算好
+                
+                // 卡片的四个角（卡片中心为原点，y轴向下）
+                const halfW = this.frameWidth / 2;
+                const halfH = this.frameHeight / 2;
+                const corners = [[-halfW, -halfH], [-halfW, halfH], [halfW, -halfH], [halfW, halfH]];
+                
+                let offset = 0;
+                [frontAxes, backAxes].forEach((m, face) => {
+                    const [u0, v0, u1, v1] = this.uvRects[face];
+                    for (const [x, y] of corners) {
+                        const px = m[0] * x + m[3] * y;
+                        const py = m[1] * x + m[4] * y;
+                        const pz = m[2] * x + m[5] * y;
+                        // 透视：w = (perspective - z) / perspective，由GPU做透视除法
+                        this.vertexData[offset++] = px / halfW;
+                        this.vertexData[offset++] = -py / halfH;
+                        this.vertexData[offset++] = 0;
+                        this.vertexData[offset++] = (this.perspective - pz) / this.perspective;
+                        this.vertexData[offset++] = x < 0 ? u0 : u1;
+                        this.vertexData[offset++] = y < 0 ? v0 : v1;
+                    }
+                });
+                
+                const gl = this.gl;
+                gl.bufferSubData(gl.ARRAY_BUFFER, 0, this.vertexData);
+                for (let face = 0; face < 2; face++) {
+                    gl.bindTexture(gl.TEXTURE_2D, this.textures[face]);
+                    gl.drawArrays(gl.TRIANGLE_STRIP, face * 4, 4);
+                }
+            }
+        }
+        
+        window.flipController = new FlipController();
+    </script>
+</body>
+</html>
+"""
+
 
 class VideoFlip3DTransitionNode(ComfyNodeABC):
     """视频3D翻转转场 - 两个视频之间的3D翻转转场（批处理优化版）"""
@@ -62,129 +279,26 @@ class VideoFlip3DTransitionNode(ComfyNodeABC):
         start_time = time.time()
         print(f"Starting 3D flip transition: {transition_type}, {total_frames} frames")
         
-        # 提取视频帧
-        frames1 = self._extract_video_frames(video1)
-        frames2 = self._extract_video_frames(video2)
-        print(f"Video frames: {len(frames1)} -> {len(frames2)}, generating {total_frames} transition frames")
-        
-        # 预计算优化：提前计算所有帧的base64数据
-        precompute_start = time.time()
-        
-        frame1_base64_list = []
-        frame2_base64_list = []
-        
-        for i in range(total_frames):
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 获取对应的帧
-            if len(frames1) == 1:
-                frame1_data = self._tensor_to_numpy(frames1[0])
-            else:
-                frame1_idx = min(int(progress * (len(frames1) - 1)), len(frames1) - 1)
-                frame1_data = self._tensor_to_numpy(frames1[frame1_idx])
-            
-            if len(frames2) == 1:
-                frame2_data = self._tensor_to_numpy(frames2[0])
-            else:
-                frame2_idx = min(int(progress * (len(frames2) - 1)), len(frames2) - 1)
-                frame2_data = self._tensor_to_numpy(frames2[frame2_idx])
-            
-            # 预计算base64数据
-            frame1_base64_list.append(self._numpy_to_base64(frame1_data))
-            frame2_base64_list.append(self._numpy_to_base64(frame2_data))
-        
-        precompute_time = time.time() - precompute_start
-        
-        # 使用Playwright直接渲染3D效果
-        from playwright.async_api import async_playwright
-        
-        playwright = await async_playwright().start()
+        # 预分配整段输出缓冲区，各渲染路径直接写入
+        output_frames = np.empty((total_frames, height, width, 3), dtype=np.uint8)
         
-        try:
-            # 根据GPU设置选择渲染方式
-            if use_gpu:
-                print("Playwright browser starting with GPU acceleration")
-                # GPU硬件加速
-                browser = await playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--enable-gpu',                    # 启用GPU
-                        '--use-gl=angle',                  # 使用ANGLE（支持GPU）
-                        '--enable-webgl',
-                        '--enable-accelerated-2d-canvas',
-                        '--disable-dev-shm-usage',
-                        '--hide-scrollbars',
-                        '--mute-audio',
-                        '--no-sandbox',                    # 避免权限问题
-                        '--disable-setuid-sandbox',
-                    ]
-                )
-            else:
-                print("Playwright browser starting with SwiftShader (CPU rendering)")
-                # SwiftShader软件渲染
-                browser = await playwright.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--use-angle=swiftshader',         # 强制使用CPU软件渲染
-                        '--enable-webgl',
-                        '--enable-accelerated-2d-canvas',
-                        '--disable-dev-shm-usage',
-                        '--hide-scrollbars',
-                        '--mute-audio',
-                    ]
-                )
-            
-            # 生成HTML模板
-            html_content = self._generate_html_template(
-                transition_type, perspective, background_color, width, height
+        if use_gpu and torch.cuda.is_available():
+            # GPU：torch grid_sample 成批采样，输入视频已在显存时无需往返拷贝，不需要浏览器
+            self._render_with_torch(
+                output_frames, video1, video2, transition_type, total_frames, perspective,
+                background_color, width, height, torch.device("cuda")
             )
+        else:
+            # 只把转场用到的源帧裁剪缩放到输出尺寸，转换为uint8后一次拷回CPU
+            progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+            frames1, frame1_indices = self._tensor_to_numpy(video1, width, height, progresses)
+            frames2, frame2_indices = self._tensor_to_numpy(video2, width, height, progresses)
+            print(f"Source frames used: {len(frames1)} -> {len(frames2)}, generating {total_frames} transition frames")
             
-            # 创建页面
-            page = await browser.new_page(viewport={'width': width, 'height': height})
-            
-            try:
-                # 加载HTML页面
-                await page.set_content(html_content, wait_until='domcontentloaded', timeout=30000)
-                
-                # 等待页面初始化
-                await page.wait_for_function("window.flipController && window.flipController.ready", timeout=5000)
-                
-                # 批处理渲染
-                render_start = time.time()
-                
-                # 使用生成器进行内存优化
-                output_frames = []
-                
-                for batch_start in range(0, total_frames, batch_size):
-                    batch_end = min(batch_start + batch_size, total_frames)
-                    batch_indices = list(range(batch_start, batch_end))
-                    
-                    # 批处理：一次处理多个帧
-                    batch_frames = await self._process_batch(
-                        page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames
-                    )
-                    
-                    # 立即添加到结果中，避免内存积累
-                    output_frames.extend(batch_frames)
-                    
-                    # 显示进度 - 每2个批次或完成时显示
-                    if batch_end % (batch_size * 2) == 0 or batch_end == total_frames:
-                        progress = (batch_end / total_frames) * 100
-                        elapsed = time.time() - render_start
-                        if batch_end < total_frames:
-                            eta = (elapsed / batch_end) * (total_frames - batch_end)
-                            print(f"Processing frames {batch_end}/{total_frames} ({progress:.1f}%) - ETA: {eta:.1f}s")
-                        else:
-                            print(f"Rendering completed: {batch_end}/{total_frames} frames in {elapsed:.2f}s")
-                
-                render_time = time.time() - render_start
-            
-            finally:
-                await page.close()
-            
-            await browser.close()
-        finally:
-            await playwright.stop()
+            await self._render_with_playwright(
+                output_frames, frames1, frames2, frame1_indices, frame2_indices, transition_type, total_frames,
+                perspective, use_gpu, batch_size, background_color, width, height
+            )
         
         # 转换为tensor
         video_tensor = self._frames_to_tensor(output_frames)
@@ -194,244 +308,290 @@ class VideoFlip3DTransitionNode(ComfyNodeABC):
         
         return (video_tensor,)
     
-    async def _process_batch(self, page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames):
-        """批处理渲染多个帧"""
-        batch_frames = []
-        
-        for i in batch_indices:
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            # 使用预计算的base64数据
-            frame1_base64 = frame1_base64_list[i]
-            frame2_base64 = frame2_base64_list[i]
-            
-            # 更新页面内容和翻转动画
-            await page.evaluate(f"""
-                const frontCard = document.getElementById('frontCard');
-                const backCard = document.getElementById('backCard');
-                
-                if (frontCard) {{
-                    frontCard.style.backgroundImage = 'url({frame1_base64})';
-                }}
-                
-                if (backCard) {{
-                    backCard.style.backgroundImage = 'url({frame2_base64})';
-                }}
-                
-                // 更新翻转
-                if (window.flipController) {{
-                    window.flipController.updateRotation({progress});
-                }}
-            """)
+    def _render_with_torch(self, output_frames, video1, video2, transition_type, total_frames, perspective,
+                           background_color, width, height, device, chunk_size=8):
+        """GPU渲染：每批帧一次 grid_sample（卡片平面的逆透视映射生成采样网格）"""
+        render_start = time.time()
+        
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        matrices = self._flip_matrices(transition_type, progresses)
+        
+        # 背面剔除：卡片法向量（旋转矩阵第三列）朝向观察者的一面可见，正面不可见时显示背面
+        show_back = matrices[:, 0, 2, 2] <= 0
+        matrices = np.where(show_back[:, None, None], matrices[:, 1], matrices[:, 0])
+        
+        # 卡片平面 (x, y, 1) -> 屏幕（相对画面中心）的单应矩阵：
+        # 屏幕坐标 = 旋转后的点 * perspective / (perspective - z)
+        col_x, col_y = matrices[:, :, 0], matrices[:, :, 1]
+        homographies = np.zeros((total_frames, 3, 3))
+        homographies[:, :2, 0] = col_x[:, :2] * perspective
+        homographies[:, :2, 1] = col_y[:, :2] * perspective
+        homographies[:, 2, 0] = -col_x[:, 2]
+        homographies[:, 2, 1] = -col_y[:, 2]
+        homographies[:, 2, 2] = perspective
+        
+        # 侧面朝向观察者（旋转到90度）时卡片退化成一条线，整帧只有背景
+        visible = np.abs(matrices[:, 2, 2]) > 1e-6
+        homographies[~visible] = np.eye(3)
+        inverse_matrices = torch.from_numpy(np.linalg.inv(homographies)).to(device=device, dtype=torch.float32)
+        depth_coeffs = torch.from_numpy(np.stack([col_x[:, 2], col_y[:, 2]], axis=-1)).to(device=device, dtype=torch.float32)
+        
+        background = torch.tensor(
+            self._parse_background_color(background_color), dtype=torch.float32, device=device
+        ).div_(255.0).view(1, 3, 1, 1)
+        
+        # 输出像素中心相对画面中心的齐次坐标 [H*W, 3]，所有帧共用
+        ys, xs = torch.meshgrid(
+            torch.arange(height, dtype=torch.float32, device=device) + 0.5 - height / 2,
+            torch.arange(width, dtype=torch.float32, device=device) + 0.5 - width / 2,
+            indexing='ij'
+        )
+        dst_coords = torch.stack([xs, ys, torch.ones_like(xs)], dim=-1).view(-1, 3)
+        
+        videos = [video if video.dim() == 4 else video.unsqueeze(0) for video in (video1, video2)]
+        source_indices = [np.array(self._source_frame_indices(progresses, video.shape[0])) for video in videos]
+        
+        for start in range(0, total_frames, chunk_size):
+            end = min(start + chunk_size, total_frames)
+            count = end - start
             
-            # 优化等待时间
-            await page.wait_for_timeout(20)  # 从100ms减少到20ms
+            # 卡片坐标 (x, y)：卡片中心为原点，y轴向下
+            card_coords = dst_coords @ inverse_matrices[start:end].transpose(1, 2)
+            x = card_coords[..., 0] / card_coords[..., 2]
+            y = card_coords[..., 1] / card_coords[..., 2]
             
-            # 强制触发重绘
-            await page.evaluate("document.body.offsetHeight")
+            # 像素中心坐标归一化到 [-1, 1]（align_corners=False），卡片外和观察者身后的像素显示背景
+            grid = torch.stack([x / (width / 2), y / (height / 2)], dim=-1)
+            depth = perspective - x * depth_coeffs[start:end, 0:1] - y * depth_coeffs[start:end, 1:2]
+            inside = (grid.abs() <= 1).all(dim=-1) & (depth > 0)
+            inside &= torch.from_numpy(visible[start:end]).to(device).view(count, 1)
             
-            # 等待CSS动画完成
-            await page.wait_for_timeout(10)  # 从50ms减少到10ms
+            # 每帧采样可见一面对应的源帧（已按cover裁剪缩放到输出尺寸）
+            textures = torch.empty((count, height, width, 3), dtype=torch.float32, device=device)
+            chunk_back = show_back[start:end]
+            for face, mask in ((0, ~chunk_back), (1, chunk_back)):
+                if mask.any():
+                    frames = videos[face][source_indices[face][start:end][mask], ..., :3].to(device)
+                    textures[torch.from_numpy(mask).to(device)] = self._fit_frames(frames, width, height)
             
-            # 优化截图：使用JPEG格式
-            screenshot_bytes = await page.screenshot(type='jpeg', quality=85)
-            
-            # 转换为numpy数组
-            from PIL import Image
-            import io
-            image = Image.open(io.BytesIO(screenshot_bytes)).convert('RGB')
-            final_frame = np.array(image).astype(np.uint8)
+            sampled = F.grid_sample(
+                textures.permute(0, 3, 1, 2), grid.view(count, height, width, 2),
+                mode='bilinear', padding_mode='border', align_corners=False
+            )
+            canvas = torch.where(inside.view(count, 1, height, width), sampled, background)
             
-            batch_frames.append(final_frame)
+            output_frames[start:end] = canvas.mul(255).round_().clamp_(0, 255).to(torch.uint8).permute(0, 2, 3, 1).cpu().numpy()
         
-        return batch_frames
+        print(f"Rendering completed: {total_frames}/{total_frames} frames in {time.time() - render_start:.2f}s")
     
-    def _generate_html_template(self, transition_type, perspective, background_color, width, height):
-        """生成HTML模板 - 3D翻转卡片"""
-        
-        return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
+    def _flip_matrices(self, transition_type, progresses):
+        """每帧正面和背面的旋转矩阵 [N, 2, 3, 3]（等效CSS变换，页面和torch渲染共用）"""
+        def rotate_y(degrees):
+            c, s = np.cos(np.radians(degrees)), np.sin(np.radians(degrees))
+            zeros, ones = np.zeros_like(c), np.ones_like(c)
+            return np.stack([c, zeros, s, zeros, ones, zeros, -s, zeros, c], axis=-1).reshape(-1, 3, 3)
+        
+        def rotate_x(degrees):
+            c, s = np.cos(np.radians(degrees)), np.sin(np.radians(degrees))
+            zeros, ones = np.zeros_like(c), np.ones_like(c)
+            return np.stack([ones, zeros, zeros, zeros, c, -s, zeros, s, c], axis=-1).reshape(-1, 3, 3)
+        
+        angles = progresses * 180  # 0度 -> 180度
+        
+        if transition_type == 'vertical_flip':
+            # 垂直翻转（绕X轴）
+            front, back = rotate_x(-angles), rotate_x(180 - angles)
+        elif transition_type == 'oblique_flip':
+            # 斜向翻转 - 像书页一样从右边翻过来，带轻微抬起
+            lift = rotate_x(-np.sin(progresses * np.pi) * 10)  # 最大抬起10度
+            front, back = rotate_y(angles) @ lift, rotate_y(180 + angles) @ lift
+        else:
+            # 水平翻转（绕Y轴）
+            front, back = rotate_y(angles), rotate_y(180 + angles)
         
-        body {{
-            width: {width}px;
-            height: {height}px;
-            background: {background_color};
-            overflow: hidden;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            perspective: {perspective}px;
-            perspective-origin: 50% 50%;
-        }}
-        
-        .flip-container {{
-            width: {width}px;
-            height: {height}px;
-            position: relative;
-            transform-style: preserve-3d;
-        }}
-        
-        .flip-card {{
-            position: absolute;
-            width: {width}px;
-            height: {height}px;
-            backface-visibility: hidden;
-            background-size: cover;
-            background-position: center;
-            background-repeat: no-repeat;
-            border: none;
-        }}
-        
-        .front {{
-            z-index: 2;
-        }}
-        
-        .back {{
-            transform: rotateY(180deg);
-            z-index: 1;
-        }}
-    </style>
-</head>
-<body>
-    <div class="flip-container" id="flipContainer">
-        <div class="flip-card front" id="frontCard"></div>
-        <div class="flip-card back" id="backCard"></div>
-    </div>
+        return np.stack([front, back], axis=1)
     
-    <script>
-        class FlipController {{
-            constructor() {{
-                this.container = document.getElementById('flipContainer');
-                this.frontCard = document.getElementById('frontCard');
-                this.backCard = document.getElementById('backCard');
-                this.transitionType = '{transition_type}';
-                this.ready = true;
-                
-                // console.log('🎬 FlipController initialized, type=' + this.transitionType);
-            }}
+    async def _render_with_playwright(self, output_frames, frames1, frames2, frame1_indices, frame2_indices,
+                                      transition_type, total_frames, perspective, use_gpu, batch_size,
+                                      background_color, width, height):
+        """浏览器渲染：WebGL逐批绘制长图并读回（frame_indices为每个转场帧在frames中的位置）"""
+        # 页面按URL拉取纹理，同一源帧URL相同
+        frame1_urls = [f"{_FRAME_HOST}/frame1/{idx}.jpg" for idx in frame1_indices]
+        frame2_urls = [f"{_FRAME_HOST}/frame2/{idx}.jpg" for idx in frame2_indices]
+        
+        # 预先算好每帧正面和背面旋转矩阵的前两列（与torch渲染共用），页面只做投影
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        flip_axes = self._flip_matrices(transition_type, progresses)[..., :2].swapaxes(-1, -2).reshape(total_frames, 2, 6).tolist()
+        
+        # 一个批次的帧竖向画在一张长图上，一次读回（限制长图高度不超过纹理上限）
+        batch_size = max(1, min(batch_size, 16384 // height))
+        batches = [list(range(start, min(start + batch_size, total_frames))) for start in range(0, total_frames, batch_size)]
+        num_pages = max(1, min(_MAX_RENDER_PAGES, os.cpu_count() or 1, len(batches)))
+        
+        # 拦截纹理请求，直接返回预编码的JPEG字节（不再经过base64和data URL）
+        async def serve_frame(route):
+            source, name = route.request.url.rsplit('/', 2)[-2:]
+            await route.fulfill(
+                body=frame_sources[source][int(name.split('.')[0])],
+                content_type='image/jpeg',
+                # WebGL纹理要求跨域许可
+                headers={'Access-Control-Allow-Origin': '*', 'Cache-Control': 'max-age=3600'},
+            )
+        
+        async def prepare_page(page):
+            await page.route(f"{_FRAME_HOST}/**", serve_frame)
+            
+            # 加载HTML页面：内联脚本在解析时同步执行，DOMContentLoaded时flipController已创建，无需轮询等待
+            await page.set_content(_HTML_SHELL, wait_until='domcontentloaded', timeout=30000)
             
-            updateRotation(progress) {{
-                // progress: 0 -> 1
-                const angle = progress * 180;  // 0度 -> 180度
+            # 传入本次渲染参数
+            await page.evaluate("params => window.flipController.init(params)", {
+                'perspective': perspective,
+                'backgroundColor': background_color,
+                'width': width,
+                'height': height,
+                'batchSize': batch_size,
+            })
+        
+        completed = 0
+        
+        async def render_worker(page, worker_batches):
+            nonlocal completed
+            for batch_indices in worker_batches:
+                # 批处理：一次处理多个帧
+                await self._process_batch(
+                    page, output_frames, batch_indices, frame1_urls, frame2_urls, flip_axes
+                )
+                completed += len(batch_indices)
                 
-                let frontTransform, backTransform;
+                # 显示进度 - 每2个批次或完成时显示
+                if completed % (batch_size * 2) == 0 or completed == total_frames:
+                    progress = (completed / total_frames) * 100
+                    elapsed = time.time() - render_start
+                    if completed < total_frames:
+                        eta = (elapsed / completed) * (total_frames - completed)
+                        print(f"Processing frames {completed}/{total_frames} ({progress:.1f}%) - ETA: {eta:.1f}s")
+                    else:
+                        print(f"Rendering completed: {completed}/{total_frames} frames in {elapsed:.2f}s")
+        
+        # 后台线程编码源帧，与下面的浏览器启动和页面加载同时进行
+        encode_cancelled = threading.Event()
+        encode_future = asyncio.get_running_loop().run_in_executor(
+            None, self._encode_frame_sources, frames1, frames2, encode_cancelled
+        )
+        
+        try:
+            # 复用共享浏览器，同一时间只有一次调用在渲染
+            async with shared_browser(use_gpu) as browser:
+                pages = []
                 
-                switch(this.transitionType) {{
-                    case 'horizontal_flip':
-                        // 水平翻转（绕Y轴）
-                        frontTransform = `rotateY(${{angle}}deg)`;
-                        backTransform = `rotateY(${{180 + angle}}deg)`;
-                        break;
-                    
-                    case 'vertical_flip':
-                        // 垂直翻转（绕X轴）
-                        frontTransform = `rotateX(${{-angle}}deg)`;
-                        backTransform = `rotateX(${{180 - angle}}deg)`;
-                        break;
+                try:
+                    # 每个页面有独立的上下文（画面从画布读回，视口大小不影响输出）
+                    for _ in range(num_pages):
+                        pages.append(await browser.new_page(viewport={'width': width, 'height': height}))
+                    await asyncio.gather(*[prepare_page(page) for page in pages])
                     
-                    case 'oblique_flip':
-                        // 斜向翻转 - 像书页一样从右边翻过来，带轻微抬起
-                        const obliqueAngle = angle;
-                        // 添加X轴偏移，模拟翻转时的轻微抬起
-                        const liftAngle = Math.sin(progress * Math.PI) * 10;  // 最大抬起10度
-                        frontTransform = `rotateY(${{obliqueAngle}}deg) rotateX(${{-liftAngle}}deg)`;
-                        backTransform = `rotateY(${{180 + obliqueAngle}}deg) rotateX(${{-liftAngle}}deg)`;
-                        break;
+                    # 页面就绪后再等待编码结果，纹理请求在渲染时才会发出
+                    frame_sources = await encode_future
                     
-                    default:
-                        frontTransform = `rotateY(${{angle}}deg)`;
-                        backTransform = `rotateY(${{180 + angle}}deg)`;
-                }}
-                
-                this.frontCard.style.transform = frontTransform;
-                this.backCard.style.transform = backTransform;
-                
-                // 强制重绘
-                void this.container.offsetHeight;
+                    # 批次交错分配给各页面并发渲染，结果按帧索引直接写入输出缓冲区
+                    render_start = time.time()
+                    await asyncio.gather(*[
+                        render_worker(page, batches[offset::len(pages)]) for offset, page in enumerate(pages)
+                    ])
                 
-                // console.log(`[JS] Update: angle=${{angle.toFixed(1)}}°, type=${{this.transitionType}}`);
-            }}
-        }}
-        
-        window.flipController = new FlipController();
-        // console.log('✅ FlipController initialized');
-    </script>
-</body>
-</html>
-"""
+                finally:
+                    for page in pages:
+                        await page.close()
+        finally:
+            # 启动或页面准备失败时不会再读取编码结果：让线程池跳过剩余源帧，并取回结果，避免编码异常丢失
+            encode_cancelled.set()
+            await asyncio.gather(encode_future, return_exceptions=True)
     
-    def _extract_video_frames(self, video_tensor):
-        """从视频tensor中提取帧"""
-        frames = []
-        
-        if video_tensor.dim() == 4:
-            batch_size = video_tensor.shape[0]
-            for i in range(batch_size):
-                frame = video_tensor[i]
-                frames.append(frame)
-        else:
-            frames.append(video_tensor)
-        
-        return frames
+    def _encode_frame_sources(self, frames1, frames2, cancelled):
+        """多线程编码源帧为JPEG，返回 {'frame1': {索引: 字节}, 'frame2': {...}}；cancelled置位后跳过剩余帧"""
+        def encode(frame):
+            if cancelled.is_set():
+                return None
+            return self._numpy_to_jpeg(frame)
+        
+        # OpenCV的JPEG编码会释放GIL；源帧已去重，多个转场帧对应同一源帧时（如静态图片）只编码一次
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            return {
+                'frame1': dict(enumerate(executor.map(encode, frames1))),
+                'frame2': dict(enumerate(executor.map(encode, frames2))),
+            }
     
-    def _tensor_to_numpy(self, frame_tensor):
-        """将tensor转换为numpy数组"""
-        if isinstance(frame_tensor, torch.Tensor):
-            frame_np = frame_tensor.cpu().numpy()
-        else:
-            frame_np = frame_tensor
-        
-        # 转换数据类型
-        if frame_np.dtype == np.float32 or frame_np.dtype == np.float64:
-            frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
-        
-        return frame_np
+    async def _process_batch(self, page, output_frames, batch_indices, frame1_urls, frame2_urls, flip_axes):
+        """批处理渲染多个帧：一次evaluate画完整个批次并读回长图，按帧写入输出缓冲区"""
+        width = output_frames.shape[2]
+        batch_data = [[frame1_urls[i], frame2_urls[i], *flip_axes[i]] for i in batch_indices]
+        
+        # WebGL逐帧渲染到长图对应区域，同一次evaluate返回画布的PNG data URL
+        data_url = await page.evaluate("frames => window.flipController.renderBatch(frames)", batch_data)
+        
+        # 解码放到线程池（OpenCV解码会释放GIL），其他页面的渲染请求不必等待；结果按长图形状取视图直接写入输出缓冲区
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._decode_strip, data_url,
+            output_frames[batch_indices[0]:batch_indices[-1] + 1].reshape(-1, width, 3)
+        )
     
-    def _numpy_to_base64(self, frame_np):
-        """将numpy数组转换为base64字符串"""
-        import io
-        import base64
-        from PIL import Image
-        
-        # 确保是uint8类型
-        if frame_np.dtype != np.uint8:
-            frame_np = (frame_np * 255).clip(0, 255).astype(np.uint8)
-        
-        # 转换为PIL图片
-        image = Image.fromarray(frame_np, mode='RGB')
+    def _decode_strip(self, data_url, dst):
+        """解码画布读回的PNG长图，只取dst对应的区域，BGR转RGB时直接写入dst"""
+        png_bytes = np.frombuffer(base64.b64decode(data_url.split(',', 1)[1]), dtype=np.uint8)
+        strip = cv2.imdecode(png_bytes, cv2.IMREAD_COLOR)
+        cv2.cvtColor(strip[:dst.shape[0]], cv2.COLOR_BGR2RGB, dst=dst)
+    
+    def _source_frame_indices(self, progresses, num_frames):
+        """每个转场帧对应的源视频帧索引"""
+        return np.minimum((progresses * (num_frames - 1)).astype(np.int64), num_frames - 1).tolist()
+    
+    def _tensor_to_numpy(self, video_tensor, width, height, progresses):
+        """转场用到的源帧转换为uint8 numpy数组，返回 (去重后的源帧 [U,H,W,C], 每个转场帧在其中的位置)"""
+        if video_tensor.dim() == 3:
+            video_tensor = video_tensor.unsqueeze(0)
+        
+        # 转场帧数少于源视频帧数时，未用到的帧不做缩放也不拷回CPU
+        unique_indices, positions = np.unique(
+            self._source_frame_indices(progresses, video_tensor.shape[0]), return_inverse=True
+        )
+        frames = video_tensor[torch.from_numpy(unique_indices).to(video_tensor.device)]
+        frames = self._fit_frames(frames, width, height).mul(255).clamp_(0, 255).to(torch.uint8).cpu().numpy()
+        
+        return frames, positions.tolist()
+    
+    def _fit_frames(self, video_tensor, width, height):
+        """视频帧 [N,H,W,C] 在所在设备上裁剪缩放到输出尺寸"""
+        # 等效 background-size: cover：居中裁剪到目标宽高比，再缩放到输出尺寸，尺寸已一致时跳过
+        src_height, src_width = video_tensor.shape[1:3]
+        if (src_height, src_width) != (height, width):
+            cover_scale = max(width / src_width, height / src_height)
+            crop_width = min(src_width, round(width / cover_scale))
+            crop_height = min(src_height, round(height / cover_scale))
+            left = (src_width - crop_width) // 2
+            top = (src_height - crop_height) // 2
+            frames = video_tensor[:, top:top + crop_height, left:left + crop_width].permute(0, 3, 1, 2)
+            
+            # area只适合缩小；放大时使用bilinear
+            mode = 'area' if cover_scale < 1 else 'bilinear'
+            video_tensor = F.interpolate(frames.float(), size=(height, width), mode=mode).permute(0, 2, 3, 1)
         
-        # 转换为base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        return video_tensor
+    
+    def _numpy_to_jpeg(self, frame_np):
+        """将uint8 numpy数组编码为JPEG字节（OpenCV JPEG编码）"""
+        # JPEG编码远快于PNG的zlib压缩，数据量也更小；直接调用libjpeg，省去PIL的图片对象和BytesIO
+        ok, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame_np, cv2.COLOR_RGB2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), 90])
         
-        return f"data:image/png;base64,{img_str}"
+        return buffer.tobytes()
+    
+    def _parse_background_color(self, color_str):
+        """解析背景颜色字符串（#RGB或#RRGGBB）为RGB元组，无法解析时使用默认黑色"""
+        return parse_hex_color(color_str)
     
     def _frames_to_tensor(self, frames):
-        """将帧列表转换为视频tensor"""
-        if not frames:
-            return torch.zeros((1, 640, 640, 3), dtype=torch.float32)
-        
-        frame_tensors = []
-        for frame in frames:
-            if isinstance(frame, np.ndarray):
-                frame_tensor = torch.from_numpy(frame).float() / 255.0
-                frame_tensors.append(frame_tensor)
-            else:
-                frame_tensors.append(frame)
-        
-        video_tensor = torch.stack(frame_tensors, dim=0)
-        
-        return video_tensor
+        """将预分配的uint8帧缓冲区一次性转换为视频tensor"""
+        return torch.from_numpy(frames).float().mul_(1.0 / 255.0)
 
 
 # 注册节点
@@ -3,6 +3,11 @@
 数字故障、像素错位、RGB分离、信号干扰等效果 - 加强版
 """
 
+import os
+import base64
+import asyncio
+import concurrent.futures
+import threading
 import torch
 import json
 import cv2
@@ -12,6 +17,13 @@ import time
 from comfy.comfy_types.node_typing import ComfyNodeABC, InputTypeDict, IO
 
 
+# 源帧纹理的虚拟地址：请求由page.route拦截，直接返回PNG字节
+_FRAME_HOST = "http://glitch-frames.local"
+
+# Chromium单次截图/合成的最大边长，决定每批纵向拼接的帧数上限
+_MAX_STRIP_HEIGHT = 16384
+
+
 class VideoGlitchArtEnhancedNode(ComfyNodeABC):
     """视频故障艺术转场 - 增强版（超强视觉冲击）"""
     
@@ -82,33 +94,29 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
         frames2 = self._extract_video_frames(video2)
         print(f"Video frames: {len(frames1)} -> {len(frames2)}, generating {total_frames} transition frames")
         
-        # 预计算帧数据
-        frame1_base64_list = []
-        frame2_base64_list = []
+        # 每个转场帧对应的源帧索引（单帧视频时始终为0）
+        progresses = np.arange(total_frames) / max(total_frames - 1, 1)
+        frame1_indices = np.minimum((progresses * (len(frames1) - 1)).astype(np.int64), len(frames1) - 1).tolist()
+        frame2_indices = np.minimum((progresses * (len(frames2) - 1)).astype(np.int64), len(frames2) - 1).tolist()
         
-        for i in range(total_frames):
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            if len(frames1) == 1:
-                frame1_data = self._tensor_to_numpy(frames1[0])
-            else:
-                frame1_idx = min(int(progress * (len(frames1) - 1)), len(frames1) - 1)
-                frame1_data = self._tensor_to_numpy(frames1[frame1_idx])
-            
-            if len(frames2) == 1:
-                frame2_data = self._tensor_to_numpy(frames2[0])
-            else:
-                frame2_idx = min(int(progress * (len(frames2) - 1)), len(frames2) - 1)
-                frame2_data = self._tensor_to_numpy(frames2[frame2_idx])
-            
-            frame1_base64_list.append(self._numpy_to_base64(frame1_data))
-            frame2_base64_list.append(self._numpy_to_base64(frame2_data))
+        # 页面按URL拉取纹理，同一源帧URL相同（浏览器按URL缓存解码结果）
+        frame1_urls = [f"{_FRAME_HOST}/frame1/{idx}.png" for idx in frame1_indices]
+        frame2_urls = [f"{_FRAME_HOST}/frame2/{idx}.png" for idx in frame2_indices]
+        
+        # 一个批次的帧纵向拼成一条，整批只截一次图
+        batch_size = max(1, min(batch_size, _MAX_STRIP_HEIGHT // height))
         
         # 使用Playwright渲染
         from playwright.async_api import async_playwright
         
         playwright = await async_playwright().start()
         
+        # 预计算帧数据：后台线程池编码，与下面的浏览器启动和页面加载同时进行
+        encode_cancelled = threading.Event()
+        encode_future = asyncio.get_running_loop().run_in_executor(
+            None, self._encode_frame_sources, frames1, frames2, frame1_indices, frame2_indices, encode_cancelled
+        )
+        
         try:
             if use_gpu:
                 print("Playwright browser starting with GPU acceleration")
@@ -148,26 +156,41 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 color_madness, screen_tear, flash_effects, background_color, width, height
             )
             
-            page = await browser.new_page(viewport={'width': width, 'height': height})
+            page = await browser.new_page(viewport={'width': width, 'height': height * batch_size})
+            
+            # CDP会话：直接截取合成器画面
+            cdp_session = await page.context.new_cdp_session(page)
             
             try:
+                # 拦截纹理请求，直接返回预编码的PNG字节（不再经过base64和data URL）
+                async def serve_frame(route):
+                    source, name = route.request.url.rsplit('/', 2)[-2:]
+                    await route.fulfill(
+                        body=frame_sources[source][int(name.split('.')[0])],
+                        content_type='image/png',
+                        headers={'Cache-Control': 'max-age=3600'},
+                    )
+                
+                await page.route(f"{_FRAME_HOST}/**", serve_frame)
+                
                 await page.set_content(html_content, wait_until='domcontentloaded', timeout=30000)
                 await page.wait_for_function("window.enhancedGlitchController && window.enhancedGlitchController.ready", timeout=15000)
                 
-                output_frames = []
+                # 页面就绪后再等待编码结果，纹理请求在渲染时才会发出
+                frame_sources = await encode_future
+                
+                # 预分配整段输出缓冲区，截图直接解码写入对应位置
+                output_frames = np.empty((total_frames, height, width, 3), dtype=np.uint8)
                 render_start = time.time()
                 
                 for batch_start in range(0, total_frames, batch_size):
                     batch_end = min(batch_start + batch_size, total_frames)
-                    batch_indices = list(range(batch_start, batch_end))
                     
-                    batch_frames = await self._process_enhanced_batch(
-                        page, batch_indices, frame1_base64_list, frame2_base64_list, 
-                        total_frames, quality
+                    await self._process_enhanced_batch(
+                        page, cdp_session, output_frames, batch_start, batch_end, frame1_urls, frame2_urls,
+                        total_frames, width, height, quality
                     )
                     
-                    output_frames.extend(batch_frames)
-                    
                     # 显示进度 - 每2个批次或完成时显示
                     if batch_end % (batch_size * 2) == 0 or batch_end == total_frames:
                         progress = (batch_end / total_frames) * 100
@@ -183,6 +206,9 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
             
             await browser.close()
         finally:
+            # 启动或页面加载失败时不会再读取编码结果：让线程池跳过剩余源帧，并取回结果，避免编码异常丢失
+            encode_cancelled.set()
+            await asyncio.gather(encode_future, return_exceptions=True)
             await playwright.stop()
         
         video_tensor = self._frames_to_tensor(output_frames)
@@ -192,36 +218,55 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
         
         return (video_tensor,)
     
-    async def _process_enhanced_batch(self, page, batch_indices, frame1_base64_list, frame2_base64_list, total_frames, quality):
-        """处理增强版批次"""
-        batch_frames = []
+    async def _process_enhanced_batch(self, page, cdp_session, output_frames, batch_start, batch_end, frame1_urls, frame2_urls,
+                                      total_frames, width, height, quality):
+        """处理增强版批次：整批帧在页面中纵向拼成一条，一次截图后按帧切分写入输出缓冲区"""
+        frames = [
+            [i / (total_frames - 1) if total_frames > 1 else 0, frame1_urls[i], frame2_urls[i]]
+            for i in range(batch_start, batch_end)
+        ]
         
-        for i in batch_indices:
-            progress = i / (total_frames - 1) if total_frames > 1 else 0
-            
-            frame1_base64 = frame1_base64_list[i]
-            frame2_base64 = frame2_base64_list[i]
-            
-            await page.evaluate(f"""
-                if (window.enhancedGlitchController) {{
-                    window.enhancedGlitchController.updateFrame({progress}, '{frame1_base64}', '{frame2_base64}');
-                }}
-            """)
-            
-            await page.wait_for_timeout(40)
-            await page.evaluate("document.body.offsetHeight")
-            await page.wait_for_timeout(20)
-            
-            screenshot_bytes = await page.screenshot(type='jpeg', quality=quality)
-            
-            from PIL import Image
-            import io
-            image = Image.open(io.BytesIO(screenshot_bytes)).convert('RGB')
-            final_frame = np.array(image).astype(np.uint8)
-            
-            batch_frames.append(final_frame)
+        # 一次调用渲染整批帧，页面内逐帧推进并写入各自的条带位置；批次编号用batch_end（单调递增）
+        await page.evaluate(
+            "([frameId, frames]) => window.enhancedGlitchController.renderBatch(frameId, frames)",
+            [batch_end, frames]
+        )
+        
+        # 等待条带真正绘制完成（页面在两次requestAnimationFrame后置位），不再固定等待
+        await page.wait_for_function(f"window.__frameReady === {batch_end}", timeout=10000)
         
-        return batch_frames
+        # 通过CDP截图，只截取本批次实际占用的条带区域
+        screenshot = await cdp_session.send('Page.captureScreenshot', {
+            'format': 'jpeg',
+            'quality': quality,
+            'fromSurface': True,
+            'captureBeyondViewport': False,
+            'optimizeForSpeed': True,
+            'clip': {'x': 0, 'y': 0, 'width': width, 'height': height * len(frames), 'scale': 1},
+        })
+        
+        # OpenCV解码，BGR转RGB时直接写入输出缓冲区的连续区间（条带按行拼接，与帧序一致）
+        jpeg_bytes = np.frombuffer(base64.b64decode(screenshot['data']), dtype=np.uint8)
+        cv2.cvtColor(
+            cv2.imdecode(jpeg_bytes, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB,
+            dst=output_frames[batch_start:batch_end].reshape(-1, width, 3)
+        )
+    
+    def _encode_frame_sources(self, frames1, frames2, frame1_indices, frame2_indices, cancelled):
+        """多线程编码转场用到的源帧为PNG，返回 {'frame1': {索引: 字节}, 'frame2': {...}}；cancelled置位后跳过剩余帧"""
+        def encode(frame):
+            if cancelled.is_set():
+                return None
+            return self._numpy_to_png(self._tensor_to_numpy(frame))
+        
+        # 多个转场帧对应同一源帧时（如静态图片）只编码一次；PIL的PNG编码（zlib压缩）会释放GIL，各帧互不依赖
+        unique1 = sorted(set(frame1_indices))
+        unique2 = sorted(set(frame2_indices))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            frame1_cache = dict(zip(unique1, executor.map(encode, [frames1[idx] for idx in unique1])))
+            frame2_cache = dict(zip(unique2, executor.map(encode, [frames2[idx] for idx in unique2])))
+        
+        return {'frame1': frame1_cache, 'frame2': frame2_cache}
     
     def _generate_enhanced_html_template(self, glitch_style, chaos_level, corruption_rate, visual_intensity, color_madness, screen_tear, flash_effects, background_color, width, height):
         """生成增强版HTML模板"""
@@ -240,7 +285,6 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
         
         body {{
             width: {width}px;
-            height: {height}px;
             background: {background_color};
             overflow: hidden;
             position: relative;
@@ -249,8 +293,14 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
         
         .enhanced-glitch-container {{
             position: relative;
-            width: 100%;
-            height: 100%;
+            width: {width}px;
+            height: {height}px;
+            overflow: hidden;
+            background: {background_color};
+        }}
+        
+        #liveStage {{
+            display: none;
         }}
         
         .video-layer {{
@@ -292,14 +342,20 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
     </style>
 </head>
 <body>
-    <div class="enhanced-glitch-container" id="enhancedGlitchContainer">
-        <div class="video-layer" id="video1Layer"></div>
-        <div class="video-layer" id="video2Layer"></div>
-        <div class="chaos-layer" id="chaosLayer"></div>
+    <div id="liveStage">
+        <div class="enhanced-glitch-container" id="enhancedGlitchContainer">
+            <div class="video-layer" id="video1Layer"></div>
+            <div class="video-layer" id="video2Layer"></div>
+            <div class="chaos-layer" id="chaosLayer"></div>
+        </div>
     </div>
+    <div id="frameStrip"></div>
     <div class="loading" id="loading">Initializing enhanced glitch system...</div>
     
     <script>
+        // 虚拟时钟每帧推进的毫秒数（对应原先逐帧渲染的间隔）
+        const FRAME_INTERVAL = 60;
+        
         class EnhancedGlitchController {{
             constructor() {{
                 this.ready = false;
@@ -313,17 +369,26 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 this.width = {width};
                 this.height = {height};
                 
+                this.stage = null;
                 this.video1Layer = null;
                 this.video2Layer = null;
                 this.chaosLayer = null;
+                this.frameStrip = null;
                 
                 this.chaosElements = [];
                 
+                // 效果复位按虚拟时钟调度，批量渲染时与墙钟无关
+                this.clock = 0;
+                this.timers = [];
+                this.textures = new Map();
+                
                 this.init();
             }}
             
             async init() {{
                 try {{
+                    this.stage = document.getElementById('enhancedGlitchContainer');
+                    this.frameStrip = document.getElementById('frameStrip');
                     this.video1Layer = document.getElementById('video1Layer');
                     this.video2Layer = document.getElementById('video2Layer');
                     this.chaosLayer = document.getElementById('chaosLayer');
@@ -348,11 +413,60 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 }}
             }}
             
-            updateFrame(progress, texture1Base64, texture2Base64) {{
+            schedule(callback, delay) {{
+                this.timers.push({{ time: this.clock + delay, callback }});
+            }}
+            
+            advanceClock(ms) {{
+                this.clock += ms;
+                const due = this.timers.filter(timer => timer.time <= this.clock).sort((a, b) => a.time - b.time);
+                this.timers = this.timers.filter(timer => timer.time > this.clock);
+                due.forEach(timer => timer.callback());
+            }}
+            
+            loadTexture(url) {{
+                // 保留Image对象引用，克隆出的图层直接命中已解码的缓存
+                const image = new Image();
+                image.src = url;
+                return image.decode().then(() => image);
+            }}
+            
+            async renderBatch(frameId, frames) {{
+                if (!this.ready) return;
+                
+                // 预先解码本批次纹理，只保留本批次用到的
+                const textures = new Map();
+                frames.forEach(([, url1, url2]) => {{
+                    [url1, url2].forEach(url => {{
+                        if (!textures.has(url)) textures.set(url, this.textures.get(url) || this.loadTexture(url));
+                    }});
+                }});
+                this.textures = textures;
+                await Promise.all(textures.values());
+                
+                // 逐帧推进活动舞台，每帧克隆一份快照按顺序纵向排入条带
+                const snapshots = frames.map(([progress, url1, url2]) => {{
+                    this.advanceClock(FRAME_INTERVAL);
+                    this.updateFrame(progress, url1, url2);
+                    
+                    const snapshot = this.stage.cloneNode(true);
+                    snapshot.removeAttribute('id');
+                    snapshot.querySelectorAll('[id]').forEach(element => element.removeAttribute('id'));
+                    return snapshot;
+                }});
+                this.frameStrip.replaceChildren(...snapshots);
+                
+                // 两次rAF后条带已提交绘制，通知Python截图
+                requestAnimationFrame(() => requestAnimationFrame(() => {{
+                    window.__frameReady = frameId;
+                }}));
+            }}
+            
+            updateFrame(progress, texture1Url, texture2Url) {{
                 if (!this.ready) return;
                 
                 try {{
-                    this.updateVideoLayers(progress, texture1Base64, texture2Base64);
+                    this.updateVideoLayers(progress, texture1Url, texture2Url);
                     
                     switch(this.glitchStyle) {{
                         case 'compression_nightmare':
@@ -375,9 +489,9 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 }}
             }}
             
-            updateVideoLayers(progress, texture1Base64, texture2Base64) {{
-                this.video1Layer.style.backgroundImage = `url(${{texture1Base64}})`;
-                this.video2Layer.style.backgroundImage = `url(${{texture2Base64}})`;
+            updateVideoLayers(progress, texture1Url, texture2Url) {{
+                this.video1Layer.style.backgroundImage = `url(${{texture1Url}})`;
+                this.video2Layer.style.backgroundImage = `url(${{texture2Url}})`;
                 
                 const chaosProgress = this.calculateChaosProgress(progress);
                 this.video1Layer.style.opacity = 1 - chaosProgress;
@@ -544,7 +658,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                                 break;
                         }}
                         
-                        setTimeout(() => {{
+                        this.schedule(() => {{
                             element.style.opacity = '0';
                             element.style.animation = '';
                             element.style.transform = '';
@@ -557,13 +671,13 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 
                 // 量子真空涨落
                 if (Math.random() < totalDecay * 0.3) {{
-                    document.body.style.background = `
+                    this.stage.style.background = `
                         radial-gradient(circle at ${{Math.random() * 100}}% ${{Math.random() * 100}}%,
                             ${{this.getRandomNightmareColor()}} 0%,
                             transparent 20%)
                     `;
-                    setTimeout(() => {{
-                        document.body.style.background = '{background_color}';
+                    this.schedule(() => {{
+                        this.stage.style.background = '{background_color}';
                     }}, 100);
                 }}
             }}
@@ -744,7 +858,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                                 break;
                         }}
                         
-                        setTimeout(() => {{
+                        this.schedule(() => {{
                             element.style.opacity = '0';
                             element.style.animation = '';
                             element.style.transform = '';
@@ -757,7 +871,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 
                 // 神经网络系统性崩溃
                 if (Math.random() < totalCollapse * 0.4) {{
-                    document.body.style.background = `
+                    this.stage.style.background = `
                         linear-gradient(${{Math.random() * 360}}deg,
                             #ff0040 0%,
                             #00ff80 25%,
@@ -765,19 +879,19 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                             #ff8000 75%,
                             #ff0040 100%)
                     `;
-                    document.body.style.filter = `blur(${{totalCollapse * 2}}px)`;
-                    setTimeout(() => {{
-                        document.body.style.background = '{background_color}';
-                        document.body.style.filter = '';
+                    this.stage.style.filter = `blur(${{totalCollapse * 2}}px)`;
+                    this.schedule(() => {{
+                        this.stage.style.background = '{background_color}';
+                        this.stage.style.filter = '';
                     }}, 150);
                 }}
                 
                 // AI意识闪烁
                 if (this.flashEffects && Math.random() < neuralSpike * 0.3) {{
                     const consciousnessColors = ['#ff0040', '#00ff80', '#8000ff', '#ff8000', '#40ff00'];
-                    document.body.style.backgroundColor = consciousnessColors[Math.floor(Math.random() * consciousnessColors.length)];
-                    setTimeout(() => {{
-                        document.body.style.backgroundColor = '{background_color}';
+                    this.stage.style.backgroundColor = consciousnessColors[Math.floor(Math.random() * consciousnessColors.length)];
+                    this.schedule(() => {{
+                        this.stage.style.backgroundColor = '{background_color}';
                     }}, 80);
                 }}
             }}
@@ -934,7 +1048,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                                 break;
                         }}
                         
-                        setTimeout(() => {{
+                        this.schedule(() => {{
                             element.style.opacity = '0';
                             element.style.filter = '';
                             element.style.boxShadow = '';
@@ -953,7 +1067,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                     this.video1Layer.style.clipPath = `polygon(0 0, 100% 0, 100% ${{tearY}}px, 0 ${{tearY}}px)`;
                     this.video2Layer.style.clipPath = `polygon(0 ${{tearY + tearHeight}}px, 100% ${{tearY + tearHeight}}px, 100% 100%, 0 100%)`;
                     
-                    setTimeout(() => {{
+                    this.schedule(() => {{
                         this.video1Layer.style.clipPath = '';
                         this.video2Layer.style.clipPath = '';
                     }}, 150);
@@ -974,7 +1088,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                     explosionElement.style.opacity = this.colorMadness * 0.3;
                     explosionElement.style.mixBlendMode = 'screen';
                     
-                    setTimeout(() => {{
+                    this.schedule(() => {{
                         explosionElement.style.opacity = '0';
                     }}, 100);
                 }}
@@ -1175,7 +1289,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                                 break;
                         }}
                         
-                        setTimeout(() => {{
+                        this.schedule(() => {{
                             element.style.opacity = '0';
                             element.style.animation = '';
                             element.style.transform = '';
@@ -1188,7 +1302,7 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                 
                 // 数字世界崩塌
                 if (Math.random() < totalMeltdown * 0.3) {{
-                    document.body.style.background = `
+                    this.stage.style.background = `
                         conic-gradient(
                             from ${{Math.random() * 360}}deg at 50% 50%,
                             #00ff00 0deg,
@@ -1200,8 +1314,8 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
                             #00ff00 360deg
                         )
                     `;
-                    setTimeout(() => {{
-                        document.body.style.background = '{background_color}';
+                    this.schedule(() => {{
+                        this.stage.style.background = '{background_color}';
                     }}, 120);
                 }}
             }}
@@ -1359,10 +1473,9 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
         
         return frame_np
     
-    def _numpy_to_base64(self, frame_np):
-        """将numpy数组转换为base64字符串"""
+    def _numpy_to_png(self, frame_np):
+        """将numpy数组编码为PNG字节"""
         import io
-        import base64
         from PIL import Image
         
         # 确保是uint8类型
@@ -1372,29 +1485,15 @@ class VideoGlitchArtEnhancedNode(ComfyNodeABC):
         # 转换为PIL图片
         image = Image.fromarray(frame_np, mode='RGB')
         
-        # 转换为base64
+        # 编码为PNG字节
         buffered = io.BytesIO()
         image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
         
-        return f"data:image/png;base64,{img_str}"
+        return buffered.getvalue()
     
     def _frames_to_tensor(self, frames):
-        """将帧列表转换为视频tensor"""
-        if not frames:
-            return torch.zeros((1, 640, 640, 3), dtype=torch.float32)
-        
-        frame_tensors = []
-        for frame in frames:
-            if isinstance(frame, np.ndarray):
-                frame_tensor = torch.from_numpy(frame).float() / 255.0
-                frame_tensors.append(frame_tensor)
-            else:
-                frame_tensors.append(frame)
-        
-        video_tensor = torch.stack(frame_tensors, dim=0)
-        
-        return video_tensor
+        """将预分配的uint8帧缓冲区一次性转换为视频tensor"""
+        return torch.from_numpy(frames).float().mul_(1.0 / 255.0)
 
 
 # 注册节点
@@ -0,0 +1,27 @@
+"""
+测试公共配置：按包导入py目录下的节点模块
+"""
+
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+_PY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "py")
+_PACKAGE = "videotransition_nodes"
+
+
+@pytest.fixture(scope="session")
+def load_node_module():
+    """返回加载函数：节点模块之间使用相对导入（如共享浏览器池），需作为同一个包的子模块导入"""
+    if _PACKAGE not in sys.modules:
+        package = types.ModuleType(_PACKAGE)
+        package.__path__ = [_PY_DIR]
+        sys.modules[_PACKAGE] = package
+    
+    def load(name):
+        return importlib.import_module(f"{_PACKAGE}.{name}")
+    
+    return load
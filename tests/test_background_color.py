@@ -0,0 +1,31 @@
+"""
+背景颜色解析测试（立方体与3D翻转节点共用 _colors.parse_hex_color）
+"""
+
+import pytest
+
+pytest.importorskip("comfy.comfy_types.node_typing")
+pytest.importorskip("cv2")
+
+COLOR_CASES = [
+    ("#fff", (255, 255, 255)),
+    ("#FF8000", (255, 128, 0)),
+    ("#123", (17, 34, 51)),
+    (" #0000ff ", (0, 0, 255)),
+    ("#zzzzzz", (0, 0, 0)),
+    ("#12345", (0, 0, 0)),
+    ("#ff_fff", (0, 0, 0)),
+    ("red", (0, 0, 0)),
+]
+
+
+@pytest.mark.parametrize("color_str, expected_rgb", COLOR_CASES)
+def test_flip3d_background_color_is_rgb(load_node_module, color_str, expected_rgb):
+    node = load_node_module("video_flip3d_transition").VideoFlip3DTransitionNode()
+    assert node._parse_background_color(color_str) == expected_rgb
+
+
+@pytest.mark.parametrize("color_str, expected_rgb", COLOR_CASES)
+def test_cube_background_color_is_bgr(load_node_module, color_str, expected_rgb):
+    node = load_node_module("video_cube_transition").VideoCubeTransitionNode()
+    assert node._parse_background_color(color_str) == expected_rgb[::-1]
@@ -0,0 +1,48 @@
+"""
+视频透明叠化转场节点测试
+"""
+
+import asyncio
+
+import pytest
+import torch
+
+pytest.importorskip("comfy.comfy_types.node_typing")
+pytest.importorskip("cv2")
+
+TRANSITION_MODES = [
+    "crossfade",
+    "fade_to_black",
+    "fade_to_white",
+    "fade_to_custom",
+    "additive_dissolve",
+    "chromatic_dissolve",
+]
+
+
+def _run(node, video1, video2, transition_mode):
+    (video,) = asyncio.run(node.generate_crossfade(
+        video1, video2, transition_mode, 6, 30, background_color="#336699", width=32, height=24
+    ))
+    return video
+
+
+@pytest.mark.parametrize("transition_mode", TRANSITION_MODES)
+def test_rgba_input_matches_rgb_output(load_node_module, transition_mode):
+    """不透明的RGBA输入与去掉Alpha后的RGB输入结果一致（输出为3通道且已写满）"""
+    generator = torch.Generator().manual_seed(0)
+    video1 = torch.rand(3, 24, 32, 3, generator=generator)
+    video2 = torch.rand(4, 24, 32, 3, generator=generator)
+    opaque = torch.ones(1, 24, 32, 1)
+    node = load_node_module("video_crossfade").VideoCrossfadeNode()
+    
+    rgb = _run(node, video1, video2, transition_mode)
+    rgba = _run(
+        node,
+        torch.cat([video1, opaque.expand(3, -1, -1, -1)], dim=-1),
+        torch.cat([video2, opaque.expand(4, -1, -1, -1)], dim=-1),
+        transition_mode,
+    )
+    
+    assert rgba.shape == (6, 24, 32, 3)
+    assert torch.allclose(rgba, rgb, atol=1.0 / 255.0)
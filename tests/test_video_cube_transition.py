@@ -0,0 +1,42 @@
+"""
+视频立方体转场节点测试
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("comfy.comfy_types.node_typing")
+pytest.importorskip("cv2")
+
+
+def _gradient_video(num_frames, height, width):
+    """平滑渐变的测试视频，每帧颜色略有不同"""
+    ys, xs = torch.meshgrid(torch.linspace(0, 1, height), torch.linspace(0, 1, width), indexing="ij")
+    return torch.stack([torch.stack([xs, ys, (xs * ys + 0.1 * i) % 1], dim=-1) for i in range(num_frames)])
+
+
+@pytest.mark.parametrize("direction", ["horizontal", "vertical"])
+def test_opencv_renderer_matches_torch_renderer(load_node_module, direction):
+    """源帧宽高比与面不同时，OpenCV CPU渲染与torch渲染结果一致（不会把cover裁掉的部分画到面外）"""
+    node = load_node_module("video_cube_transition").VideoCubeTransitionNode()
+    width, height, total_frames = 160, 120, 12
+    video1 = _gradient_video(2, 150, 200)
+    video2 = _gradient_video(3, 100, 100)
+    
+    opencv_frames = np.empty((total_frames, height, width, 3), dtype=np.uint8)
+    torch_frames = np.empty_like(opencv_frames)
+    args = (direction, total_frames, 90.0, width, height, 800.0, (30, 20, 10), width, height)
+    with contextlib.redirect_stdout(io.StringIO()):
+        node._render_with_opencv(
+            opencv_frames, node._tensor_to_numpy(video1), node._tensor_to_numpy(video2), *args
+        )
+        node._render_with_torch(torch_frames, video1, video2, *args, torch.device("cpu"))
+    
+    # 两种渲染在面边缘的抗锯齿和接缝上略有差异，只允许少量像素明显不同
+    diff = np.abs(opencv_frames.astype(np.int16) - torch_frames.astype(np.int16)).max(axis=-1)
+    mismatch = (diff > 16).reshape(total_frames, -1).mean(axis=1)
+    assert mismatch.max() < 0.02